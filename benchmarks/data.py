@@ -0,0 +1,194 @@
+"""
+Deterministic synthetic data in the OpenWeather bulk history CSV format.
+
+    python -m benchmarks.data --rows 1000000 --cities 12 --output weather.csv
+"""
+
+import argparse
+import math
+from datetime import datetime, timezone
+
+import polars as pl
+
+# Hours in the 2015-01-01 to 2025-01-01 history window the extract validates
+HOURS_PER_CITY = 87_672
+START_EPOCH = int(datetime(2015, 1, 1, tzinfo=timezone.utc).timestamp())
+
+WEATHER_IDS = {
+    "Clear": 800,
+    "Clouds": 803,
+    "Rain": 500,
+    "Drizzle": 300,
+    "Snow": 600,
+    "Thunderstorm": 200,
+    "Mist": 701,
+    "Smoke": 711,
+    "Haze": 721,
+    "Fog": 741,
+    "Squall": 771,
+}
+
+
+def generate_raw_weather_data(
+    n_rows: int,
+    seed: int = 0,
+    n_cities: int | None = None,
+    offset: int = 0,
+    length: int | None = None,
+) -> pl.DataFrame:
+    """
+    Generate a deterministic frame shaped like the raw OpenWeather CSV
+
+    Rows are hourly observations of `n_cities` cities, one city after the
+    other, so large inputs look like a multi-city history file. By default
+    every `HOURS_PER_CITY` rows start a new city. Values are drawn from a
+    counter-based hash of the row number, so the same `(n_rows, seed,
+    n_cities)` always produces the same data, and `offset`/`length` select
+    a slice of it without generating the rest.
+    """
+    rows_per_city = rows_per_city_of(n_rows, n_cities)
+    length = n_rows - offset if length is None else min(length, n_rows - offset)
+    weather_main = list(WEATHER_IDS)
+
+    return (
+        pl.DataFrame(
+            {"i": pl.int_range(offset, offset + length, dtype=pl.UInt64, eager=True)}
+        )
+        .with_columns(
+            (pl.col("i") // rows_per_city).alias("city"),
+            (START_EPOCH + (pl.col("i") % rows_per_city) * 3600)
+            .cast(pl.Int64)
+            .alias("dt"),
+            (250 + 55 * _uniform(seed, 0)).round(2).alias("temp"),
+            (_uniform(seed, 1) * len(weather_main))
+            .cast(pl.UInt32)
+            .replace_strict(dict(enumerate(weather_main)), return_dtype=pl.String)
+            .alias("weather_main"),
+        )
+        .select(
+            "dt",
+            pl.from_epoch("dt")
+            .dt.strftime("%Y-%m-%d %H:%M:%S +0000 UTC")
+            .alias("dt_iso"),
+            pl.lit(0, dtype=pl.Int64).alias("timezone"),
+            pl.format("City {}", pl.col("city")).alias("city_name"),
+            (40 + pl.col("city") % 10).cast(pl.Float64).alias("lat"),
+            (-80 - pl.col("city") % 10).cast(pl.Float64).alias("lon"),
+            "temp",
+            pl.when(_uniform(seed, 2) < 0.05)
+            .then(None)
+            .otherwise((100 + 9900 * _uniform(seed, 3)).cast(pl.Int64))
+            .alias("visibility"),
+            (pl.col("temp") - 10 * _uniform(seed, 4)).round(2).alias("dew_point"),
+            (pl.col("temp") - 3 + 4 * _uniform(seed, 5)).round(2).alias("feels_like"),
+            (pl.col("temp") - 2 * _uniform(seed, 6)).round(2).alias("temp_min"),
+            (pl.col("temp") + 2 * _uniform(seed, 7)).round(2).alias("temp_max"),
+            (980 + 60 * _uniform(seed, 8)).cast(pl.Int64).alias("pressure"),
+            pl.lit(None, dtype=pl.Float64).alias("sea_level"),
+            pl.lit(None, dtype=pl.Float64).alias("grnd_level"),
+            (10 + 90 * _uniform(seed, 9)).cast(pl.Int64).alias("humidity"),
+            (25 * _uniform(seed, 10)).round(2).alias("wind_speed"),
+            (360 * _uniform(seed, 11)).cast(pl.Int64).alias("wind_deg"),
+            pl.when(_uniform(seed, 12) < 0.7)
+            .then(None)
+            .otherwise((25 * _uniform(seed, 10) * (1 + _uniform(seed, 13))).round(2))
+            .alias("wind_gust"),
+            _precipitation(seed, 14, ["Rain", "Drizzle"]).alias("rain_1h"),
+            pl.lit(None, dtype=pl.String).alias("rain_3h"),
+            _precipitation(seed, 16, ["Snow"]).alias("snow_1h"),
+            pl.lit(None, dtype=pl.String).alias("snow_3h"),
+            (101 * _uniform(seed, 18)).cast(pl.Int64).alias("clouds_all"),
+            pl.col("weather_main")
+            .replace_strict(WEATHER_IDS, return_dtype=pl.Int64)
+            .alias("weather_id"),
+            "weather_main",
+            pl.col("weather_main").str.to_lowercase().alias("weather_description"),
+            pl.lit("01d").alias("weather_icon"),
+        )
+    )
+
+
+def rows_per_city_of(n_rows: int, n_cities: int | None) -> int:
+    """
+    Rows of each city when `n_rows` are split over `n_cities`
+
+    A city cannot have more hourly rows than fit in the validated date range.
+    """
+    if n_cities is None:
+        return HOURS_PER_CITY
+
+    rows_per_city = math.ceil(n_rows / n_cities)
+    if rows_per_city > HOURS_PER_CITY:
+        raise ValueError(
+            f"{n_rows} rows need at least {math.ceil(n_rows / HOURS_PER_CITY)} cities"
+        )
+    return rows_per_city
+
+
+def write_weather_csv(
+    path: str,
+    n_rows: int,
+    seed: int = 0,
+    n_cities: int | None = None,
+    chunk_rows: int = 1_000_000,
+) -> None:
+    """
+    Write the generated data as a CSV file, `chunk_rows` at a time so the
+    row count is not bounded by memory
+
+    Nulls are written as empty fields, as in the OpenWeather export.
+    """
+    # before `open`, so a bad city count does not truncate `path`
+    rows_per_city_of(n_rows, n_cities)
+    with open(path, "wb") as f:
+        for offset in range(0, max(n_rows, 1), chunk_rows):
+            generate_raw_weather_data(
+                n_rows, seed, n_cities, offset, chunk_rows
+            ).write_csv(f, include_header=offset == 0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--cities", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    write_weather_csv(args.output, args.rows, args.seed, args.cities)
+
+
+def _precipitation(seed: int, stream: int, conditions: list[str]) -> pl.Expr:
+    """
+    String-typed precipitation amount, null unless `weather_main` is one of
+    `conditions` (and then still null 30% of the time)
+    """
+    return (
+        pl.when(pl.col("weather_main").is_in(conditions) & (_uniform(seed, stream) < 0.7))
+        .then((6 * _uniform(seed, stream + 1)).round(2).cast(pl.String))
+        .otherwise(None)
+    )
+
+
+def _uniform(seed: int, stream: int) -> pl.Expr:
+    """
+    Uniform `[0, 1)` floats from a splitmix64 hash of the row counter `i`
+
+    Each `(seed, stream)` pair selects an independent sequence.
+    """
+    return _splitmix64(pl.col("i") + ((seed * 64 + stream) << 40)) / 2.0**64
+
+
+def _splitmix64(x: pl.Expr) -> pl.Expr:
+    x = x.cast(pl.UInt64) + pl.lit(0x9E3779B97F4A7C15, dtype=pl.UInt64)
+    x = (x ^ (x // pl.lit(1 << 30, dtype=pl.UInt64))) * pl.lit(
+        0xBF58476D1CE4E5B9, dtype=pl.UInt64
+    )
+    x = (x ^ (x // pl.lit(1 << 27, dtype=pl.UInt64))) * pl.lit(
+        0x94D049BB133111EB, dtype=pl.UInt64
+    )
+    return x ^ (x // pl.lit(1 << 31, dtype=pl.UInt64))
+
+
+if __name__ == "__main__":
+    main()
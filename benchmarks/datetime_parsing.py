@@ -0,0 +1,107 @@
+"""
+Time the conversion and date range validation of `dt_iso`: the previous
+two regex-based parses against the single conversion from the epoch `dt`
+and the fixed-width string parse it falls back to.
+
+Each variant runs in a fresh process so peak RSS is measured independently.
+
+    python -m benchmarks.datetime_parsing --rows 10000000
+"""
+
+import argparse
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+import polars as pl
+
+from benchmarks.data import generate_raw_weather_data
+from benchmarks.memory import peak_rss_mb
+from etl.extract.task import MAX_DATE, MIN_DATE, date_in_range_expr
+from etl.transform.cleaning import to_datetime_expr
+
+
+def regex_parses(df: pl.DataFrame) -> pl.DataFrame:
+    """
+    The previous extract validation and transform conversion, each parsing
+    the strings on its own
+    """
+    in_range = (
+        pl.col("dt_iso")
+        .str.extract(r"^([\d-]+\s[\d:]+)")
+        .str.to_datetime("%Y-%m-%d %H:%M:%S", strict=False)
+        .is_between(MIN_DATE, MAX_DATE)
+        .fill_null(False)
+    )
+    valid = df.select(in_range.all()).item()
+    converted = df.with_columns(
+        pl.col("dt_iso")
+        .str.replace(" \\+0000 UTC$", "")
+        .str.strptime(dtype=pl.Datetime, format="%Y-%m-%d %H:%M:%S")
+    )
+    assert valid
+    return converted
+
+
+def converted_once(df: pl.DataFrame, datetime_expr: pl.Expr) -> pl.DataFrame:
+    converted = df.with_columns(datetime_expr)
+    assert converted.select(date_in_range_expr("dt_iso").all()).item()
+    return converted
+
+
+def from_epoch(df: pl.DataFrame) -> pl.DataFrame:
+    return converted_once(df, to_datetime_expr("dt_iso", epoch_column="dt"))
+
+
+def fixed_width(df: pl.DataFrame) -> pl.DataFrame:
+    return converted_once(df, to_datetime_expr("dt_iso"))
+
+
+VARIANTS = {
+    "regex_parses": regex_parses,
+    "fixed_width": fixed_width,
+    "from_epoch": from_epoch,
+}
+
+
+def run_variant(name: str, input_path: str) -> dict:
+    df = pl.read_parquet(input_path)
+    input_rss_mb = peak_rss_mb()
+
+    start = time.perf_counter()
+    result = VARIANTS[name](df)
+    wall_time_s = time.perf_counter() - start
+
+    return {
+        "variant": name,
+        "rows": result.height,
+        "wall_time_s": round(wall_time_s, 3),
+        "rows_per_s": round(result.height / wall_time_s),
+        "input_rss_mb": round(input_rss_mb, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = str(Path(tmp_dir) / "datetime_input.parquet")
+        (
+            generate_raw_weather_data(args.rows, args.seed)
+            .select("dt", "dt_iso")
+            .write_parquet(input_path)
+        )
+
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(1, maxtasksperchild=1) as pool:
+            for name in VARIANTS:
+                print(pool.apply(run_variant, (name, input_path)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import resource
+import sys
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process, in MB
+
+    On Linux this is the high-water mark since the last `reset_peak_rss`.
+    """
+    if sys.platform == "linux":
+        return _proc_status_mb("VmHWM")
+
+    # `ru_maxrss` is reported in bytes on macOS and kilobytes elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb() -> float:
+    if sys.platform == "linux":
+        return _proc_status_mb("VmRSS")
+    return peak_rss_mb()
+
+
+def reset_peak_rss() -> None:
+    """
+    Reset the peak RSS to the current RSS, so the next `peak_rss_mb` only
+    covers what runs after this call (Linux only, a no-op elsewhere)
+    """
+    if sys.platform == "linux":
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+
+
+def _proc_status_mb(field: str) -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError(f"{field} not found in /proc/self/status")
@@ -0,0 +1,148 @@
+"""
+Time each temperature related feature on its own, from the shared
+meteorology intermediates in Float64 and Float32, and the whole feature
+family against the previous expressions that convert the temperature in
+every feature.
+
+Every case runs on the same in-memory frame, the fastest of `--repeat` runs
+is reported.
+
+    python -m benchmarks.meteorology --rows 10000000 --repeat 5
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+
+import polars as pl
+
+from benchmarks.data import generate_raw_weather_data
+from etl.transform import meteorology
+from etl.transform.transformation import (
+    add_temperature_related_features,
+    temperature_column_exprs,
+)
+
+TEMPERATURE_COLUMNS = ["dew_point", "feels_like", "temp", "temp_min", "temp_max"]
+
+FEATURES = {
+    "comfort_index": meteorology.comfort_index_expr,
+    "heat_index": meteorology.heat_index_expr,
+    "dew_point_depression": meteorology.dew_point_depression_expr,
+    "wind_chill": meteorology.wind_chill_expr,
+    "humidex": meteorology.humidex_expr,
+}
+
+
+def converting_in_every_feature(
+    df: pl.DataFrame, temperature_unit: str
+) -> pl.DataFrame:
+    """
+    The previous features: the temperature converted to Celsius by each
+    expression, and the wind term computed twice
+    """
+    temp_c = meteorology.to_celsius_expr("temp", temperature_unit)
+    dew_point_c = meteorology.to_celsius_expr("dew_point", temperature_unit)
+    wind = pl.col("wind_speed")
+    return df.with_columns(
+        (
+            (temp_c - 0.55 * (1 - pl.col("humidity") / 100))
+            * (meteorology.to_celsius_expr("temp", temperature_unit) - 14.5)
+        ).alias("comfort_index"),
+        pl.when(temp_c > 27)
+        .then(
+            -8.7846947556
+            + 1.61139411 * temp_c
+            + 2.33854883889 * pl.col("humidity") / 100
+            - 0.14611605 * temp_c * pl.col("humidity") / 100
+        )
+        .otherwise(temp_c)
+        .alias("heat_index"),
+        (temp_c - dew_point_c).alias("dew_point_depression"),
+        (pl.col("feels_like") - pl.col("temp")).alias("apparent_temp_diff"),
+        pl.when(temp_c < 10)
+        .then(
+            13.12
+            + 0.6215 * temp_c
+            - 11.37 * wind.pow(0.16)
+            + 0.3965 * temp_c * wind.pow(0.16)
+        )
+        .otherwise(temp_c)
+        .alias("wind_chill"),
+        (pl.col("temp_max") - pl.col("temp_min")).alias("temp_range"),
+        (
+            temp_c
+            + 0.5555
+            * (6.11 * (5417.7530 * (1 / 273.16 - 1 / pl.col("dew_point"))).exp() - 10)
+        ).alias("humidex"),
+    )
+
+
+def best_time(fn: Callable[[], pl.DataFrame], repeat: int) -> float:
+    wall_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        wall_times.append(time.perf_counter() - start)
+    return min(wall_times)
+
+
+def report(case: str, wall_time_s: float, rows: int) -> None:
+    print(
+        {
+            "case": case,
+            "wall_time_s": round(wall_time_s, 4),
+            "rows_per_s": round(rows / wall_time_s),
+        }
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--temperature-unit", default="celsius")
+    args = parser.parse_args()
+    unit = args.temperature_unit
+
+    df = (
+        generate_raw_weather_data(args.rows, args.seed)
+        .select(*TEMPERATURE_COLUMNS, "humidity", "wind_speed")
+        .with_columns(temperature_column_exprs(TEMPERATURE_COLUMNS, unit))
+    )
+
+    for float32 in [False, True]:
+        dtype = "float32" if float32 else "float64"
+        exprs = meteorology.intermediate_exprs(unit, float32)
+        report(
+            f"intermediates[{dtype}]",
+            best_time(lambda: df.select(exprs), args.repeat),
+            df.height,
+        )
+        intermediates = df.with_columns(exprs)
+        for name, feature_expr in FEATURES.items():
+            report(
+                f"{name}[{dtype}]",
+                best_time(lambda: intermediates.select(feature_expr()), args.repeat),
+                df.height,
+            )
+
+    report(
+        "converting_in_every_feature",
+        best_time(lambda: converting_in_every_feature(df, unit), args.repeat),
+        df.height,
+    )
+    for float32 in [False, True]:
+        report(
+            f"add_temperature_related_features[{'float32' if float32 else 'float64'}]",
+            best_time(
+                lambda: add_temperature_related_features(df, unit, float32),
+                args.repeat,
+            ),
+            df.height,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Time and memory-profile the pipeline stages on generated data, and write
+the results as JSON so runs can be compared over time.
+
+Covers `extract_weather_data`, each `add_*` feature function, the whole
+transform and the extract -> transform (-> load) pipeline. Every case runs
+in a fresh process so its peak RSS is measured independently.
+
+    python -m benchmarks.suite --rows 1000000 --cities 12 --output results.json
+    python -m benchmarks.suite --rows 1000000 --cities 12 --baseline results.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+
+import polars as pl
+
+from benchmarks.data import write_weather_csv
+from benchmarks.memory import current_rss_mb, peak_rss_mb, reset_peak_rss
+from etl.extract.task import extract_weather_data
+from etl.load.task import load_weather_data_to_postgres
+from etl.transform import transformation
+from etl.transform.cleaning import (
+    drop_columns_with_missing_values,
+    to_float_exprs,
+)
+from etl.transform.task import FEATURE_INPUT_COLUMNS, transform_weather_data
+from etl.transform.transformation import weather_main_expr
+
+TEMPERATURE_COLUMNS = ["dew_point", "feels_like", "temp", "temp_min", "temp_max"]
+
+
+def read_csv_path(inputs: dict) -> str:
+    return inputs["csv"]
+
+
+def read_raw(inputs: dict) -> pl.DataFrame:
+    return pl.read_parquet(inputs["raw"])
+
+
+def read_cleaned(inputs: dict) -> pl.DataFrame:
+    return pl.read_parquet(inputs["cleaned"])
+
+
+def run_extract(csv_file_path: str, options: dict) -> pl.DataFrame:
+    return extract_weather_data.fn(csv_file_path, options["lazy"]).lazy().collect()
+
+
+def run_transform(raw: pl.DataFrame, options: dict) -> pl.DataFrame:
+    return transform_weather_data.fn(
+        raw,
+        options["temperature_unit"],
+        on_invalid="quarantine",
+        quarantine_dir=options["quarantine_dir"],
+    )
+
+
+def run_pipeline(csv_file_path: str, options: dict) -> pl.DataFrame:
+    """
+    The flow's tasks, called directly so the Prefect orchestration overhead is
+    not part of the measurement
+    """
+    raw = extract_weather_data.fn(csv_file_path, options["lazy"])
+    transformed = run_transform(raw, options)
+    if options["db_connection_uri"]:
+        load_weather_data_to_postgres.fn(
+            transformed,
+            options["db_connection_uri"],
+            table_name="weather_benchmark",
+        )
+    return transformed.lazy().collect()
+
+
+def feature_case(add_features: Callable[..., pl.DataFrame]) -> Callable:
+    def run(cleaned: pl.DataFrame, options: dict) -> pl.DataFrame:
+        if add_features is transformation.transform_temperature_columns:
+            return add_features(
+                cleaned, TEMPERATURE_COLUMNS, options["temperature_unit"]
+            )
+        if add_features is transformation.add_temperature_related_features:
+            return add_features(cleaned, options["temperature_unit"])
+        return add_features(cleaned)
+
+    return run
+
+
+# The `add_*` functions, each timed on the cleaned (typed, Kelvin) data
+FEATURE_FUNCTIONS = [
+    transformation.transform_temperature_columns,
+    transformation.add_temperature_difference,
+    transformation.add_temporal_features,
+    transformation.add_weather_condition_categories,
+    transformation.add_wind_features,
+    transformation.add_temperature_related_features,
+    transformation.add_pressure_tendency_features,
+    transformation.add_rolling_window_features,
+    transformation.add_cloud_cover_and_visibility_features,
+]
+
+# case name -> (untimed input loader, timed function of the loaded input)
+CASES: dict[str, tuple[Callable, Callable]] = {
+    "extract_weather_data": (read_csv_path, run_extract),
+    **{
+        function.__name__: (read_cleaned, feature_case(function))
+        for function in FEATURE_FUNCTIONS
+    },
+    "transform_weather_data": (read_raw, run_transform),
+    "pipeline": (read_csv_path, run_pipeline),
+}
+
+
+def run_case(name: str, inputs: dict, options: dict) -> dict:
+    load, run = CASES[name]
+    data = load(inputs)
+    input_rss_mb = current_rss_mb()
+
+    wall_times = []
+    peak_rss = 0.0
+    for _ in range(options["repeat"]):
+        reset_peak_rss()
+        start = time.perf_counter()
+        result = run(data, options)
+        wall_times.append(time.perf_counter() - start)
+        peak_rss = max(peak_rss, peak_rss_mb())
+        del result
+
+    wall_time_s = min(wall_times)
+    return {
+        "case": name,
+        "wall_time_s": round(wall_time_s, 4),
+        "rows_per_s": round(options["rows"] / wall_time_s),
+        "input_rss_mb": round(input_rss_mb, 1),
+        "peak_rss_mb": round(peak_rss, 1),
+    }
+
+
+def prepare_inputs(tmp_dir: str, args: argparse.Namespace) -> dict:
+    """
+    Generate the CSV once, plus the extracted and cleaned frames the later
+    stages start from
+    """
+    inputs = {
+        "csv": str(Path(tmp_dir) / "weather.csv"),
+        "raw": str(Path(tmp_dir) / "raw.parquet"),
+        "cleaned": str(Path(tmp_dir) / "cleaned.parquet"),
+    }
+    write_weather_csv(inputs["csv"], args.rows, args.seed, args.cities)
+
+    raw = extract_weather_data.fn(inputs["csv"], lazy=True)
+    raw.sink_parquet(inputs["raw"])
+    (
+        drop_columns_with_missing_values(
+            pl.scan_parquet(inputs["raw"]), FEATURE_INPUT_COLUMNS
+        )
+        .with_columns(
+            *to_float_exprs(["rain_1h", "rain_3h", "snow_1h", "snow_3h"]),
+            weather_main_expr(),
+        )
+        .sink_parquet(inputs["cleaned"])
+    )
+    return inputs
+
+
+def metadata(args: argparse.Namespace) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "rows": args.rows,
+        "cities": args.cities,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "polars": pl.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def regressions(results: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """
+    Cases more than `tolerance` (a fraction) slower than in `baseline`
+    """
+    baseline_times = {r["case"]: r["wall_time_s"] for r in baseline["results"]}
+    return [
+        f"{r['case']}: {r['wall_time_s']}s vs {baseline_times[r['case']]}s"
+        for r in results
+        if r["case"] in baseline_times
+        and r["wall_time_s"] > baseline_times[r["case"]] * (1 + tolerance)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--cities", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--temperature-unit", default="celsius")
+    parser.add_argument("--lazy", action="store_true")
+    parser.add_argument("--cases", nargs="*", choices=list(CASES), default=list(CASES))
+    parser.add_argument(
+        "--db-connection-uri",
+        default=None,
+        help="also load into PostgreSQL in the pipeline case",
+    )
+    parser.add_argument("--output", default=None, help="write the results here")
+    parser.add_argument("--baseline", default=None, help="results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    options = {
+        "rows": args.rows,
+        "repeat": args.repeat,
+        "temperature_unit": args.temperature_unit,
+        "lazy": args.lazy,
+        "db_connection_uri": args.db_connection_uri,
+    }
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        inputs = prepare_inputs(tmp_dir, args)
+        # the generated data has a few rows breaking a validation rule (e.g.
+        # rain reported with no rainfall), as real data does
+        options["quarantine_dir"] = str(Path(tmp_dir) / "quarantine")
+
+        ctx = multiprocessing.get_context("spawn")
+        for name in args.cases:
+            with ctx.Pool(1, maxtasksperchild=1) as pool:
+                result = pool.apply(run_case, (name, inputs, options))
+            print(result, file=sys.stderr)
+            results.append(result)
+
+    report = json.dumps({"metadata": metadata(args), "results": results}, indent=2)
+    if args.output:
+        Path(args.output).write_text(report + "\n")
+    else:
+        print(report)
+
+    if args.baseline:
+        slower = regressions(
+            results, json.loads(Path(args.baseline).read_text()), args.tolerance
+        )
+        for line in slower:
+            print(f"Regression: {line}", file=sys.stderr)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
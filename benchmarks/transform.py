@@ -0,0 +1,111 @@
+"""
+Compare the eager, function-by-function transform chain against the fused
+lazy plan built by `build_transform_plan`.
+
+Each variant runs in a fresh process so peak RSS is measured independently.
+
+    python -m benchmarks.transform --rows 10000000
+"""
+
+import argparse
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+import polars as pl
+
+from benchmarks.data import generate_raw_weather_data
+from benchmarks.memory import peak_rss_mb
+from etl.transform.cleaning import (
+    convert_to_datetime,
+    convert_to_float,
+    drop_columns_with_missing_values,
+)
+from etl.transform.task import FEATURE_INPUT_COLUMNS, build_transform_plan
+from etl.transform.transformation import (
+    add_cloud_cover_and_visibility_features,
+    add_pressure_tendency_features,
+    add_rolling_window_features,
+    add_temperature_difference,
+    add_temperature_related_features,
+    add_temporal_features,
+    add_weather_condition_categories,
+    add_wind_features,
+    transform_temperature_columns,
+)
+
+
+def eager_chain(df: pl.DataFrame, temperature_unit: str) -> pl.DataFrame:
+    """
+    The transform as a sequence of eager steps, each materializing a new
+    DataFrame
+    """
+    df = drop_columns_with_missing_values(df, FEATURE_INPUT_COLUMNS)
+    df = convert_to_datetime(df, "dt_iso")
+    df = convert_to_float(df, ["rain_1h", "rain_3h", "snow_1h", "snow_3h"])
+    df = transform_temperature_columns(
+        df,
+        ["dew_point", "feels_like", "temp", "temp_min", "temp_max"],
+        temperature_unit,
+    )
+    df = add_temperature_difference(df)
+    df = add_temporal_features(df)
+    df = add_weather_condition_categories(df)
+    df = add_wind_features(df)
+    df = add_temperature_related_features(df, temperature_unit)
+    df = add_pressure_tendency_features(df)
+    df = add_rolling_window_features(df)
+    df = add_cloud_cover_and_visibility_features(df)
+    return df
+
+
+def fused_plan(df: pl.DataFrame, temperature_unit: str) -> pl.DataFrame:
+    return build_transform_plan(df.lazy(), temperature_unit).collect()
+
+
+VARIANTS = {
+    "eager_chain": eager_chain,
+    "fused_plan": fused_plan,
+}
+
+
+def run_variant(name: str, input_path: str, temperature_unit: str) -> dict:
+    df = pl.read_parquet(input_path)
+    input_rss_mb = peak_rss_mb()
+
+    start = time.perf_counter()
+    result = VARIANTS[name](df, temperature_unit)
+    wall_time_s = time.perf_counter() - start
+
+    return {
+        "variant": name,
+        "rows": result.height,
+        "wall_time_s": round(wall_time_s, 3),
+        "input_rss_mb": round(input_rss_mb, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--temperature-unit", default="celsius")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = str(Path(tmp_dir) / "raw_weather.parquet")
+        generate_raw_weather_data(args.rows, args.seed).write_parquet(input_path)
+
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(1, maxtasksperchild=1) as pool:
+            for name in VARIANTS:
+                result = pool.apply(
+                    run_variant, (name, input_path, args.temperature_unit)
+                )
+                print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Time the rolling/time-window feature stage on gapped, multi-city data,
+against the row-based `shift(3)` pressure change it replaces.
+
+Each variant runs in a fresh process so peak RSS is measured independently.
+
+    python -m benchmarks.window_features --rows 10000000 --gap-fraction 0.05
+"""
+
+import argparse
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+import polars as pl
+
+from benchmarks.data import generate_raw_weather_data
+from benchmarks.memory import peak_rss_mb
+from etl.transform.cleaning import to_datetime_expr
+from etl.transform.transformation import (
+    add_pressure_tendency_features,
+    add_rolling_window_features,
+)
+
+
+def row_shift(df: pl.DataFrame) -> pl.DataFrame:
+    """
+    The previous pressure change: 3 rows back over the whole frame
+    """
+    return df.with_columns(
+        (pl.col("pressure") - pl.col("pressure").shift(3)).alias("pressure_change_3h")
+    )
+
+
+def time_windows(df: pl.DataFrame) -> pl.DataFrame:
+    return add_rolling_window_features(add_pressure_tendency_features(df))
+
+
+VARIANTS = {
+    "row_shift": row_shift,
+    "time_windows": time_windows,
+}
+
+
+def run_variant(name: str, input_path: str) -> dict:
+    df = pl.read_parquet(input_path)
+    input_rss_mb = peak_rss_mb()
+
+    start = time.perf_counter()
+    result = VARIANTS[name](df)
+    wall_time_s = time.perf_counter() - start
+
+    return {
+        "variant": name,
+        "rows": result.height,
+        "wall_time_s": round(wall_time_s, 3),
+        "rows_per_s": round(result.height / wall_time_s),
+        "input_rss_mb": round(input_rss_mb, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--gap-fraction",
+        type=float,
+        default=0.05,
+        help="fraction of observations randomly dropped",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = str(Path(tmp_dir) / "window_input.parquet")
+        (
+            generate_raw_weather_data(args.rows, args.seed)
+            .lazy()
+            # drop a pseudo-random `gap_fraction` of the rows
+            .filter(
+                pl.int_range(pl.len()).hash(args.seed) % 10_000
+                >= args.gap_fraction * 10_000
+            )
+            .select("city_name", to_datetime_expr("dt_iso"), "pressure", "temp")
+            .collect()
+            .write_parquet(input_path)
+        )
+
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(1, maxtasksperchild=1) as pool:
+            for name in VARIANTS:
+                print(pool.apply(run_variant, (name, input_path)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Run the pipeline once, without Prefect, e.g. for one-shot backfill jobs
+
+The settings are read as by the deployment (`Settings`, from the environment
+and `.env`), and any given as options override them. The tasks are called
+directly, so Prefect (seconds to import) is never imported, and the load
+modules (psycopg, pyarrow) only once the database is first needed.
+
+    python -m etl --csv-file-path city.csv --incremental-load
+    python -m etl --profile etl.prof
+
+With `--profile`, the time since start at which each import and stage
+completed, and the functions taking the most cumulative time, are printed
+to stderr (and the cProfile stats written to the given file, if any).
+"""
+
+import argparse
+import cProfile
+import pstats
+import sys
+import time
+from collections.abc import Callable
+
+STARTED = time.perf_counter()
+
+# Settings of the deployment's Prefect features, not used by a direct run
+PREFECT_SETTINGS = {"result_cache_dir", "result_cache_expiration"}
+
+# Functions shown by `--profile`
+PROFILE_TOP = 25
+
+_timeline: list[tuple[str, float]] = []
+
+
+def mark(event: str) -> None:
+    _timeline.append((event, time.perf_counter() - STARTED))
+
+
+def timed(event: str, fn: Callable) -> Callable:
+    def run(*args, **kwargs):
+        result = fn(*args, **kwargs)
+        mark(event)
+        return result
+
+    return run
+
+
+def parse_args() -> argparse.Namespace:
+    from settings.settings import Settings
+
+    parser = argparse.ArgumentParser(
+        prog="python -m etl",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    for name, field in Settings.model_fields.items():
+        if name in PREFECT_SETTINGS:
+            continue
+        flag = f"--{name.replace('_', '-')}"
+        if field.annotation is bool:
+            parser.add_argument(flag, action=argparse.BooleanOptionalAction)
+        else:
+            # converted by `Settings`
+            parser.add_argument(flag)
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        metavar="PATH",
+        help="print an import/stage timeline and a cProfile summary",
+    )
+    return parser.parse_args()
+
+
+def run(args: argparse.Namespace) -> dict[str, int]:
+    from settings.settings import Settings
+
+    overrides = {
+        name: value
+        for name, value in vars(args).items()
+        if name != "profile" and value is not None
+    }
+    settings = Settings(**overrides)
+    mark("settings")
+
+    from etl.extract.task import extract_weather_data
+    from etl.metrics import collected_metrics, write_openmetrics
+    from etl.runner import run_weather_etl
+    from etl.tasks import run_tasks_directly
+    from etl.transform.task import transform_weather_data
+
+    mark("import etl")
+
+    run_tasks_directly()
+    parameters = settings.model_dump(exclude={"metrics_path", *PREFECT_SETTINGS})
+    load_result = run_weather_etl(
+        **parameters,
+        extract=timed("extract", extract_weather_data),
+        transform=timed("transform", transform_weather_data),
+    )
+    mark("load")
+
+    if settings.metrics:
+        from etl.load.pool import pool_stats
+
+        metrics = collected_metrics()
+        for m in metrics:
+            print(m)
+        if settings.metrics_path:
+            write_openmetrics(
+                settings.metrics_path,
+                metrics,
+                pool_stats(settings.db_connection_uri),
+            )
+    return load_result
+
+
+def print_profile(profiler: cProfile.Profile, path: str) -> None:
+    print("seconds since start:", file=sys.stderr)
+    for event, elapsed_s in _timeline:
+        print(f"  {elapsed_s:8.3f}  {event}", file=sys.stderr)
+    stats = pstats.Stats(profiler, stream=sys.stderr)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP)
+    if path:
+        stats.dump_stats(path)
+
+
+def main() -> None:
+    args = parse_args()
+    if args.profile is None:
+        load_result = run(args)
+    else:
+        profiler = cProfile.Profile()
+        try:
+            load_result = profiler.runcall(run, args)
+        finally:
+            print_profile(profiler, args.profile)
+    print("Weather ETL Completed with result: ", load_result)
+
+
+if __name__ == "__main__":
+    main()
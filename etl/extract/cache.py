@@ -0,0 +1,109 @@
+import hashlib
+import os
+from collections.abc import Callable, Collection
+from pathlib import Path
+
+import polars as pl
+
+CACHE_SUFFIX = ".arrow"
+# Part of every key, bumped when the cached frames change (2: `dt_iso` is a
+# datetime) so older files are never read
+CACHE_FORMAT_VERSION = 2
+
+
+def cache_key(file_path: str) -> str:
+    """
+    Cache key of a source file: its path, size, modification time and a
+    hash of its content
+    """
+    stat = os.stat(file_path)
+    key = (
+        f"{CACHE_FORMAT_VERSION}:{os.path.abspath(file_path)}:{stat.st_size}"
+        f":{stat.st_mtime_ns}:{content_hash(file_path)}"
+    )
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def content_hash(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        return hashlib.file_digest(f, "blake2b").hexdigest()
+
+
+def cache_path(cache_dir: str, key: str) -> Path:
+    return Path(cache_dir) / f"{key}{CACHE_SUFFIX}"
+
+
+def read_cache(cache_dir: str, key: str) -> Path | None:
+    """
+    Path of the cached frame stored under `key`, if there is one
+    """
+    path = cache_path(cache_dir, key)
+    if not path.exists():
+        return None
+
+    # mark as recently used for eviction
+    path.touch()
+    return path
+
+
+def write_cache(
+    cache_dir: str,
+    key: str,
+    lf: pl.LazyFrame,
+    validate: Callable[[pl.LazyFrame], pl.LazyFrame] | None = None,
+) -> Path:
+    """
+    Stream `lf` into an uncompressed Arrow IPC file under `key` and return
+    its path
+
+    The file is written under a temporary name and only renamed into place
+    once `validate` (called with the memory-mapped frame) passes, so the
+    source is parsed once and a failed validation never leaves a cache entry.
+    `validate` returns the rows to cache: the frame it was given, or a
+    filtered frame, which is then written in its place.
+    """
+    path = cache_path(cache_dir, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    filtered_path = path.with_suffix(f".{os.getpid()}.filtered.tmp")
+
+    try:
+        lf.sink_ipc(tmp_path, compression=None)
+        if validate is not None:
+            cached = pl.scan_ipc(tmp_path, memory_map=True)
+            kept = validate(cached)
+            if kept is not cached:
+                # collected rather than sunk, as not every validation
+                # expression is supported by the streaming engine
+                kept.collect().write_ipc(filtered_path, compression="uncompressed")
+                os.replace(filtered_path, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+        filtered_path.unlink(missing_ok=True)
+
+    return path
+
+
+def evict_cache(
+    cache_dir: str, max_bytes: int, keep: Collection[Path] = ()
+) -> None:
+    """
+    Delete the least recently used cache entries until the cache takes at
+    most `max_bytes` on disk
+
+    Entries in `keep` (e.g. those still to be read) are never evicted, even if
+    they alone exceed `max_bytes`.
+    """
+    entries = sorted(
+        Path(cache_dir).glob(f"*{CACHE_SUFFIX}"), key=lambda p: p.stat().st_mtime
+    )
+    total = sum(entry.stat().st_size for entry in entries)
+
+    for entry in entries:
+        if total <= max_bytes:
+            break
+        if entry in keep:
+            continue
+        total -= entry.stat().st_size
+        entry.unlink(missing_ok=True)
@@ -0,0 +1,164 @@
+import io
+from collections.abc import Iterator
+from typing import NamedTuple
+
+import polars as pl
+
+from etl.extract.task import (
+    EXPECTED_COLUMNS,
+    EXPECTED_SCHEMA,
+    EXTRACT_RULES,
+    find_csv_files,
+    newer_than_watermark_expr,
+    parse_timestamps,
+    scan_weather_data,
+)
+from etl.validation import enforce_rules
+
+# Bytes of CSV parsed at a time, chunks are built from whole batches
+CSV_BATCH_BYTES = 2 * 1024**2
+
+# Peak memory of transforming and loading a chunk, relative to the size of
+# its raw rows. Measured as the peak RSS of whole runs over 400k rows with
+# ceilings of 50 MB to 400 MB: it grows by 18-19 bytes per raw byte of a
+# chunk, on top of about 120 MB (thread pools, the connection, parser
+# buffers) that does not depend on the chunk size and `max_bytes` does not
+# cover, and about 150 MB for the interpreter and its imports.
+CHUNK_MEMORY_FACTOR = 20
+
+SECONDS_PER_DAY = 24 * 3600
+
+
+class Chunk(NamedTuple):
+    # rows to process, after the context rows of earlier chunks they need
+    raw: pl.DataFrame
+    # latest `dt` already processed per city: rows up to it are context only
+    watermarks: dict[str, int]
+
+
+def weather_data_chunks(
+    csv_file_path: str,
+    max_bytes: int,
+    lookback_s: int,
+    watermarks: dict[str, int] | None = None,
+    on_invalid: str = "raise",
+    quarantine_dir: str | None = None,
+) -> Iterator[Chunk]:
+    """
+    Read the CSV file(s) in chunks that take about `max_bytes` of memory to
+    process, for inputs larger than memory
+
+    The files are parsed once, batch by batch, and each city's rows must be
+    in time order. A chunk ends at the last UTC day boundary of each city,
+    so daily features always see whole days. The rows after it, and the
+    `lookback_s` seconds before it that the window features read, are
+    carried into the next chunk, so the processed rows and values are those
+    of a single full-frame run, up to the row order (chunk by chunk) and the
+    floating-point rounding of the rolling means, which sum their windows
+    from different starting rows.
+
+    With `watermarks`, only rows newer than them are processed (as in
+    `extract_weather_data`).
+    """
+    processed = dict(watermarks or {})
+    carried = parse_timestamps(pl.DataFrame(schema=EXPECTED_SCHEMA))
+    pending = []
+    pending_bytes = 0
+
+    for batch in read_weather_data_batches(csv_file_path):
+        if watermarks:
+            batch = batch.filter(newer_than_watermark_expr(watermarks, lookback_s))
+        batch = enforce_rules(
+            batch, EXTRACT_RULES, on_invalid, quarantine_dir, "extract"
+        )
+        pending.append(batch)
+        pending_bytes += batch.estimated_size()
+        if pending_bytes * CHUNK_MEMORY_FACTOR < max_bytes:
+            continue
+
+        frame = pl.concat([carried, *pending])
+        pending, pending_bytes = [], 0
+        check_time_order(frame)
+
+        # the latest day of each city may continue in the next batch
+        day_start = (pl.col("dt").max() // SECONDS_PER_DAY * SECONDS_PER_DAY).over(
+            "city_name"
+        )
+        ready = frame.filter(pl.col("dt") < day_start)
+        if has_new_rows(ready, processed):
+            yield Chunk(ready, dict(processed))
+            processed.update(latest_dt(ready))
+        carried = frame.filter(pl.col("dt") >= day_start - lookback_s)
+
+    frame = pl.concat([carried, *pending])
+    check_time_order(frame)
+    if has_new_rows(frame, processed):
+        yield Chunk(frame, processed)
+
+
+def columns_with_values(csv_file_path: str) -> list[str]:
+    """
+    The columns of the CSV file(s) with at least one value. Chunks keep these
+    even when they are all null within the chunk.
+
+    The files are read batch by batch, as a streaming scan of a CSV does not
+    bound its memory.
+    """
+    with_values = set()
+    for batch in read_weather_data_batches(csv_file_path):
+        has_values = batch.select(pl.all().is_not_null().any()).row(0, named=True)
+        with_values.update(column for column, value in has_values.items() if value)
+
+    return [column for column in EXPECTED_COLUMNS if column in with_values]
+
+
+def read_weather_data_batches(csv_file_path: str) -> Iterator[pl.DataFrame]:
+    """
+    Parse the CSV file(s) about `CSV_BATCH_BYTES` at a time, with the same
+    columns and dtypes as `scan_weather_data`
+
+    The files are read in blocks cut at the last line break, so every row
+    must be on a single line. (`pl.read_csv_batched` splits a file into a
+    fixed number of batches, which grow with the file.)
+    """
+    for path in find_csv_files(csv_file_path):
+        # checks the header
+        scan_weather_data(path)
+        with open(path, "rb") as f:
+            header = f.readline()
+            remainder = b""
+            while block := f.read(CSV_BATCH_BYTES):
+                block = remainder + block
+                end = block.rfind(b"\n") + 1
+                remainder = block[end:]
+                if end:
+                    yield parse_weather_csv(header + block[:end])
+            if remainder.strip():
+                yield parse_weather_csv(header + remainder)
+
+
+def parse_weather_csv(data: bytes) -> pl.DataFrame:
+    return parse_timestamps(
+        pl.read_csv(
+            io.BytesIO(data),
+            null_values=["null"],
+            infer_schema=False,
+            schema_overrides=EXPECTED_SCHEMA,
+        ).select(EXPECTED_COLUMNS)
+    )
+
+
+def check_time_order(df: pl.DataFrame) -> None:
+    in_order = df.select(
+        (pl.col("dt").diff().over("city_name") >= 0).all()
+    ).item()
+    if not in_order:
+        raise ValueError("Chunked processing needs each city's rows in time order")
+
+
+def has_new_rows(df: pl.DataFrame, processed: dict[str, int]) -> bool:
+    return df.select(newer_than_watermark_expr(processed).any()).item()
+
+
+def latest_dt(df: pl.DataFrame) -> dict[str, int]:
+    return dict(df.group_by("city_name").agg(pl.col("dt").max()).iter_rows())
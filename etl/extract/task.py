@@ -1,15 +1,97 @@
-from prefect import task
+import glob
+from datetime import datetime
+from pathlib import Path
+
 import polars as pl
 import os
 
+from etl.extract.cache import cache_key, evict_cache, read_cache, write_cache
+from etl.metrics import stage_metrics
+from etl.tasks import task
+from etl.time_index import order_by_time
+from etl.transform.cleaning import to_datetime_expr
+from etl.transform.utils import FrameT
+from etl.validation import Rule, enforce_rules
+
+# Explicit schema for the OpenWeather bulk history CSV. Supplying every dtype
+# up front lets polars skip the type inference pass over the file.
+EXPECTED_SCHEMA: dict[str, pl.DataType] = {
+    "dt": pl.Int64,
+    "dt_iso": pl.String,
+    "timezone": pl.Int64,
+    "city_name": pl.String,
+    "lat": pl.Float64,
+    "lon": pl.Float64,
+    "temp": pl.Float64,
+    "visibility": pl.Int64,
+    "dew_point": pl.Float64,
+    "feels_like": pl.Float64,
+    "temp_min": pl.Float64,
+    "temp_max": pl.Float64,
+    "pressure": pl.Int64,
+    "sea_level": pl.Float64,
+    "grnd_level": pl.Float64,
+    "humidity": pl.Int64,
+    "wind_speed": pl.Float64,
+    "wind_deg": pl.Int64,
+    "wind_gust": pl.Float64,
+    "rain_1h": pl.String,
+    "rain_3h": pl.String,
+    "snow_1h": pl.String,
+    "snow_3h": pl.String,
+    "clouds_all": pl.Int64,
+    "weather_id": pl.Int64,
+    "weather_main": pl.String,
+    "weather_description": pl.String,
+    "weather_icon": pl.String,
+}
+
+EXPECTED_COLUMNS = list(EXPECTED_SCHEMA)
+
+# Expected date range of the historical data
+MIN_DATE = datetime(2015, 1, 1, 0, 0, 0)
+MAX_DATE = datetime(2025, 1, 1, 23, 59, 59)
+
+# Plausible Kelvin temperature range: the coldest and hottest temperatures
+# ever recorded on Earth, with some buffer
+MIN_KELVIN_TEMP = 180
+MAX_KELVIN_TEMP = 340
+
 
 @task(log_prints=True)
-def extract_weather_data(csv_file_path: str) -> pl.DataFrame:
+def extract_weather_data(
+    csv_file_path: str,
+    lazy: bool = False,
+    watermarks: dict[str, int] | None = None,
+    lookback_s: int = 0,
+    cache_dir: str | None = None,
+    cache_max_bytes: int = 10 * 1024**3,
+    on_invalid: str = "raise",
+    quarantine_dir: str | None = None,
+) -> pl.DataFrame | pl.LazyFrame:
     """
-    Goal: Read the weather data from the CSV file.
+    Goal: Read the weather data from the CSV file(s).
 
     Task:
         - Use polars to read the CSV file into a DataFrame.
+            - `csv_file_path` may also be a directory or a glob, e.g. one file
+              per city. The files are scanned in parallel as a single query.
+            - When `lazy` is set, scan the CSV into a LazyFrame instead. It is
+              validated and transformed in the same query (see
+              `transform_weather_data`), executed once by the load, so the
+              file is only read once. The window features still need every
+              row in memory.
+            - With `watermarks` (latest `dt` already loaded per city), only read
+              newer rows, plus the `lookback_s` seconds before them that the
+              feature engineering needs as context.
+            - With a `cache_dir`, keep the validated raw data as an Arrow IPC
+              file keyed by the CSV's path, size, mtime and content hash.
+              Later runs memory-map it instead of parsing the CSV again.
+              The least recently used files are evicted beyond `cache_max_bytes`.
+            - The DataFrame is ordered by city and `dt`, one row per city and
+              time (see `order_by_time`): checked in one pass, sorted only when
+              needed, with the last duplicate kept. A LazyFrame is not
+              checked, its rows must already be in that order.
         - Data Validation
             - Schema Validation
                 - Ensure expected columns are present.
@@ -18,108 +100,182 @@ def extract_weather_data(csv_file_path: str) -> pl.DataFrame:
         - Basic Data Range Checks
             - Verify dates are within expected ranges (2015-01-01 to 2025-01-01)
             - Temperatures are within plausible ranges (even in Kelvin)
+            - All rules are checked in one pass (see `EXTRACT_RULES`). With
+              `on_invalid="quarantine"`, offending rows are written to
+              `quarantine_dir` and dropped instead of failing the run.
         - Error Handling
             - Raise an error if the CSV file is not found.
             - Raise an error if CSV file is corrupted.
             - Raise an error on data validation errors.
 
-    Output: DataFrame containing the raw weather data.
+    Output: DataFrame (or LazyFrame) containing the raw weather data.
     """
     try:
-        if not os.path.exists(csv_file_path):
-            raise FileNotFoundError(f"File not found: {csv_file_path}")
+        with stage_metrics("extract") as metrics:
+            csv_file_paths = find_csv_files(csv_file_path)
 
-        df = pl.read_csv(csv_file_path, null_values=["null"])
+            if cache_dir:
+                # the cache only ever holds validated data
+                cached_paths = [
+                    cache_weather_data(path, cache_dir, on_invalid, quarantine_dir)
+                    for path in csv_file_paths
+                ]
+                evict_cache(cache_dir, cache_max_bytes, keep=set(cached_paths))
+                # one multi-file scan of the memory-mapped files
+                lf = pl.scan_ipc(cached_paths, memory_map=True)
+                validated = True
+            else:
+                lf = pl.concat([scan_weather_data(path) for path in csv_file_paths])
+                validated = False
 
-        if not contains_expected_columns(df):
-            raise ValueError("Column validation failed")
-
-        if not valid_date_range(df["dt_iso"]):
-            raise ValueError("Date range validation failed")
-
-        if not valid_kelvin_temperatures(df["temp"]):
-            raise ValueError("Temperature validation failed")
-
-        return df
-    except FileNotFoundError:
+            if watermarks:
+                # pushed down into the reader, so older rows are never
+                # materialized or validated
+                lf = lf.filter(newer_than_watermark_expr(watermarks, lookback_s))
+            if lazy:
+                # validated by the transform, in the query that reads it
+                return lf
+            raw_weather_df = lf.collect()
+            if not validated:
+                raw_weather_df = enforce_rules(
+                    raw_weather_df, EXTRACT_RULES, on_invalid, quarantine_dir, "extract"
+                )
+            raw_weather_df = order_by_time(raw_weather_df)
+            metrics.record(output=raw_weather_df)
+            return raw_weather_df
+    except FileNotFoundError as e:
         print(f"File not found: {csv_file_path}")
+        raise e
     except ValueError as e:
         print(f"Data validation failed: {e}")
+        raise e
     except Exception as e:
         print(f"An error occurred: {e}")
+        raise e
 
 
-def contains_expected_columns(df: pl.DataFrame) -> bool:
+def find_csv_files(csv_file_path: str) -> list[str]:
     """
-    Check if the DataFrame contains the expected columns
+    Resolve a CSV file, a directory of CSV files or a glob to the sorted list
+    of files it refers to
     """
-    expected_columns = [
-        "dt",
-        "dt_iso",
-        "timezone",
-        "city_name",
-        "lat",
-        "lon",
-        "temp",
-        "visibility",
-        "dew_point",
-        "feels_like",
-        "temp_min",
-        "temp_max",
-        "pressure",
-        "sea_level",
-        "grnd_level",
-        "humidity",
-        "wind_speed",
-        "wind_deg",
-        "wind_gust",
-        "rain_1h",
-        "rain_3h",
-        "snow_1h",
-        "snow_3h",
-        "clouds_all",
-        "weather_id",
-        "weather_main",
-        "weather_description",
-        "weather_icon",
-    ]
-    return all(col in df.columns for col in expected_columns)
-
-
-def valid_date_range(dt_iso_series: pl.Series) -> bool:
-    """
-    Check if the `dt_iso` column values are within the expected date range
-    """
-    # Convert dt_iso to datetime type
-    parsed_dates = dt_iso_series.str.extract(r"^([\d-]+\s[\d:]+)").str.to_datetime(
-        "%Y-%m-%d %H:%M:%S"
+    if os.path.isdir(csv_file_path):
+        csv_file_path = os.path.join(csv_file_path, "*.csv")
+
+    csv_file_paths = sorted(
+        path for path in glob.glob(csv_file_path) if os.path.isfile(path)
     )
+    if not csv_file_paths:
+        raise FileNotFoundError(f"File not found: {csv_file_path}")
 
-    # Define the date range boundaries
-    start_date = pl.datetime(2015, 1, 1, 0, 0, 0)
-    end_date = pl.datetime(2025, 1, 1, 23, 59, 59)
+    return csv_file_paths
 
-    # Check if all dates are within the expected range
-    dates_in_range = parsed_dates.filter(parsed_dates.is_between(start_date, end_date))
 
-    # Count records in range vs total records
-    total_records = len(parsed_dates)
-    records_in_range = len(dates_in_range)
-    return total_records == records_in_range
+def cache_weather_data(
+    csv_file_path: str,
+    cache_dir: str,
+    on_invalid: str = "raise",
+    quarantine_dir: str | None = None,
+) -> Path:
+    """
+    Path of the cached, validated data of a CSV file, which is parsed,
+    validated and cached first on a miss
+
+    In quarantine mode only the valid rows are cached; the offending ones are
+    quarantined once, when the file is first cached.
+    """
+    key = cache_key(csv_file_path)
+    path = read_cache(cache_dir, key)
+    if path is None:
+        print(f"Caching {csv_file_path} in {cache_dir}")
+        path = write_cache(
+            cache_dir,
+            key,
+            scan_weather_data(csv_file_path),
+            validate=lambda lf: enforce_rules(
+                lf, EXTRACT_RULES, on_invalid, quarantine_dir, "extract"
+            ),
+        )
+    return path
+
+
+def scan_weather_data(csv_file_path: str) -> pl.LazyFrame:
+    """
+    Lazily scan the CSV file, projected down to the expected columns
+
+    Schema inference is disabled and the expected dtypes are applied as
+    overrides, so only the header is read until the plan is collected.
+    Unexpected columns are read as strings and projected away.
+
+    `dt_iso` is returned as a datetime (see `parse_timestamps`).
+    """
+    lf = pl.scan_csv(
+        csv_file_path,
+        null_values=["null"],
+        infer_schema=False,
+        schema_overrides=EXPECTED_SCHEMA,
+    )
+    if not contains_expected_columns(lf):
+        raise ValueError("Column validation failed")
+
+    return parse_timestamps(lf.select(EXPECTED_COLUMNS))
 
 
-def valid_kelvin_temperatures(temp_series: pl.Series) -> bool:
+def parse_timestamps(df: FrameT) -> FrameT:
     """
-    Check if the `temp` column values are within the expected temperature range
+    Convert `dt_iso` to a datetime, once for the validation and transform
 
-    The theoretical minimum Kelvin temperature is `0`.
-    A practical minimum is `180` (coldest temperature ever recorded on Earth, with some buffer).
-    A practical maximum is `340` (hotest temperature ever recorded on Earth, with some buffer).
+    It is computed from the epoch seconds in `dt`, the same instant, so the
+    timestamp strings are never parsed (or even materialized by the scan).
     """
-    # Define the temperature range boundaries
-    min_temp = 180
-    max_temp = 340
+    return df.with_columns(to_datetime_expr("dt_iso", epoch_column="dt"))
+
+
+def newer_than_watermark_expr(
+    watermarks: dict[str, int], lookback_s: int = 0
+) -> pl.Expr:
+    """
+    Expression that is `True` for rows whose `dt` is after their city's
+    watermark, less `lookback_s` seconds
+
+    Cities without a watermark are always `True`.
+    """
+    watermark = pl.col("city_name").replace_strict(
+        watermarks, default=None, return_dtype=pl.Int64
+    )
+    return (pl.col("dt") > watermark - lookback_s).fill_null(True)
+
+
+def contains_expected_columns(df: pl.DataFrame | pl.LazyFrame) -> bool:
+    """
+    Check if the DataFrame contains the expected columns
+    """
+    columns = df.collect_schema().names()
+    return all(col in columns for col in EXPECTED_COLUMNS)
+
+
+def date_in_range_expr(column_name: str) -> pl.Expr:
+    """
+    Row-level expression that is `True` when the `dt_iso` datetime falls
+    within the expected date range (and `False` if it is missing)
+    """
+    return pl.col(column_name).is_between(MIN_DATE, MAX_DATE).fill_null(False)
+
+
+def kelvin_temperature_in_range_expr(column_name: str) -> pl.Expr:
+    """
+    Row-level expression that is `True` when the temperature is within the
+    plausible Kelvin range (and `False` if it is missing)
+    """
+    return (
+        pl.col(column_name)
+        .is_between(MIN_KELVIN_TEMP, MAX_KELVIN_TEMP)
+        .fill_null(False)
+    )
+
 
-    # Check if all temperatures are within the expected range
-    temps_in_range = temp_series.filter(temp_series.is_between(min_temp, max_temp))
-    return len(temps_in_range) == len(temp_series)
+# Row-level rules every extracted row must pass
+EXTRACT_RULES = [
+    Rule("valid_date_range", date_in_range_expr("dt_iso")),
+    Rule("valid_kelvin_temperatures", kelvin_temperature_in_range_expr("temp")),
+]
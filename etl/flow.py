@@ -1,19 +1,94 @@
 from prefect import flow
+from etl.metrics import publish_metrics
 from etl.extract.task import extract_weather_data
 from etl.transform.task import transform_weather_data
-from etl.load.task import load_weather_data_to_postgres
+from etl.load.pool import pool_stats
+from etl.runner import run_weather_etl
+from etl.result_cache import (
+    extract_cache_key,
+    result_storage,
+    transform_cache_key,
+    with_result_cache,
+)
 
 
 @flow(log_prints=True)
-def weather_etl_flow(csv_file_path: str, db_connection_uri: str, temperature_unit: str):
+def weather_etl_flow(
+    csv_file_path: str,
+    db_connection_uri: str,
+    temperature_unit: str,
+    lazy: bool = False,
+    load_batch_size: int = 100_000,
+    incremental_load: bool = False,
+    incremental_extract: bool = False,
+    cache_dir: str | None = None,
+    cache_max_bytes: int = 10 * 1024**3,
+    metrics: bool = False,
+    metrics_path: str | None = None,
+    on_invalid: str = "raise",
+    quarantine_dir: str | None = None,
+    compact_schema: bool = False,
+    chunk_max_bytes: int | None = None,
+    pipeline_depth: int = 0,
+    db_pool_min_size: int = 1,
+    db_pool_max_size: int = 4,
+    db_pool_max_lifetime: float = 3600.0,
+    db_pool_timeout: float = 30.0,
+    aggregates: bool = False,
+    parquet_dir: str | None = None,
+    result_cache_dir: str | None = None,
+    result_cache_expiration: float = 7 * 24 * 3600,
+    sketches: bool = False,
+):
     try:
-        raw_weather_df = extract_weather_data(csv_file_path)
-        transformed_weather_df = transform_weather_data(
-            raw_weather_df, temperature_unit
-        )
-        load_result = load_weather_data_to_postgres(
-            transformed_weather_df, db_connection_uri
+        extract, transform = extract_weather_data, transform_weather_data
+        if result_cache_dir and not lazy and not chunk_max_bytes:
+            # the extracted and transformed frames are kept as Parquet,
+            # keyed by their inputs' content and the code's source, so
+            # a retry or re-run resumes at the first stage not completed
+            storage = result_storage(result_cache_dir)
+            extract = with_result_cache(
+                extract_weather_data,
+                extract_cache_key,
+                storage,
+                result_cache_expiration,
+            )
+            transform = with_result_cache(
+                transform_weather_data,
+                transform_cache_key,
+                storage,
+                result_cache_expiration,
+            )
+        # the tasks are run by `run_weather_etl`, which `python -m etl` also
+        # calls directly, without Prefect
+        load_result = run_weather_etl(
+            csv_file_path=csv_file_path,
+            db_connection_uri=db_connection_uri,
+            temperature_unit=temperature_unit,
+            lazy=lazy,
+            load_batch_size=load_batch_size,
+            incremental_load=incremental_load,
+            incremental_extract=incremental_extract,
+            cache_dir=cache_dir,
+            cache_max_bytes=cache_max_bytes,
+            metrics=metrics,
+            on_invalid=on_invalid,
+            quarantine_dir=quarantine_dir,
+            compact_schema=compact_schema,
+            chunk_max_bytes=chunk_max_bytes,
+            pipeline_depth=pipeline_depth,
+            db_pool_min_size=db_pool_min_size,
+            db_pool_max_size=db_pool_max_size,
+            db_pool_max_lifetime=db_pool_max_lifetime,
+            db_pool_timeout=db_pool_timeout,
+            aggregates=aggregates,
+            parquet_dir=parquet_dir,
+            sketches=sketches,
+            extract=extract,
+            transform=transform,
         )
+        if metrics:
+            publish_metrics(metrics_path, pool_stats(db_connection_uri))
         print("Weather ETL Flow Completed with result: ", load_result)
     except Exception as e:
         raise e
@@ -0,0 +1,106 @@
+import atexit
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import NamedTuple
+
+import psycopg
+from psycopg_pool import ConnectionPool
+
+
+class PoolConfig(NamedTuple):
+    min_size: int = 1
+    max_size: int = 4
+    # seconds before a connection is replaced, spreading reconnects over time
+    max_lifetime: float = 3600.0
+    # seconds to wait for a free connection before failing
+    timeout: float = 30.0
+
+
+_config = PoolConfig()
+# one pool per database (connection URI), kept for the life of the process
+# and shared by every flow run in it; closed at exit
+_pools: dict[str, ConnectionPool] = {}
+_lock = threading.Lock()
+
+
+def configure_pool(config: PoolConfig) -> None:
+    """
+    Size the connection pools, those already open included
+
+    Open pools are resized in place rather than replaced, so their
+    connections outlive a flow run with another configuration.
+    """
+    global _config
+    with _lock:
+        if config == _config:
+            return
+        _config = config
+        for pool in _pools.values():
+            _configure(pool, config)
+
+
+def get_pool(db_connection_uri: str) -> ConnectionPool:
+    """
+    The connection pool of a database, opened on first use and shared by
+    every task of the process
+
+    Connections are checked before being handed out, so one dropped by the
+    server is replaced instead of failing the task.
+    """
+    with _lock:
+        pool = _pools.get(db_connection_uri)
+        if pool is None:
+            pool = ConnectionPool(
+                db_connection_uri,
+                min_size=_config.min_size,
+                max_size=_config.max_size,
+                max_lifetime=_config.max_lifetime,
+                timeout=_config.timeout,
+                check=ConnectionPool.check_connection,
+                name="weather-etl",
+                open=True,
+            )
+            _pools[db_connection_uri] = pool
+        return pool
+
+
+def _configure(pool: ConnectionPool, config: PoolConfig) -> None:
+    pool.resize(config.min_size, config.max_size)
+    # taken by connections opened (lifetime) or requested (timeout) from now
+    pool.max_lifetime = config.max_lifetime
+    pool.timeout = config.timeout
+
+
+@contextmanager
+def connection(db_connection_uri: str) -> Iterator[psycopg.Connection]:
+    """
+    A pooled connection, committed on success and rolled back on error like
+    `psycopg.connect`
+    """
+    with get_pool(db_connection_uri).connection() as conn:
+        yield conn
+
+
+def pool_stats(db_connection_uri: str) -> dict[str, int]:
+    """
+    Usage of a database's pool so far, including the time spent waiting for
+    a connection (`requests_wait_ms`); empty if it was never used
+    """
+    with _lock:
+        pool = _pools.get(db_connection_uri)
+    return pool.get_stats() if pool is not None else {}
+
+
+def close_pools() -> None:
+    with _lock:
+        _close_pools()
+
+
+def _close_pools() -> None:
+    for pool in _pools.values():
+        pool.close()
+    _pools.clear()
+
+
+atexit.register(close_pools)
@@ -0,0 +1,526 @@
+import struct
+from collections.abc import Sequence
+
+import numpy as np
+import polars as pl
+import psycopg
+import pyarrow as pa
+import pyarrow.compute as pc
+from psycopg import sql
+
+# Header and trailer of a PostgreSQL binary COPY stream
+# (https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9.4)
+COPY_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_BINARY_TRAILER = struct.pack(">h", -1)
+
+# Microseconds/days between the Unix epoch and the PostgreSQL epoch (2000-01-01)
+POSTGRES_EPOCH_US = 946_684_800_000_000
+POSTGRES_EPOCH_DAYS = 10_957
+
+# polars dtype -> (PostgreSQL type, big-endian numpy dtype of its binary form)
+NUMERIC_TYPES: dict[type[pl.DataType], tuple[str, str]] = {
+    pl.Boolean: ("boolean", ">u1"),
+    pl.Int8: ("smallint", ">i2"),
+    pl.UInt8: ("smallint", ">i2"),
+    pl.Int16: ("smallint", ">i2"),
+    pl.UInt16: ("integer", ">i4"),
+    pl.Int32: ("integer", ">i4"),
+    pl.UInt32: ("bigint", ">i8"),
+    pl.Int64: ("bigint", ">i8"),
+    pl.Float32: ("real", ">f4"),
+    pl.Float64: ("double precision", ">f8"),
+}
+
+# `postgres_type` of a numeric column by its `pg_type.typname`, and the
+# dtype a frame column is cast to for it
+TYPE_NAMES = {
+    "bool": "boolean",
+    "int2": "smallint",
+    "int4": "integer",
+    "int8": "bigint",
+    "float4": "real",
+    "float8": "double precision",
+}
+CAST_DTYPES: dict[str, type[pl.DataType]] = {
+    "boolean": pl.Boolean,
+    "smallint": pl.Int16,
+    "integer": pl.Int32,
+    "bigint": pl.Int64,
+    "real": pl.Float32,
+    "double precision": pl.Float64,
+}
+
+# Content hash of the non-key columns, used to skip unchanged rows on upsert
+ROW_HASH_COLUMN = "row_hash"
+
+# Position of a row in the upserted frame, so its last duplicate wins
+STAGING_ORDINAL_COLUMN = "staging_ordinal"
+
+
+def postgres_type(table_name: str, column_name: str, dtype: pl.DataType) -> str:
+    """
+    PostgreSQL column type for a polars dtype
+
+    `Enum` columns map to a PostgreSQL enum type named `<table>_<column>`.
+    """
+    if dtype.base_type() in NUMERIC_TYPES:
+        return NUMERIC_TYPES[dtype.base_type()][0]
+    elif isinstance(dtype, pl.Enum):
+        return enum_type_name(table_name, column_name)
+    elif dtype in (pl.String, pl.Categorical):
+        return "text"
+    elif isinstance(dtype, pl.Datetime):
+        return "timestamptz" if dtype.time_zone else "timestamp"
+    elif dtype == pl.Date:
+        return "date"
+
+    raise TypeError(f"Unsupported column type for {column_name}: {dtype}")
+
+
+def postgres_type_sql(
+    table_name: str, column_name: str, dtype: pl.DataType
+) -> sql.Composable:
+    """
+    `postgres_type` for a statement, with the name of an enum type quoted
+    """
+    if isinstance(dtype, pl.Enum):
+        return sql.Identifier(enum_type_name(table_name, column_name))
+    return sql.SQL(postgres_type(table_name, column_name, dtype))
+
+
+def enum_type_name(table_name: str, column_name: str) -> str:
+    return f"{table_name}_{column_name}"
+
+
+def create_table(
+    conn: psycopg.Connection,
+    table_name: str,
+    schema: pl.Schema,
+    primary_key: Sequence[str] | None = None,
+) -> None:
+    """
+    Create `table_name` (and the enum types it uses) from a polars schema,
+    if it does not already exist
+
+    With a `primary_key` the table also gets a `row_hash` column, as used
+    by `upsert_to_postgres`.
+    """
+    create_enum_types(conn, table_name, schema)
+
+    columns = [
+        sql.SQL("{} {}").format(
+            sql.Identifier(column_name),
+            postgres_type_sql(table_name, column_name, dtype),
+        )
+        for column_name, dtype in schema.items()
+    ]
+    if primary_key:
+        columns.append(
+            sql.SQL("{} uuid").format(sql.Identifier(ROW_HASH_COLUMN))
+        )
+        columns.append(
+            sql.SQL("PRIMARY KEY ({})").format(_identifiers(primary_key))
+        )
+
+    conn.execute(
+        sql.SQL("CREATE TABLE IF NOT EXISTS {} ({})").format(
+            sql.Identifier(table_name), sql.SQL(", ").join(columns)
+        )
+    )
+
+
+def create_enum_types(
+    conn: psycopg.Connection, table_name: str, schema: pl.Schema
+) -> None:
+    """
+    Create the enum type of each `Enum` column of `schema`, or add the labels
+    it is missing (see `create_enum_type`)
+    """
+    for column_name, dtype in schema.items():
+        if isinstance(dtype, pl.Enum):
+            create_enum_type(
+                conn, enum_type_name(table_name, column_name), dtype.categories
+            )
+
+
+def create_enum_type(
+    conn: psycopg.Connection, type_name: str, labels: pl.Series
+) -> None:
+    """
+    Create the enum type `type_name` with `labels`, or add the labels it is
+    missing to the existing type (after its other labels)
+
+    Labels added to an existing type cannot be used by the transaction that
+    adds them, so commit before loading rows that have them.
+    """
+    existing = conn.execute(
+        """
+        SELECT e.enumlabel
+        FROM pg_type t LEFT JOIN pg_enum e ON e.enumtypid = t.oid
+        WHERE t.typname = %s
+        """,
+        (type_name,),
+    ).fetchall()
+    if not existing:
+        conn.execute(
+            sql.SQL("CREATE TYPE {} AS ENUM ({})").format(
+                sql.Identifier(type_name),
+                sql.SQL(", ").join(sql.Literal(label) for label in labels),
+            )
+        )
+        return
+
+    existing_labels = {label for (label,) in existing}
+    for label in labels:
+        if label not in existing_labels:
+            conn.execute(
+                sql.SQL("ALTER TYPE {} ADD VALUE IF NOT EXISTS {}").format(
+                    sql.Identifier(type_name), sql.Literal(label)
+                )
+            )
+
+
+def table_column_types(conn: psycopg.Connection, table_name: str) -> dict[str, str]:
+    """
+    `postgres_type` of each column of `table_name`, empty if there is no such
+    table
+    """
+    rows = conn.execute(
+        """
+        SELECT a.attname, t.typname
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        JOIN pg_type t ON t.oid = a.atttypid
+        WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+            AND a.attnum > 0 AND NOT a.attisdropped
+        """,
+        (table_name,),
+    ).fetchall()
+    return {column: TYPE_NAMES.get(type_name, type_name) for column, type_name in rows}
+
+
+def conform_to_table(
+    conn: psycopg.Connection, df: pl.DataFrame, table_name: str
+) -> pl.DataFrame:
+    """
+    Cast the numeric columns of `df` to the types of the existing
+    `table_name`'s columns, which a binary COPY must match exactly
+
+    E.g. a table created by an uncompacted load has `double precision`
+    columns where a compacted frame has `Float32` ones. Raises a `TypeError`
+    for a column that is not numeric on both sides, or whose values do not
+    fit the table's type.
+    """
+    table_types = table_column_types(conn, table_name)
+    casts = {}
+    for column, dtype in df.schema.items():
+        table_type = table_types.get(column)
+        # a `Null` column (e.g. of an empty merge) is sent as nulls as is
+        if (
+            table_type is None
+            or dtype == pl.Null
+            or table_type == postgres_type(table_name, column, dtype)
+        ):
+            continue
+        if table_type not in CAST_DTYPES or dtype.base_type() not in NUMERIC_TYPES:
+            raise TypeError(
+                f"Column {column} of {table_name} is {table_type}, "
+                f"which {dtype} values cannot be loaded into"
+            )
+        casts[column] = CAST_DTYPES[table_type]
+
+    if not casts:
+        return df
+    try:
+        return df.cast(casts)
+    except pl.exceptions.InvalidOperationError as e:
+        raise TypeError(
+            f"Values of {table_name} do not fit its column types {casts}: {e}"
+        ) from e
+
+
+def copy_to_postgres(
+    conn: psycopg.Connection,
+    df: pl.DataFrame,
+    table_name: str,
+    batch_size: int,
+) -> int:
+    """
+    Stream `df` into `table_name` with `COPY ... FROM STDIN (FORMAT binary)`
+
+    Rows are encoded `batch_size` at a time, straight from the column buffers
+    (see `encode_copy_binary`), into a single COPY. Returns the rows copied.
+    The column types must match the table's, see `conform_to_table`.
+    """
+    statement = sql.SQL("COPY {} ({}) FROM STDIN (FORMAT binary)").format(
+        sql.Identifier(table_name), _identifiers(df.columns)
+    )
+
+    with conn.cursor() as cur, cur.copy(statement) as copy:
+        copy.write(COPY_BINARY_HEADER)
+        for batch in df.iter_slices(batch_size):
+            copy.write(encode_copy_binary(batch))
+        copy.write(COPY_BINARY_TRAILER)
+
+    return df.height
+
+
+def upsert_to_postgres(
+    conn: psycopg.Connection,
+    df: pl.DataFrame,
+    table_name: str,
+    key_columns: Sequence[str],
+    batch_size: int,
+) -> dict[str, int]:
+    """
+    Merge `df` into `table_name` on `key_columns`
+
+    The rows are COPYed into an unlogged staging table and merged with one
+    `INSERT ... ON CONFLICT DO UPDATE`, which only rewrites rows whose
+    content hash changed. Of the rows duplicated within `df`, the last one
+    is merged. `df` is first cast to the table's column types (see
+    `conform_to_table`). Returns the number of rows inserted, updated and
+    skipped.
+    """
+    df = conform_to_table(conn, df, table_name)
+    staging_table = f"{table_name}_staging"
+    value_columns = [column for column in df.columns if column not in key_columns]
+
+    # recreated on every run so it follows the target table's columns; COPY
+    # numbers the rows in the order of `df`
+    conn.execute(
+        sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(staging_table))
+    )
+    conn.execute(
+        sql.SQL(
+            "CREATE UNLOGGED TABLE {} "
+            "(LIKE {}, {} bigint GENERATED ALWAYS AS IDENTITY)"
+        ).format(
+            sql.Identifier(staging_table),
+            sql.Identifier(table_name),
+            sql.Identifier(STAGING_ORDINAL_COLUMN),
+        )
+    )
+    staged = copy_to_postgres(conn, df, staging_table, batch_size)
+
+    inserted, updated = conn.execute(
+        sql.SQL(
+            """
+            WITH merged AS (
+                INSERT INTO {table} ({columns}, {row_hash})
+                SELECT DISTINCT ON ({keys})
+                    {columns}, md5(ROW({values})::text)::uuid
+                FROM {staging}
+                ORDER BY {keys}, {ordinal} DESC
+                ON CONFLICT ({keys}) DO UPDATE
+                SET ({values}, {row_hash}) = ROW({excluded}, EXCLUDED.{row_hash})
+                WHERE {table}.{row_hash} IS DISTINCT FROM EXCLUDED.{row_hash}
+                -- xmax is only set on rows that already existed
+                RETURNING xmax = 0 AS inserted
+            )
+            SELECT
+                count(*) FILTER (WHERE inserted),
+                count(*) FILTER (WHERE NOT inserted)
+            FROM merged
+            """
+        ).format(
+            table=sql.Identifier(table_name),
+            staging=sql.Identifier(staging_table),
+            row_hash=sql.Identifier(ROW_HASH_COLUMN),
+            ordinal=sql.Identifier(STAGING_ORDINAL_COLUMN),
+            columns=_identifiers(df.columns),
+            keys=_identifiers(key_columns),
+            values=_identifiers(value_columns),
+            excluded=sql.SQL(", ").join(
+                sql.SQL("EXCLUDED.{}").format(sql.Identifier(column))
+                for column in value_columns
+            ),
+        )
+    ).fetchone()
+
+    conn.execute(
+        sql.SQL("DROP TABLE {}").format(sql.Identifier(staging_table))
+    )
+
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "skipped": staged - inserted - updated,
+    }
+
+
+def read_matching_rows(
+    conn: psycopg.Connection,
+    df: pl.DataFrame,
+    table_name: str,
+    key_columns: Sequence[str],
+) -> pl.DataFrame:
+    """
+    The rows of `table_name` with the same key as a row of `df`, read into
+    a frame with `df`'s schema
+
+    The keys are sent as one array per key column, so a single query reads
+    all of them.
+    """
+    keys = df.select(key_columns).unique()
+    rows = conn.execute(
+        sql.SQL(
+            "SELECT {columns} FROM {table} WHERE ({keys}) IN (SELECT * FROM unnest({arrays}))"
+        ).format(
+            columns=_identifiers(df.columns),
+            table=sql.Identifier(table_name),
+            keys=_identifiers(key_columns),
+            arrays=sql.SQL(", ").join(
+                sql.SQL("%s::{}[]").format(
+                    postgres_type_sql(table_name, column, dtype)
+                )
+                for column, dtype in keys.schema.items()
+            ),
+        ),
+        [keys[column].to_list() for column in key_columns],
+    ).fetchall()
+    return pl.DataFrame(rows, schema=df.schema, orient="row")
+
+
+def read_watermarks(conn: psycopg.Connection, table_name: str) -> dict[str, int]:
+    """
+    Latest `dt` loaded into `table_name` per city, see `update_watermarks`
+    """
+    watermark_table = f"{table_name}_watermark"
+    exists = conn.execute("SELECT to_regclass(%s)", (watermark_table,)).fetchone()
+    if exists[0] is None:
+        return {}
+
+    rows = conn.execute(
+        sql.SQL("SELECT city_name, dt FROM {}").format(
+            sql.Identifier(watermark_table)
+        )
+    ).fetchall()
+    return dict(rows)
+
+
+def update_watermarks(
+    conn: psycopg.Connection, table_name: str, df: pl.DataFrame
+) -> None:
+    """
+    Advance the per-city watermarks of `table_name` to the latest `dt` in `df`
+
+    The watermarks live in a `<table>_watermark` table, one row per city, so
+    reading them does not scan the loaded data.
+    """
+    watermark_table = f"{table_name}_watermark"
+    conn.execute(
+        sql.SQL(
+            "CREATE TABLE IF NOT EXISTS {} (city_name text PRIMARY KEY, dt bigint NOT NULL)"
+        ).format(sql.Identifier(watermark_table))
+    )
+
+    latest = df.group_by("city_name").agg(pl.col("dt").max())
+    with conn.cursor() as cur:
+        cur.executemany(
+            sql.SQL(
+                """
+                INSERT INTO {table} (city_name, dt) VALUES (%s, %s)
+                ON CONFLICT (city_name) DO UPDATE
+                SET dt = greatest({table}.dt, EXCLUDED.dt)
+                """
+            ).format(table=sql.Identifier(watermark_table)),
+            latest.rows(),
+        )
+
+
+def encode_copy_binary(df: pl.DataFrame) -> bytes:
+    """
+    Encode the rows of `df` as PostgreSQL binary COPY tuples
+
+    Each column is turned into an Arrow binary array of complete fields (the
+    int32 length prefix followed by the big-endian value) with numpy, then
+    the fields are joined row-wise by Arrow's compute kernels. No Python
+    object is created per row.
+    """
+    if df.height == 0:
+        return b""
+
+    # each tuple is an int16 field count followed by its fields
+    field_count = _fixed_width_binary(
+        np.full(df.height, df.width, dtype=">i2").view(np.uint8).reshape(-1, 2)
+    )
+    tuples = pc.binary_join_element_wise(
+        field_count,
+        *(_encode_column(series) for series in df.get_columns()),
+        pa.scalar(b"", pa.large_binary()),
+    )
+
+    # the joined tuples are laid out back to back in the data buffer
+    offsets = np.frombuffer(tuples.buffers()[1], dtype=np.int64)
+    start, end = offsets[tuples.offset], offsets[tuples.offset + len(tuples)]
+    return tuples.buffers()[2].slice(start, end - start).to_pybytes()
+
+
+def _encode_column(series: pl.Series) -> pa.Array:
+    """
+    Binary COPY fields of a column, as an Arrow `large_binary` array
+
+    Each field is the int32 byte length of the value followed by the value
+    in PostgreSQL's binary format; a null is just a length of -1.
+    """
+    dtype = series.dtype
+
+    if dtype.base_type() in NUMERIC_TYPES:
+        be_dtype = np.dtype(NUMERIC_TYPES[dtype.base_type()][1])
+        values = series.cast(pl.Int8) if dtype == pl.Boolean else series
+        data = values.fill_null(0).to_numpy()
+    elif isinstance(dtype, pl.Datetime):
+        be_dtype = np.dtype(">i8")
+        data = (series.dt.epoch("us").fill_null(0) - POSTGRES_EPOCH_US).to_numpy()
+    elif dtype == pl.Date:
+        be_dtype = np.dtype(">i4")
+        data = (series.dt.epoch("d").fill_null(0) - POSTGRES_EPOCH_DAYS).to_numpy()
+    elif dtype in (pl.String, pl.Categorical) or isinstance(dtype, pl.Enum):
+        be_dtype = None
+        # enum values are sent as their labels
+        text = series.cast(pl.String).fill_null("")
+        lengths = text.str.len_bytes().to_numpy().astype(">i4")
+        fields = pc.binary_join_element_wise(
+            _fixed_width_binary(lengths.view(np.uint8).reshape(len(series), 4)),
+            text.to_arrow().cast(pa.large_binary()),
+            pa.scalar(b"", pa.large_binary()),
+        )
+    else:
+        raise TypeError(f"Unsupported column type for {series.name}: {dtype}")
+
+    if be_dtype is not None:
+        # length prefix and value bytes side by side, one row per field
+        fields = _fixed_width_binary(
+            np.hstack(
+                [
+                    np.full(len(series), be_dtype.itemsize, dtype=">i4")
+                    .view(np.uint8)
+                    .reshape(len(series), 4),
+                    data.astype(be_dtype).view(np.uint8).reshape(len(series), -1),
+                ]
+            )
+        )
+
+    if series.null_count() == 0:
+        return fields
+    return pc.if_else(
+        series.is_not_null().to_arrow(),
+        fields,
+        pa.scalar(struct.pack(">i", -1), pa.large_binary()),
+    )
+
+
+def _identifiers(names: Sequence[str]) -> sql.Composable:
+    return sql.SQL(", ").join(sql.Identifier(name) for name in names)
+
+
+def _fixed_width_binary(rows: np.ndarray) -> pa.Array:
+    """
+    View a `(rows, width)` uint8 array as a `large_binary` array of its rows
+    """
+    rows = np.ascontiguousarray(rows)
+    fixed = pa.FixedSizeBinaryArray.from_buffers(
+        pa.binary(rows.shape[1]), len(rows), [None, pa.py_buffer(rows)]
+    )
+    return fixed.cast(pa.large_binary())
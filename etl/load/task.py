@@ -1,27 +1,273 @@
-from prefect import task
 import polars as pl
+import psycopg
+
+from etl.load.parquet import write_partitions
+from etl.load.pool import connection
+from etl.load.postgres import (
+    conform_to_table,
+    copy_to_postgres,
+    create_enum_types,
+    create_table,
+    read_matching_rows,
+    read_watermarks,
+    update_watermarks,
+    upsert_to_postgres,
+)
+from etl.metrics import stage_metrics
+from etl.tasks import task
+from etl.transform.aggregation import (
+    AGGREGATE_KEY_COLUMNS,
+    WeatherFrames,
+    collect_frames,
+    merge_aggregates,
+)
+from etl.transform.sketches import (
+    HISTOGRAM_KEY_COLUMNS,
+    SKETCH_KEY_COLUMNS,
+    Sketches,
+    merge_sketches,
+    sketch_drift,
+)
+
+# Natural key of an observation, used by the incremental load
+KEY_COLUMNS = ["city_name", "dt"]
 
 
 @task(log_prints=True)
 def load_weather_data_to_postgres(
-    transformed_weather_df: pl.DataFrame,
+    transformed_weather_df: pl.DataFrame | pl.LazyFrame | WeatherFrames,
     db_connection_uri: str,
-) -> None:
+    table_name: str = "weather",
+    batch_size: int = 100_000,
+    incremental: bool = False,
+) -> dict[str, int]:
     """
     Goal: Load the transformed and cleaned weather data into PostgreSQL.
 
     Task:
 
-    - Database Connection: Establish connection to PostgreSQL database
+    - Database Connection: Borrow a connection from the process's pool (see
+      `etl.load.pool`)
     - Schema Creation
         - Table Creation (if not exists): Implement logic to create the necessary table(s) in PostgreSQL database if they don't exist.
           Define your table schmema based on the transformed data and your analysis needs. Consider:
             - Data types in PostgreSQL that map to your Polars DataFrame columns
             - Choosing primary key (e.g., a combination of data and location, or just date if it's for a single location and daily granularity)
         - Schema Evolution:
+    - Data Loading
+        - Bulk load with `COPY ... FROM STDIN (FORMAT binary)`, encoded from the
+          column buffers `batch_size` rows at a time
+        - Incremental: COPY into an unlogged staging table, then upsert on
+          (`city_name`, `dt`), only updating rows whose content changed
+        - Watermarks: Advance the latest loaded `dt` per city, read back by
+          incremental extracts
+        - Enum Types: Created, or given the labels they are missing, in a
+          transaction of their own (see `create_enum_type`)
+        - Aggregates: Given `WeatherFrames`, merge each period's aggregates
+          into a `<table>_<period>` table (e.g. `weather_daily`). Only the
+          periods the data touches are read back, combined and upserted
+        - Sketches: Given sketches, compare them with the stored ones of the
+          same cities (the history), report any distribution drift, and
+          merge them into `<table>_sketch_moments`/`_sketch_histograms`
+        - Everything is written in one transaction
+
+    Output: Number of rows inserted, updated and skipped
+    """
+    try:
+        with stage_metrics("load") as metrics:
+            # in lazy mode this is where the whole pipeline executes
+            frames = collect_weather_frames(transformed_weather_df)
+            transformed_weather_df = frames.observations
+
+            # committed first, the load cannot use enum labels it adds itself
+            with connection(db_connection_uri) as conn:
+                create_enum_types(conn, table_name, transformed_weather_df.schema)
+                for period, aggregate_df in frames.aggregates.items():
+                    create_enum_types(
+                        conn, f"{table_name}_{period}", aggregate_df.schema
+                    )
+
+            with connection(db_connection_uri) as conn:
+                if incremental:
+                    create_table(
+                        conn, table_name, transformed_weather_df.schema, KEY_COLUMNS
+                    )
+                    result = upsert_to_postgres(
+                        conn,
+                        transformed_weather_df,
+                        table_name,
+                        KEY_COLUMNS,
+                        batch_size,
+                    )
+                else:
+                    create_table(conn, table_name, transformed_weather_df.schema)
+                    rows = copy_to_postgres(
+                        conn,
+                        conform_to_table(conn, transformed_weather_df, table_name),
+                        table_name,
+                        batch_size,
+                    )
+                    result = {"inserted": rows, "updated": 0, "skipped": 0}
+
+                update_watermarks(conn, table_name, transformed_weather_df)
+
+                for period, aggregate_df in frames.aggregates.items():
+                    load_aggregates(
+                        conn, aggregate_df, f"{table_name}_{period}", batch_size
+                    )
+                if frames.sketches is not None:
+                    load_sketches(conn, frames.sketches, table_name, batch_size)
+
+            metrics.record(
+                rows_in=transformed_weather_df.height,
+                rows_out=result["inserted"] + result["updated"],
+            )
+
+        print(f"Loaded into {table_name}: {result}")
+        return result
+    except Exception as e:
+        raise e
+
 
+@task(log_prints=True)
+def load_weather_data_to_parquet(
+    transformed_weather_df: pl.DataFrame | pl.LazyFrame | WeatherFrames,
+    parquet_dir: str,
+) -> dict[str, int]:
+    """
+    Goal: Write the transformed weather data to a Parquet feature store, for
+    bulk reads (e.g. model training) that would be slow through PostgreSQL.
+
+    Task:
+
+    - Layout: Hive partitions by city, year and month (see `etl.load.parquet`),
+      read back with `scan_partitions`
+    - Incremental: Only the partitions the data has rows for are rewritten,
+      merged with the rows they already hold (on `dt`)
+    - Atomic Writes: Each partition file is written next to the old one and
+      renamed over it
+    - Range Scans: Whole files are skipped through the partitions. Each file
+      is a single row group (see `ROW_GROUP_ROWS`), sorted on `dt` with
+      min/max statistics
+    - Aggregates and sketches are only loaded into PostgreSQL
+
+    Output: Number of partitions and rows written
     """
     try:
-        return None
+        with stage_metrics("load.parquet") as metrics:
+            transformed_weather_df = collect_weather_frames(
+                transformed_weather_df
+            ).observations
+            partitions = write_partitions(transformed_weather_df, parquet_dir)
+            metrics.record(
+                rows_in=transformed_weather_df.height,
+                rows_out=transformed_weather_df.height,
+            )
+
+        result = {"partitions": partitions, "rows": transformed_weather_df.height}
+        print(f"Loaded into {parquet_dir}: {result}")
+        return result
+    except Exception as e:
+        raise e
+
+
+def collect_weather_frames(
+    transformed_weather_df: pl.DataFrame | pl.LazyFrame | WeatherFrames,
+) -> WeatherFrames:
+    """
+    The transformed observations, their aggregates and sketches (if any) as
+    DataFrames
+
+    A lazy plan is executed here, the aggregates, sketches and validation
+    checks sharing the scan and transform of the observations.
+    """
+    frames = transformed_weather_df
+    if not isinstance(frames, WeatherFrames):
+        frames = WeatherFrames(frames, {})
+    if isinstance(frames.observations, pl.LazyFrame):
+        frames = collect_frames(frames)
+    return frames
+
+
+def load_aggregates(
+    conn: psycopg.Connection,
+    aggregate_df: pl.DataFrame,
+    table_name: str,
+    batch_size: int,
+) -> None:
+    """
+    Merge `aggregate_df` into the aggregates already in `table_name`
+
+    The stored rows of the touched periods are combined with the new ones
+    (see `merge_aggregates`) and upserted, the other periods are left as is.
+    """
+    create_table(conn, table_name, aggregate_df.schema, AGGREGATE_KEY_COLUMNS)
+    stored = read_matching_rows(
+        conn, aggregate_df, table_name, AGGREGATE_KEY_COLUMNS
+    )
+    merged = merge_aggregates(stored, aggregate_df)
+    upsert_to_postgres(conn, merged, table_name, AGGREGATE_KEY_COLUMNS, batch_size)
+    print(f"Merged {merged.height} periods into {table_name}")
+
+
+def load_sketches(
+    conn: psycopg.Connection,
+    sketches: Sketches,
+    table_name: str,
+    batch_size: int,
+) -> None:
+    """
+    Check `sketches` for drift against the stored sketches of the same
+    cities and columns (see `sketch_drift`), then merge them in
+
+    Only the touched cities' sketches are read back, never the observations.
+    """
+    moments_table = f"{table_name}_sketch_moments"
+    histograms_table = f"{table_name}_sketch_histograms"
+    create_table(conn, moments_table, sketches.moments.schema, SKETCH_KEY_COLUMNS)
+    create_table(
+        conn, histograms_table, sketches.histograms.schema, HISTOGRAM_KEY_COLUMNS
+    )
+    # every bin of the touched cities' columns, not only those of the batch
+    stored = Sketches(
+        read_matching_rows(conn, sketches.moments, moments_table, SKETCH_KEY_COLUMNS),
+        read_matching_rows(
+            conn, sketches.histograms, histograms_table, SKETCH_KEY_COLUMNS
+        ),
+    )
+
+    drift = sketch_drift(stored, sketches)
+    drifted = drift.filter("drifted").drop("drifted")
+    print(
+        f"Distribution drift against {table_name}'s history: {drifted.height} "
+        f"of {drift.height} city columns"
+    )
+    if not drifted.is_empty():
+        print(drifted)
+
+    merged = merge_sketches(stored, sketches)
+    upsert_to_postgres(
+        conn, merged.moments, moments_table, SKETCH_KEY_COLUMNS, batch_size
+    )
+    upsert_to_postgres(
+        conn, merged.histograms, histograms_table, HISTOGRAM_KEY_COLUMNS, batch_size
+    )
+
+
+@task(log_prints=True)
+def get_load_watermarks(
+    db_connection_uri: str, table_name: str = "weather"
+) -> dict[str, int]:
+    """
+    Goal: Read the latest `dt` already loaded into PostgreSQL for each city.
+
+    Output: Mapping of city name to its watermark (empty on the first run)
+    """
+    try:
+        with connection(db_connection_uri) as conn:
+            watermarks = read_watermarks(conn, table_name)
+
+        print(f"Watermarks of {table_name}: {len(watermarks)} cities")
+        return watermarks
     except Exception as e:
         raise e
@@ -0,0 +1,217 @@
+import os
+import resource
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import NamedTuple
+
+import polars as pl
+
+METRIC_PREFIX = "weather_etl_stage"
+POOL_METRIC_PREFIX = "weather_etl_db_pool"
+
+# metric name -> (`StageMetrics` field, help text)
+OPENMETRICS = {
+    "wall_seconds": ("wall_time_s", "Wall time of the stage"),
+    "cpu_seconds": ("cpu_time_s", "CPU time of the process during the stage"),
+    "input_rows": ("rows_in", "Rows read by the stage"),
+    "output_rows": ("rows_out", "Rows produced by the stage"),
+    "output_bytes": ("output_bytes", "Estimated size of the stage's output frame"),
+    "peak_rss_bytes": (
+        "peak_rss_bytes",
+        "High-water mark of the process's RSS (since it started) after the stage",
+    ),
+    "peak_rss_growth_bytes": (
+        "peak_rss_growth_bytes",
+        "Growth of the process's RSS high-water mark during the stage",
+    ),
+}
+
+
+class StageMetrics(NamedTuple):
+    stage: str
+    wall_time_s: float
+    cpu_time_s: float
+    rows_in: int | None
+    rows_out: int | None
+    output_bytes: int | None
+    # the process's high-water mark, and how much the stage raised it (0 when
+    # an earlier stage peaked higher); concurrent stages share both
+    peak_rss_bytes: int
+    peak_rss_growth_bytes: int
+
+
+class StageRecorder:
+    """
+    Collects the sizes a stage reports while it is measured
+    """
+
+    __slots__ = ("rows_in", "rows_out", "output_bytes")
+
+    def __init__(self) -> None:
+        self.rows_in = None
+        self.rows_out = None
+        self.output_bytes = None
+
+    def record(
+        self,
+        rows_in: int | None = None,
+        rows_out: int | None = None,
+        output: pl.DataFrame | pl.LazyFrame | None = None,
+    ) -> None:
+        """
+        Record the input/output row counts. An eager `output` frame also
+        sets the output rows and bytes; a LazyFrame has no size yet.
+        """
+        if rows_in is not None:
+            self.rows_in = rows_in
+        if rows_out is not None:
+            self.rows_out = rows_out
+        if isinstance(output, pl.DataFrame):
+            self.rows_out = output.height
+            self.output_bytes = output.estimated_size()
+
+
+class _DisabledRecorder(StageRecorder):
+    def record(self, rows_in=None, rows_out=None, output=None) -> None:
+        pass
+
+
+_DISABLED = _DisabledRecorder()
+_enabled = False
+_collected: list[StageMetrics] = []
+_lock = threading.Lock()
+
+
+def enable_metrics(enabled: bool = True) -> None:
+    """
+    Turn stage metrics on or off, discarding any collected so far
+    """
+    global _enabled
+    with _lock:
+        _enabled = enabled
+        _collected.clear()
+
+
+def metrics_enabled() -> bool:
+    return _enabled
+
+
+def collected_metrics() -> list[StageMetrics]:
+    with _lock:
+        return list(_collected)
+
+
+@contextmanager
+def stage_metrics(stage: str) -> Iterator[StageRecorder]:
+    """
+    Measure the wall time, CPU time and RSS high-water mark of the enclosed
+    stage
+
+    Sizes are reported through the yielded recorder. While metrics are
+    disabled this only yields a recorder that ignores them.
+    """
+    if not _enabled:
+        yield _DISABLED
+        return
+
+    recorder = StageRecorder()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    peak_rss_start = peak_rss_bytes()
+    yield recorder
+
+    peak_rss = peak_rss_bytes()
+
+    metrics = StageMetrics(
+        stage=stage,
+        wall_time_s=time.perf_counter() - wall_start,
+        cpu_time_s=time.process_time() - cpu_start,
+        rows_in=recorder.rows_in,
+        rows_out=recorder.rows_out,
+        output_bytes=recorder.output_bytes,
+        peak_rss_bytes=peak_rss,
+        peak_rss_growth_bytes=peak_rss - peak_rss_start,
+    )
+    with _lock:
+        _collected.append(metrics)
+
+
+def frame_rows(df: pl.DataFrame | pl.LazyFrame | None) -> int | None:
+    """
+    Row count of an eager frame, `None` for a LazyFrame (not yet executed)
+    """
+    return df.height if isinstance(df, pl.DataFrame) else None
+
+
+def peak_rss_bytes() -> int:
+    """
+    High-water mark of the process's RSS since it started
+    """
+    # `ru_maxrss` is reported in bytes on macOS and kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def publish_metrics(
+    metrics_path: str | None = None, pool_stats: dict[str, int] | None = None
+) -> None:
+    """
+    Publish the collected metrics, and the database connection pool's
+    `pool_stats`, as Prefect table artifacts and, with a `metrics_path`, as
+    an OpenMetrics text file
+    """
+    # deferred, as Prefect takes seconds to import
+    from prefect.artifacts import create_table_artifact
+
+    metrics = collected_metrics()
+    create_table_artifact(
+        table=[m._asdict() for m in metrics],
+        key="weather-etl-stage-metrics",
+        description=(
+            "Wall time, CPU time, rows, bytes and RSS high-water mark per stage"
+        ),
+    )
+    if pool_stats:
+        create_table_artifact(
+            table=[{"stat": name, "value": value} for name, value in pool_stats.items()],
+            key="weather-etl-db-pool-stats",
+            description="Connection pool usage, including the time spent waiting for a connection",
+        )
+    if metrics_path:
+        write_openmetrics(metrics_path, metrics, pool_stats)
+
+
+def write_openmetrics(
+    metrics_path: str,
+    metrics: list[StageMetrics],
+    pool_stats: dict[str, int] | None = None,
+) -> None:
+    """
+    Write `metrics` (and `pool_stats`) in the OpenMetrics text format, e.g.
+    for the node exporter's textfile collector
+
+    The file is replaced atomically so a scraper never reads it half written.
+    """
+    lines = []
+    for name, (field, help_text) in OPENMETRICS.items():
+        metric = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for m in metrics:
+            value = getattr(m, field)
+            if value is not None:
+                lines.append(f'{metric}{{stage="{m.stage}"}} {value}')
+    for name, value in (pool_stats or {}).items():
+        metric = f"{POOL_METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {metric} Connection pool statistic {name}")
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+    lines.append("# EOF")
+
+    tmp_path = f"{metrics_path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, metrics_path)
@@ -0,0 +1,46 @@
+import contextvars
+from collections import deque
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def pipelined(
+    items: Iterable[T], consume: Callable[[T], R], max_in_flight: int
+) -> list[R]:
+    """
+    Call `consume` on each of `items`, in order, in a background thread, so
+    producing the next items overlaps with consuming the previous ones
+
+    At most `max_in_flight` items are handed over and not yet consumed;
+    beyond that, producing waits for the oldest (backpressure), which bounds
+    the memory held by the pipeline. The first error of either side stops
+    the pipeline and is raised.
+    """
+    if max_in_flight < 1:
+        raise ValueError(f"max_in_flight must be at least 1: {max_in_flight}")
+
+    results = []
+    in_flight: deque[Future[R]] = deque()
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipelined") as executor:
+        try:
+            for item in items:
+                # collect finished items early, so a failure stops production
+                while in_flight and (
+                    in_flight[0].done() or len(in_flight) >= max_in_flight
+                ):
+                    results.append(in_flight.popleft().result())
+                # the consumer runs in the producer's context (e.g. the flow run)
+                context = contextvars.copy_context()
+                in_flight.append(executor.submit(context.run, consume, item))
+            while in_flight:
+                results.append(in_flight.popleft().result())
+        except BaseException:
+            for future in in_flight:
+                future.cancel()
+            raise
+
+    return results
@@ -0,0 +1,201 @@
+import base64
+import hashlib
+import io
+import json
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+import polars as pl
+from prefect.cache_policies import CachePolicy
+from prefect.filesystems import LocalFileSystem
+from prefect.serializers import Serializer
+from prefect.tasks import Task
+from pydantic import Field
+
+import etl.extract
+import etl.extract.task
+import etl.time_index
+import etl.transform
+import etl.transform.cleaning
+import etl.validation
+from etl.extract.cache import content_hash
+from etl.extract.task import find_csv_files
+from etl.transform.aggregation import WeatherFrames
+from etl.transform.sketches import Sketches
+
+# Modules whose source the result of each task depends on: a change to any
+# of them gives new cache keys, so results of the previous code are not read
+EXTRACT_SOURCES = [
+    etl.extract,
+    etl.transform.cleaning,
+    etl.validation,
+    etl.time_index,
+]
+TRANSFORM_SOURCES = [etl.transform, etl.extract.task, etl.validation, etl.time_index]
+
+# Name of the result storage block of a cache directory, which is saved
+# server-side as Prefect requires
+RESULT_STORAGE_BLOCK = "weather-etl-results-{}"
+
+# Extract parameters that only change how the result is computed, not what
+# it is, and are left out of its cache key
+EXTRACT_KEY_EXCLUDED = {"cache_dir", "cache_max_bytes"}
+
+
+class ParquetSerializer(Serializer):
+    """
+    Serializes task results (a DataFrame, or `WeatherFrames`) as Parquet
+
+    `WeatherFrames` are stored as a zip archive of a Parquet file per frame.
+    The bytes are wrapped in base64, as Prefect stores them in a JSON record.
+    """
+
+    type: str = Field(default="parquet", frozen=True)
+
+    def dumps(self, obj: pl.DataFrame | WeatherFrames) -> bytes:
+        if isinstance(obj, WeatherFrames):
+            buffer = io.BytesIO()
+            # the Parquet files are already compressed
+            with zipfile.ZipFile(buffer, "w") as archive:
+                archive.writestr(
+                    "observations.parquet", parquet_bytes(obj.observations)
+                )
+                for period, df in obj.aggregates.items():
+                    archive.writestr(f"aggregates/{period}.parquet", parquet_bytes(df))
+                if obj.sketches is not None:
+                    for name, df in obj.sketches._asdict().items():
+                        archive.writestr(f"sketches/{name}.parquet", parquet_bytes(df))
+            blob = buffer.getvalue()
+        else:
+            blob = parquet_bytes(obj)
+        return base64.b64encode(blob)
+
+    def loads(self, blob: bytes) -> pl.DataFrame | WeatherFrames:
+        blob = base64.b64decode(blob)
+        if blob.startswith(b"PAR1"):
+            return pl.read_parquet(blob)
+
+        aggregates, sketches = {}, {}
+        with zipfile.ZipFile(io.BytesIO(blob)) as archive:
+            observations = pl.read_parquet(archive.read("observations.parquet"))
+            for name in archive.namelist():
+                if name.startswith("aggregates/"):
+                    aggregates[Path(name).stem] = pl.read_parquet(archive.read(name))
+                elif name.startswith("sketches/"):
+                    sketches[Path(name).stem] = pl.read_parquet(archive.read(name))
+        return WeatherFrames(
+            observations, aggregates, Sketches(**sketches) if sketches else None
+        )
+
+
+def parquet_bytes(df: pl.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    df.write_parquet(buffer)
+    return buffer.getvalue()
+
+
+def result_storage(result_cache_dir: str) -> LocalFileSystem:
+    """
+    The local result storage block of `result_cache_dir`, saved (or updated)
+    under a name derived from its absolute path
+    """
+    basepath = str(Path(result_cache_dir).resolve())
+    name = hashlib.blake2b(basepath.encode(), digest_size=6).hexdigest()
+    storage = LocalFileSystem(basepath=basepath)
+    storage.save(RESULT_STORAGE_BLOCK.format(name), overwrite=True)
+    return storage
+
+
+def with_result_cache(
+    task: Task, cache_key_fn, storage: LocalFileSystem, expiration_s: float
+) -> Task:
+    """
+    `task` with its results persisted as Parquet in `storage` and reused,
+    for `expiration_s` seconds, by runs with the same cache key
+
+    A retried or re-run flow thereby skips the tasks that already completed
+    on the same inputs.
+    """
+    return task.with_options(
+        cache_policy=CachePolicy.from_cache_key_fn(cache_key_fn),
+        cache_expiration=timedelta(seconds=expiration_s),
+        persist_result=True,
+        result_storage=storage,
+        result_serializer=ParquetSerializer(),
+    )
+
+
+def extract_cache_key(context, parameters: dict[str, Any]) -> str | None:
+    """
+    Cache key of an extract: the content of the CSV file(s), the other
+    parameters and the source of the code producing the frame
+
+    Lazy extracts return a plan over the files and are not cached.
+    """
+    if parameters.get("lazy"):
+        return None
+    digest = hashlib.blake2b(digest_size=16)
+    for path in find_csv_files(parameters["csv_file_path"]):
+        digest.update(content_hash(path).encode())
+    digest.update(parameters_json(parameters, EXTRACT_KEY_EXCLUDED).encode())
+    digest.update(source_version(*EXTRACT_SOURCES).encode())
+    return f"extract-{digest.hexdigest()}"
+
+
+def transform_cache_key(context, parameters: dict[str, Any]) -> str | None:
+    """
+    Cache key of a transform: the content of the raw frame, the other
+    parameters (e.g. `temperature_unit`) and the source of the transformation
+
+    The raw frame is hashed rather than the input file, as it is what the
+    task is given (e.g. only the rows newer than the watermarks). LazyFrames
+    are plans and are not cached.
+    """
+    raw_weather_df = parameters["raw_weather_df"]
+    if isinstance(raw_weather_df, pl.LazyFrame):
+        return None
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(frame_hash(raw_weather_df).encode())
+    digest.update(parameters_json(parameters, {"raw_weather_df"}).encode())
+    digest.update(source_version(*TRANSFORM_SOURCES).encode())
+    return f"transform-{digest.hexdigest()}"
+
+
+def frame_hash(df: pl.DataFrame) -> str:
+    """
+    Hash of the content and schema of `df`
+
+    Row hashes are only stable within a polars version, which is part of the
+    hash.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{pl.__version__}:{df.schema}".encode())
+    digest.update(df.hash_rows(seed=0).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def parameters_json(parameters: dict[str, Any], excluded: set[str]) -> str:
+    return json.dumps(
+        {name: value for name, value in parameters.items() if name not in excluded},
+        sort_keys=True,
+        default=str,
+    )
+
+
+def source_version(*modules: ModuleType) -> str:
+    """
+    Hash of the source of `modules`, packages including all their modules
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for module in modules:
+        path = Path(module.__file__)
+        if path.name == "__init__.py":
+            files = sorted(path.parent.rglob("*.py"))
+        else:
+            files = [path]
+        for file in files:
+            digest.update(file.read_bytes())
+    return digest.hexdigest()
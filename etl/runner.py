@@ -0,0 +1,244 @@
+from collections.abc import Iterator
+from types import ModuleType
+
+import polars as pl
+
+from etl.extract.chunks import columns_with_values, weather_data_chunks
+from etl.extract.task import extract_weather_data
+from etl.metrics import enable_metrics
+from etl.pipeline import pipelined
+from etl.transform.aggregation import WeatherFrames
+from etl.transform.task import FEATURE_LOOKBACK_S, transform_weather_data
+
+
+def run_weather_etl(
+    csv_file_path: str,
+    db_connection_uri: str,
+    temperature_unit: str,
+    *,
+    lazy: bool = False,
+    load_batch_size: int = 100_000,
+    incremental_load: bool = False,
+    incremental_extract: bool = False,
+    cache_dir: str | None = None,
+    cache_max_bytes: int = 10 * 1024**3,
+    metrics: bool = False,
+    on_invalid: str = "raise",
+    quarantine_dir: str | None = None,
+    compact_schema: bool = False,
+    chunk_max_bytes: int | None = None,
+    pipeline_depth: int = 0,
+    db_pool_min_size: int = 1,
+    db_pool_max_size: int = 4,
+    db_pool_max_lifetime: float = 3600.0,
+    db_pool_timeout: float = 30.0,
+    aggregates: bool = False,
+    parquet_dir: str | None = None,
+    sketches: bool = False,
+    extract=extract_weather_data,
+    transform=transform_weather_data,
+) -> dict[str, int]:
+    """
+    Extract, transform and load the weather data (see `weather_etl_flow`),
+    returning the rows inserted, updated and skipped
+
+    `extract` and `transform` replace the tasks of the full-frame run (e.g.
+    with result caching). Aggregates and sketches need an incremental load.
+    """
+    check_summaries(aggregates, sketches, incremental_load)
+    # per-stage wall/CPU time, rows, bytes and peak RSS, published as a
+    # table artifact (and an OpenMetrics file) when the flow completes
+    enable_metrics(metrics)
+    pool_config = (
+        db_pool_min_size,
+        db_pool_max_size,
+        db_pool_max_lifetime,
+        db_pool_timeout,
+    )
+    # only rows newer than what is already loaded are read, with enough
+    # trailing rows before them for the lookback features
+    load_watermarks = None
+    if incremental_extract or aggregates or sketches:
+        load_watermarks = load_tasks(pool_config).get_load_watermarks(
+            db_connection_uri
+        )
+    watermarks = load_watermarks if incremental_extract else None
+    # daily/monthly aggregates and distribution sketches are merged into
+    # the stored ones, so rows an incremental load already summarized are
+    # left out
+    aggregate_watermarks = load_watermarks if aggregates or sketches else None
+    if chunk_max_bytes:
+        # out-of-core: time-ordered chunks of bounded size are extracted,
+        # transformed and loaded one after another, or with a
+        # `pipeline_depth` the loads overlap the next chunks' transforms
+        load_tasks(pool_config)
+        return weather_etl_in_chunks(
+            csv_file_path,
+            db_connection_uri,
+            temperature_unit,
+            watermarks=watermarks,
+            chunk_max_bytes=chunk_max_bytes,
+            load_batch_size=load_batch_size,
+            incremental_load=incremental_load,
+            on_invalid=on_invalid,
+            quarantine_dir=quarantine_dir,
+            compact_schema=compact_schema,
+            pipeline_depth=pipeline_depth,
+            aggregates=aggregates,
+            aggregate_watermarks=aggregate_watermarks,
+            parquet_dir=parquet_dir,
+            sketches=sketches,
+        )
+
+    # in lazy mode the extract returns a LazyFrame, which is carried
+    # through transform and only executed by the load
+    raw_weather_df = extract(
+        csv_file_path,
+        lazy=lazy,
+        watermarks=watermarks,
+        lookback_s=FEATURE_LOOKBACK_S,
+        cache_dir=cache_dir,
+        cache_max_bytes=cache_max_bytes,
+        on_invalid=on_invalid,
+        quarantine_dir=quarantine_dir,
+    )
+    # rows breaking a validation rule either fail the run or, with
+    # `on_invalid="quarantine"`, are set aside in `quarantine_dir`
+    # with `compact_schema`, labels are enums and measurements Float32,
+    # so the table should be created by a run with the same setting
+    transformed_weather_df = transform(
+        raw_weather_df,
+        temperature_unit,
+        watermarks=watermarks,
+        on_invalid=on_invalid,
+        quarantine_dir=quarantine_dir,
+        compact=compact_schema,
+        aggregate=aggregates,
+        aggregate_watermarks=aggregate_watermarks,
+        sketch=sketches,
+    )
+    load = load_tasks(pool_config)
+    if parquet_dir:
+        # both targets load the same frame, so a lazy plan is only
+        # executed once
+        transformed_weather_df = load.collect_weather_frames(transformed_weather_df)
+    load_result = load.load_weather_data_to_postgres(
+        transformed_weather_df,
+        db_connection_uri,
+        batch_size=load_batch_size,
+        incremental=incremental_load,
+    )
+    if parquet_dir:
+        # Hive-partitioned Parquet feature store for bulk reads
+        load.load_weather_data_to_parquet(transformed_weather_df, parquet_dir)
+    return load_result
+
+
+def check_summaries(aggregates: bool, sketches: bool, incremental_load: bool) -> None:
+    """
+    Aggregates and sketches are merged into the stored ones, leaving out the
+    rows before the load's watermarks. A bulk (non-incremental) load inserts
+    every row again on a re-run, so it cannot maintain them.
+    """
+    if (aggregates or sketches) and not incremental_load:
+        raise ValueError("aggregates and sketches require incremental_load")
+
+
+def load_tasks(pool_config: tuple[int, int, float, float]) -> ModuleType:
+    """
+    The load tasks, with the connection pool they share sized by
+    `pool_config` (see `PoolConfig`)
+
+    The load modules (psycopg, pyarrow) are imported here, once a run needs
+    the database, so it starts parsing its input sooner.
+    """
+    from etl.load import pool, task
+
+    # database connections are pooled and reused by every task of the
+    # process, the pool is opened on first use
+    pool.configure_pool(pool.PoolConfig(*pool_config))
+    return task
+
+
+def weather_etl_in_chunks(
+    csv_file_path: str,
+    db_connection_uri: str,
+    temperature_unit: str,
+    *,
+    watermarks: dict[str, int] | None,
+    chunk_max_bytes: int,
+    load_batch_size: int,
+    incremental_load: bool,
+    on_invalid: str,
+    quarantine_dir: str | None,
+    compact_schema: bool,
+    pipeline_depth: int = 0,
+    aggregates: bool = False,
+    aggregate_watermarks: dict[str, int] | None = None,
+    parquet_dir: str | None = None,
+    sketches: bool = False,
+) -> dict[str, int]:
+    """
+    Run the transform and load tasks on each chunk of the input (see
+    `weather_data_chunks`), returning the total rows inserted, updated and
+    skipped
+
+    With a `pipeline_depth`, chunks are loaded by a background thread while
+    the next ones are extracted and transformed, with up to `pipeline_depth`
+    transformed chunks waiting for or being loaded. The memory ceiling is
+    shared by the chunks in flight.
+    """
+    # imported by `load_tasks`
+    from etl.load.task import (
+        load_weather_data_to_parquet,
+        load_weather_data_to_postgres,
+    )
+
+    # every chunk keeps the same columns as a full-frame run
+    keep_columns = columns_with_values(csv_file_path)
+
+    def transformed_chunks() -> Iterator[pl.DataFrame | WeatherFrames]:
+        for chunk in weather_data_chunks(
+            csv_file_path,
+            max_bytes=chunk_max_bytes // (pipeline_depth + 1),
+            lookback_s=FEATURE_LOOKBACK_S,
+            watermarks=watermarks,
+            on_invalid=on_invalid,
+            quarantine_dir=quarantine_dir,
+        ):
+            # the context rows before each city's watermark are dropped again
+            yield transform_weather_data(
+                chunk.raw,
+                temperature_unit,
+                watermarks=chunk.watermarks,
+                on_invalid=on_invalid,
+                quarantine_dir=quarantine_dir,
+                compact=compact_schema,
+                keep_columns=keep_columns,
+                aggregate=aggregates,
+                aggregate_watermarks=aggregate_watermarks,
+                sketch=sketches,
+            )
+
+    def load(transformed_weather_df: pl.DataFrame | WeatherFrames) -> dict[str, int]:
+        load_result = load_weather_data_to_postgres(
+            transformed_weather_df,
+            db_connection_uri,
+            batch_size=load_batch_size,
+            incremental=incremental_load,
+        )
+        if parquet_dir:
+            load_weather_data_to_parquet(transformed_weather_df, parquet_dir)
+        return load_result
+
+    if pipeline_depth:
+        # a single loader thread, so chunks are loaded in order
+        chunk_results = pipelined(transformed_chunks(), load, pipeline_depth)
+    else:
+        chunk_results = [load(df) for df in transformed_chunks()]
+
+    load_result = {"inserted": 0, "updated": 0, "skipped": 0}
+    for chunk_result in chunk_results:
+        for key, rows in chunk_result.items():
+            load_result[key] += rows
+    return load_result
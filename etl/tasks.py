@@ -0,0 +1,62 @@
+import functools
+import threading
+from collections.abc import Callable
+from typing import Any
+
+# When set, tasks are plain function calls and Prefect is never imported
+# (e.g. the standalone CLI, see `etl.__main__`)
+_run_directly = False
+_lock = threading.Lock()
+
+
+def run_tasks_directly(enabled: bool = True) -> None:
+    """
+    Call the tasks' functions directly instead of running them as Prefect
+    tasks
+    """
+    global _run_directly
+    with _lock:
+        _run_directly = enabled
+
+
+def task(**options: Any) -> Callable[[Callable], "DeferredTask"]:
+    """
+    `prefect.task`, except that the task is only created (and Prefect, which
+    takes seconds to import, imported) when it is first used as one
+    """
+    return lambda fn: DeferredTask(fn, options)
+
+
+class DeferredTask:
+    """
+    A function that becomes a Prefect task (created with `options`) when it
+    is called or any task attribute (e.g. `with_options`) is used
+
+    `fn` is the function itself, as on a Prefect task.
+    """
+
+    def __init__(self, fn: Callable, options: dict[str, Any]) -> None:
+        functools.update_wrapper(self, fn)
+        self.fn = fn
+        self._options = options
+        self._task = None
+
+    @property
+    def task(self):
+        with _lock:
+            if self._task is None:
+                from prefect import task
+
+                self._task = task(**self._options)(self.fn)
+            return self._task
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        if _run_directly:
+            return self.fn(*args, **kwargs)
+        return self.task(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        # only reached for attributes not set in `__init__`
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.task, name)
@@ -0,0 +1,191 @@
+from datetime import datetime, timedelta
+
+import polars as pl
+
+# Observations are ordered by city, then time, with one row per city and time
+CITY_COLUMN = "city_name"
+TIME_COLUMN = "dt"
+
+
+def is_time_ordered(df: pl.DataFrame, time_column: str = TIME_COLUMN) -> bool:
+    """
+    Whether `df` is ordered by city and `time_column`, without duplicate
+    times within a city
+
+    A single pass comparing each row to the previous one, no sort.
+    """
+    city, time = pl.col(CITY_COLUMN).cast(pl.String), pl.col(time_column)
+    previous_city = city.shift()
+    in_order = (city > previous_city) | (
+        (city == previous_city) & (time > time.shift())
+    )
+    return df.select(in_order.fill_null(True).all()).item()
+
+
+def order_by_time(df: pl.DataFrame, time_column: str = TIME_COLUMN) -> pl.DataFrame:
+    """
+    `df` ordered by city and `time_column`, keeping the last of rows with the
+    same city and time, with the city column flagged as sorted
+
+    Ordered frames (e.g. one file per city, in time order) are only checked.
+    Otherwise the rows are sorted (stably, so the last duplicate is the one
+    read last) and duplicates dropped. The time columns are also flagged as
+    sorted when there is a single city.
+    """
+    if not is_time_ordered(df, time_column):
+        rows = df.height
+        # by name, as `city_ranges` searches
+        city, time = pl.col(CITY_COLUMN).cast(pl.String), pl.col(time_column)
+        df = df.sort(city, time, maintain_order=True)
+        # duplicates are adjacent once sorted
+        df = df.filter(
+            ((city != city.shift(-1)) | (time != time.shift(-1))).fill_null(True)
+        )
+        print(f"Sorted {rows} rows by city and time")
+        if df.height < rows:
+            print(f"Dropped {rows - df.height} rows with a duplicate city and time")
+
+    sorted_columns = {CITY_COLUMN}
+    if df.height and df[CITY_COLUMN][0] == df[CITY_COLUMN][-1]:
+        sorted_columns.update(
+            column for column in [TIME_COLUMN, "dt_iso", time_column] if column in df
+        )
+    return df.with_columns(pl.col(column).set_sorted() for column in sorted_columns)
+
+
+def city_names_of(df: pl.DataFrame) -> pl.Series:
+    """
+    The sorted city column of the ordered `df`, as strings (e.g. instead of
+    categoricals after `compact_schema`, whose codes need not follow the
+    names' order)
+    """
+    cities = df[CITY_COLUMN]
+    if cities.dtype != pl.String:
+        cities = cities.cast(pl.String)
+    return cities.set_sorted()
+
+
+def city_ranges(
+    cities: pl.Series, city_names: list[str] | None = None
+) -> list[tuple[int, int]]:
+    """
+    First row of each of `city_names` (default all) in the sorted `cities`
+    (see `city_names_of`), and the row after its last one (the same when it
+    has none), by binary search
+
+    All cities are found by jumping from each one's first row past its last,
+    rather than scanning the column for distinct names.
+    """
+    if city_names is not None:
+        names = pl.Series(city_names, dtype=pl.String)
+        return list(
+            zip(
+                cities.search_sorted(names, "left"),
+                cities.search_sorted(names, "right"),
+            )
+        )
+    ranges = []
+    row = 0
+    while row < cities.len():
+        end = cities.search_sorted(cities[row], "right")
+        ranges.append((row, end))
+        row = end
+    return ranges
+
+
+def time_slice(
+    df: pl.DataFrame,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    city_names: list[str] | None = None,
+    time_column: str = "dt_iso",
+) -> pl.DataFrame:
+    """
+    The rows of `city_names` (default all) from `start` (inclusive) to `end`
+    (exclusive), UTC datetimes compared with `time_column`
+
+    The range of each city is found by binary search, O(k log n) for `k`
+    cities, and the result is made of zero-copy slices of `df` instead of a
+    filter over every row. `df` is ordered first (see `order_by_time`) unless
+    its city column is flagged as sorted.
+    """
+    if not df[CITY_COLUMN].flags["SORTED_ASC"]:
+        df = order_by_time(df, time_column)
+    bounds = pl.Series(
+        [
+            start if start is not None else datetime.min,
+            end if end is not None else datetime.max,
+        ],
+        dtype=df.schema[time_column],
+    )
+
+    slices = []
+    for first, last in city_ranges(city_names_of(df), city_names):
+        times = df[time_column].slice(first, last - first)
+        # both bounds in one search
+        offset, end_offset = times.search_sorted(bounds, "left")
+        if end_offset > offset:
+            slices.append(df.slice(first + offset, end_offset - offset))
+    return pl.concat(slices) if slices else df.clear()
+
+
+def read_time_series(csv_file_path: str, time_column: str = "time") -> pl.DataFrame:
+    """
+    External observations per city (e.g. of weather stations) from a CSV
+    file with a `city_name` column, a `time_column` of timestamps and any
+    other value columns, ordered for `join_nearest`
+
+    Timestamps with a time zone are converted to UTC, those without are read
+    as UTC, like `dt_iso`.
+    """
+    df = pl.read_csv(csv_file_path, try_parse_dates=True)
+    time = pl.col(time_column)
+    if df.schema[time_column] == pl.String:
+        time = time.str.to_datetime()
+    dtype = df.select(time).to_series().dtype
+    if isinstance(dtype, pl.Datetime) and dtype.time_zone is not None:
+        time = time.dt.convert_time_zone("UTC").dt.replace_time_zone(None)
+    df = df.with_columns(time.cast(pl.Datetime("us")))
+    return order_by_time(df, time_column)
+
+
+def join_nearest(
+    df: pl.DataFrame,
+    series: pl.DataFrame,
+    series_time_column: str = "time",
+    tolerance: str | timedelta | None = None,
+    suffix: str = "_series",
+) -> pl.DataFrame:
+    """
+    `df` with the values of the observation of `series` (see
+    `read_time_series`) of the same city nearest in time to each row, null
+    when there is none within `tolerance` (e.g. "30m")
+
+    Both frames are ordered (see `order_by_time`), so each row is matched by
+    a binary search within its city instead of a cross join: O(n log m) for
+    `n` rows and `m` observations. The matched time is kept as
+    `series_time_column`.
+    """
+    if not df[CITY_COLUMN].flags["SORTED_ASC"]:
+        df = order_by_time(df, "dt_iso")
+    if not series[CITY_COLUMN].flags["SORTED_ASC"]:
+        series = order_by_time(series, series_time_column)
+    # matched on the city names, whatever the columns' dtypes
+    city_dtype = df[CITY_COLUMN].dtype
+    city = pl.col(CITY_COLUMN).cast(pl.String)
+    return (
+        df.with_columns(city)
+        .join_asof(
+            series.with_columns(city),
+            left_on="dt_iso",
+            right_on=series_time_column,
+            by=CITY_COLUMN,
+            strategy="nearest",
+            tolerance=tolerance,
+            suffix=suffix,
+            # polars can only check the times' order over the whole frame,
+            # they are ordered within each city
+            check_sortedness=False,
+        )
+        .with_columns(pl.col(CITY_COLUMN).cast(city_dtype))
+    )
@@ -0,0 +1,166 @@
+from collections.abc import Callable
+from typing import NamedTuple
+
+import polars as pl
+
+from etl.transform.sketches import Sketches
+from etl.transform.transformation import (
+    WEATHER_CONDITION_CATEGORY,
+    WIND_DIRECTION_BINS,
+)
+from etl.transform.utils import FrameT
+
+# Aggregate tables, by the length of their period (a `group_by_dynamic`
+# interval, in UTC)
+AGGREGATE_PERIODS = {"daily": "1d", "monthly": "1mo"}
+
+# Key of an aggregate row, `period_start` is the first day of the period
+AGGREGATE_KEY_COLUMNS = ["city_name", "period_start"]
+
+# Hours of each weather condition category, from which the dominant one is
+# picked, and of each wind direction (a wind rose)
+CATEGORY_COUNT_COLUMNS = {
+    category: f"{category}_count"
+    for category in WEATHER_CONDITION_CATEGORY.categories
+}
+WIND_DIRECTION_COUNT_COLUMNS = {
+    direction: f"wind_{direction.lower()}_count"
+    for direction in WIND_DIRECTION_BINS.dtype.categories
+}
+
+
+class WeatherFrames(NamedTuple):
+    """
+    The transformed observations, their aggregates by period name and their
+    distribution sketches
+
+    Lazy plans may come with `checks`, queries over the same input (e.g.
+    validation counts) executed with them, and a `finish` step applied to
+    the collected observations given the checks' results.
+    """
+
+    observations: FrameT
+    aggregates: dict[str, FrameT]
+    sketches: Sketches | None = None
+    checks: tuple[pl.LazyFrame, ...] = ()
+    finish: Callable[[pl.DataFrame, list[pl.DataFrame]], pl.DataFrame] | None = None
+
+
+def collect_frames(frames: WeatherFrames, **options) -> WeatherFrames:
+    """
+    Execute the lazy plans of `frames` together (`pl.collect_all`, with
+    `options`), so the scan and transform they share only run once, then
+    `finish` the observations
+    """
+    sketches = list(frames.sketches or ())
+    observations, *dfs = pl.collect_all(
+        [
+            frames.observations,
+            *frames.aggregates.values(),
+            *sketches,
+            *frames.checks,
+        ],
+        **options,
+    )
+    aggregates = dict(zip(frames.aggregates, dfs))
+    dfs = dfs[len(aggregates) :]
+    if sketches:
+        sketches = Sketches(*dfs[: len(sketches)])
+    if frames.finish is not None:
+        observations = frames.finish(observations, dfs[len(sketches) :])
+    return WeatherFrames(observations, aggregates, sketches or None)
+
+
+def aggregate_plans(lf: pl.LazyFrame) -> dict[str, pl.LazyFrame]:
+    """
+    The aggregates of every period in `AGGREGATE_PERIODS`, as lazy plans over
+    the transformed observations
+
+    Collect them together with `lf` (`pl.collect_all`) so the transform is
+    only executed once.
+    """
+    return {
+        period: aggregate_weather_data(lf, every)
+        for period, every in AGGREGATE_PERIODS.items()
+    }
+
+
+def aggregate_weather_data(lf: pl.LazyFrame, every: str) -> pl.LazyFrame:
+    """
+    Summarize each city's observations per `every` period
+
+    Each city's rows must be in time order, as for the window features.
+    """
+    return (
+        lf.group_by_dynamic("dt_iso", every=every, group_by="city_name")
+        .agg(aggregate_exprs())
+        .with_columns(
+            pl.col("dt_iso").dt.date().alias("period_start"),
+            dominant_weather_category_expr(),
+        )
+        .select(*AGGREGATE_KEY_COLUMNS, pl.exclude("dt_iso", *AGGREGATE_KEY_COLUMNS))
+    )
+
+
+def aggregate_exprs() -> list[pl.Expr]:
+    return [
+        pl.len().alias("observations"),
+        # the observations with a temperature, which `temp_mean` averages
+        pl.col("temp").count().alias("temp_count"),
+        pl.col("temp").min().alias("temp_min"),
+        pl.col("temp").max().alias("temp_max"),
+        pl.col("temp").mean().alias("temp_mean"),
+        # percipitation totals, from the hourly amounts
+        pl.col("rain_1h").sum().alias("rain_total"),
+        pl.col("snow_1h").sum().alias("snow_total"),
+        *(
+            (pl.col("weather_condition_category") == category).sum().alias(column)
+            for category, column in CATEGORY_COUNT_COLUMNS.items()
+        ),
+        *(
+            (pl.col("wind_direction") == direction).sum().alias(column)
+            for direction, column in WIND_DIRECTION_COUNT_COLUMNS.items()
+        ),
+    ]
+
+
+def dominant_weather_category_expr() -> pl.Expr:
+    """
+    The most frequent weather condition category of a period, from its
+    counts; on a tie the first in `WEATHER_CONDITION_CATEGORY` order
+    """
+    counts = pl.concat_list(list(CATEGORY_COUNT_COLUMNS.values()))
+    return (
+        pl.lit(WEATHER_CONDITION_CATEGORY.categories.cast(WEATHER_CONDITION_CATEGORY))
+        .gather(counts.list.arg_max())
+        .alias("dominant_weather_category")
+    )
+
+
+def merge_aggregates(stored: pl.DataFrame, aggregates: pl.DataFrame) -> pl.DataFrame:
+    """
+    Combine `aggregates` with the `stored` aggregates of the same periods,
+    which summarize other observations (e.g. those of an earlier run)
+    """
+    return (
+        pl.concat([stored, aggregates.select(stored.columns)])
+        .group_by(AGGREGATE_KEY_COLUMNS, maintain_order=True)
+        .agg(
+            pl.col("observations", "temp_count").sum(),
+            pl.col("temp_min").min(),
+            pl.col("temp_max").max(),
+            # null when no part has a temperature
+            (
+                (pl.col("temp_mean") * pl.col("temp_count")).sum()
+                / pl.col("temp_count").sum().replace(0, None)
+            ).alias("temp_mean"),
+            pl.col(
+                "rain_total",
+                "snow_total",
+                *CATEGORY_COUNT_COLUMNS.values(),
+                *WIND_DIRECTION_COUNT_COLUMNS.values(),
+            ).sum(),
+        )
+        .with_columns(dominant_weather_category_expr())
+        .select(stored.columns)
+    )
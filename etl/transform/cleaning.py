@@ -1,38 +1,78 @@
 import polars as pl
 
+from etl.transform.utils import FrameT
 
-def drop_columns_with_missing_values(df: pl.DataFrame) -> pl.DataFrame:
-    columns = df.columns()
-    all_null_columns = []
-    for column in columns:
-        if is_all_null(df, column):
-            all_null_columns.append(column)
 
-    return df.drop(all_null_columns)
+def drop_columns_with_missing_values(
+    df: FrameT, keep: list[str] | None = None
+) -> FrameT:
+    """
+    Drop the columns whose values are all null, except those in `keep`
 
+    The non-null check for every column is computed in a single aggregation,
+    which for a LazyFrame is one streaming pass over the data.
+    """
+    has_values = has_values_plan(df).collect(streaming=True)
+    return df.drop(all_null_columns(has_values, keep))
 
-def is_all_null(df: pl.DataFrame, column: str) -> bool:
-    non_null_count = df.select(pl.col(column).is_not_null().sum()).item()
-    return non_null_count == 0
 
+def has_values_plan(df: FrameT, columns: list[str] | None = None) -> pl.LazyFrame:
+    """
+    One row telling for each of `columns` (default all) whether it has a
+    non-null value
+    """
+    exprs = pl.col(columns) if columns is not None else pl.all()
+    return df.lazy().select(exprs.is_not_null().any())
+
+
+def all_null_columns(
+    has_values: pl.DataFrame, keep: list[str] | None = None
+) -> list[str]:
+    """
+    The columns without a value in `has_values` (see `has_values_plan`),
+    except those in `keep`
+    """
+    keep = keep or []
+    return [
+        column
+        for column in has_values.columns
+        if not has_values[column].item() and column not in keep
+    ]
+
+
+def convert_to_datetime(df: FrameT, column_name: str) -> FrameT:
+    return df.with_columns(to_datetime_expr(column_name))
 
-def convert_to_datetime(df: pl.DataFrame, column_name: str) -> pl.DataFrame:
-    df = df.with_columns(
-        pl.col(column_name).str.replace(" \\+0000 UTC$", "").alias(column_name)
-    )
 
-    df = df.with_columns(
+def to_datetime_expr(column_name: str, epoch_column: str | None = None) -> pl.Expr:
+    """
+    An OpenWeather timestamp column ("2015-01-01 00:00:00 +0000 UTC") as a
+    UTC datetime
+
+    With an `epoch_column` (seconds since the epoch, like `dt`) the datetime
+    is computed from it and no string is parsed. Otherwise the fixed-width
+    date and time prefix of each string is parsed, without a regex.
+    """
+    if epoch_column:
+        return (
+            pl.from_epoch(epoch_column, time_unit="s")
+            .cast(pl.Datetime("us"))
+            .alias(column_name)
+        )
+    return (
         pl.col(column_name)
-        .str.strptime(dtype=pl.Datetime, format="%Y-%m-%d %H:%M:%S")
+        .str.slice(0, 19)
+        .str.strptime(dtype=pl.Datetime("us"), format="%Y-%m-%d %H:%M:%S")
         .alias(column_name)
     )
 
-    return df
 
+def convert_to_float(df: FrameT, columns: list[str]) -> FrameT:
+    return df.with_columns(to_float_exprs(columns))
 
-def convert_to_float(df: pl.DataFrame, columns: list[str]) -> pl.DataFrame:
-    for column in columns:
-        df = df.with_columns(
-            pl.col(column).cast(pl.Float64, strict=False).alias(column)
-        )
-    return df
+
+def to_float_exprs(columns: list[str]) -> list[pl.Expr]:
+    return [
+        pl.col(column).cast(pl.Float64, strict=False).alias(column)
+        for column in columns
+    ]
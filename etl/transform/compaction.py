@@ -0,0 +1,115 @@
+import polars as pl
+
+from etl.transform.utils import FrameT
+
+# Columns duplicating another column: dropped column -> column kept
+REDUNDANT_COLUMNS = {"temp_difference": "temp_range"}
+
+# Measurements, reported with at most two decimals, and the features derived
+# from them. Float32 keeps ~7 significant digits, i.e. a relative error below
+# `FLOAT32_RTOL`.
+FLOAT32_COLUMNS = [
+    "temp",
+    "dew_point",
+    "feels_like",
+    "temp_min",
+    "temp_max",
+    "wind_speed",
+    "wind_gust",
+    "rain_1h",
+    "rain_3h",
+    "snow_1h",
+    "snow_3h",
+    "gust_ratio",
+    "comfort_index",
+    "heat_index",
+    "dew_point_depression",
+    "apparent_temp_diff",
+    "wind_chill",
+    "temp_range",
+    "humidex",
+    "temp_rolling_mean_6h",
+    "temp_rolling_mean_24h",
+    "temp_daily_min",
+    "temp_daily_max",
+]
+FLOAT32_RTOL = 1e-6
+
+# Narrowest dtype holding every plausible value of each column. `dt`,
+# `dt_iso` and the coordinates keep their full width, and the enum label
+# columns are already compact.
+COMPACT_DTYPES: dict[str, pl.DataType] = {
+    **{column: pl.Float32 for column in FLOAT32_COLUMNS},
+    "city_name": pl.Categorical,
+    "weather_description": pl.Categorical,
+    "weather_icon": pl.Categorical,
+    "timezone": pl.Int32,
+    "visibility": pl.Int32,
+    "pressure": pl.Int16,
+    "humidity": pl.Int8,
+    "wind_deg": pl.Int16,
+    "clouds_all": pl.Int8,
+    "weather_id": pl.Int16,
+    "year": pl.Int16,
+    "severity_level": pl.Int8,
+    "pressure_change_3h": pl.Int16,
+    "pressure_change_6h": pl.Int16,
+    "pressure_change_24h": pl.Int16,
+}
+
+
+def compact_schema(df: FrameT) -> FrameT:
+    """
+    Drop the redundant columns and cast the rest to their compact dtypes
+
+    The casts are strict, so a value that does not fit its narrower integer
+    type fails the query instead of wrapping around.
+    """
+    schema = df.collect_schema()
+    redundant = [
+        column
+        for column, kept in REDUNDANT_COLUMNS.items()
+        if column in schema and kept in schema
+    ]
+
+    return df.drop(redundant).with_columns(
+        pl.col(column).cast(dtype)
+        for column, dtype in COMPACT_DTYPES.items()
+        if column in schema
+    )
+
+
+def compaction_report(before: pl.DataFrame, after: pl.DataFrame) -> pl.DataFrame:
+    """
+    Bytes saved per column by `compact_schema`, with the largest absolute
+    change of each numeric value (null when not applicable)
+    """
+    rows = []
+    for series in before.get_columns():
+        compacted = after.get_column(series.name) if series.name in after else None
+        max_abs_error = None
+        if (
+            compacted is not None
+            and series.dtype.is_numeric()
+            and compacted.dtype != series.dtype
+        ):
+            max_abs_error = (compacted.cast(pl.Float64) - series).abs().max()
+
+        bytes_before = series.estimated_size()
+        bytes_after = compacted.estimated_size() if compacted is not None else 0
+        rows.append(
+            {
+                "column": series.name,
+                "dtype_before": str(series.dtype),
+                "dtype_after": str(compacted.dtype) if compacted is not None else None,
+                "bytes_before": bytes_before,
+                "bytes_after": bytes_after,
+                "bytes_saved": bytes_before - bytes_after,
+                "max_abs_error": max_abs_error,
+            }
+        )
+
+    return pl.DataFrame(
+        rows,
+        schema_overrides={"dtype_after": pl.String, "max_abs_error": pl.Float64},
+    ).sort("bytes_saved", descending=True)
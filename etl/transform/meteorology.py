@@ -0,0 +1,145 @@
+import polars as pl
+
+# Intermediates shared by the temperature related features, computed once per
+# row as columns (see `intermediate_exprs`) and dropped after the features
+TEMP_C = "_temp_c"
+DEW_POINT_C = "_dew_point_c"
+HUMIDITY = "_humidity"
+# wind speed in km/h raised to 0.16, the wind term of the wind chill
+WIND_KMH_POW_016 = "_wind_kmh_pow_016"
+# actual vapour pressure in hPa, from the dew point
+VAPOUR_PRESSURE_HPA = "_vapour_pressure_hpa"
+INTERMEDIATE_COLUMNS = [
+    TEMP_C,
+    DEW_POINT_C,
+    HUMIDITY,
+    WIND_KMH_POW_016,
+    VAPOUR_PRESSURE_HPA,
+]
+
+# Rothfusz regression of the heat index, for degrees Celsius and relative
+# humidity in percent: c1 + c2 T + c3 R + c4 T R + c5 T² + c6 R² + c7 T² R
+# + c8 T R² + c9 T² R²
+HEAT_INDEX_COEFFICIENTS = [
+    -8.78469475556,
+    1.61139411,
+    2.33854883889,
+    -0.14611605,
+    -0.012308094,
+    -0.0164248277778,
+    0.002211732,
+    0.00072546,
+    -0.000003582,
+]
+# The heat index is defined above this temperature (°C), the wind chill at or
+# below `WIND_CHILL_MAX_TEMP_C` with at least `WIND_CHILL_MIN_WIND_KMH`
+HEAT_INDEX_MIN_TEMP_C = 27
+WIND_CHILL_MAX_TEMP_C = 10
+WIND_CHILL_MIN_WIND_KMH = 4.8
+
+
+def to_celsius_expr(column_name: str, temperature_unit: str) -> pl.Expr:
+    """
+    `column_name`, in `temperature_unit`, converted to degrees Celsius
+    """
+    column = pl.col(column_name)
+    if temperature_unit.lower() == "kelvin":
+        return column - 273.15
+    elif temperature_unit.lower() == "celsius":
+        return column
+    elif temperature_unit.lower() == "farenheit":
+        return (column - 32) * 5 / 9
+    raise ValueError(f"Invalid temperature unit: {temperature_unit}")
+
+
+def intermediate_exprs(temperature_unit: str, float32: bool = False) -> list[pl.Expr]:
+    """
+    The `INTERMEDIATE_COLUMNS`, from the cleaned columns in `temperature_unit`
+
+    With `float32`, they (and so the features derived from them) are
+    evaluated in Float32, as stored by a compacted schema.
+    """
+    dtype = pl.Float32 if float32 else pl.Float64
+    dew_point_c = to_celsius_expr("dew_point", temperature_unit).cast(dtype)
+    return [
+        to_celsius_expr("temp", temperature_unit).cast(dtype).alias(TEMP_C),
+        dew_point_c.alias(DEW_POINT_C),
+        pl.col("humidity").cast(dtype).alias(HUMIDITY),
+        (pl.col("wind_speed").cast(dtype) * 3.6).pow(0.16).alias(WIND_KMH_POW_016),
+        (6.11 * (5417.7530 * (1 / 273.16 - 1 / (dew_point_c + 273.15))).exp())
+        .cast(dtype)
+        .alias(VAPOUR_PRESSURE_HPA),
+    ]
+
+
+def comfort_index_expr() -> pl.Expr:
+    """
+    Thom's discomfort index, in °C: T - 0.55 (1 - RH / 100) (T - 14.5)
+
+    E.g. 25.74 at 30 °C and 50% humidity, above 24 most people feel
+    uncomfortable.
+    """
+    temp_c = pl.col(TEMP_C)
+    return (temp_c - 0.55 * (1 - pl.col(HUMIDITY) / 100) * (temp_c - 14.5)).alias(
+        "comfort_index"
+    )
+
+
+def heat_index_expr() -> pl.Expr:
+    """
+    Heat index in °C (see `HEAT_INDEX_COEFFICIENTS`), the temperature below
+    `HEAT_INDEX_MIN_TEMP_C`
+
+    E.g. 35.0 °C at 30 °C and 70% humidity (95 °F at 86 °F in the NWS
+    table).
+    """
+    t, r = pl.col(TEMP_C), pl.col(HUMIDITY)
+    c = HEAT_INDEX_COEFFICIENTS
+    heat_index = (
+        c[0]
+        + t * (c[1] + t * c[4])
+        + r * (c[2] + r * c[5])
+        + t * r * (c[3] + t * c[6] + r * c[7] + t * r * c[8])
+    )
+    return (
+        pl.when(t > HEAT_INDEX_MIN_TEMP_C)
+        .then(heat_index)
+        .otherwise(t)
+        .alias("heat_index")
+    )
+
+
+def wind_chill_expr() -> pl.Expr:
+    """
+    Wind chill index in °C (Environment Canada), the temperature when it is
+    above `WIND_CHILL_MAX_TEMP_C` or there is less wind than
+    `WIND_CHILL_MIN_WIND_KMH`
+
+    E.g. -17.9 at -10 °C and 20 km/h of wind.
+    """
+    t, v = pl.col(TEMP_C), pl.col(WIND_KMH_POW_016)
+    return (
+        pl.when((t <= WIND_CHILL_MAX_TEMP_C) & (v >= WIND_CHILL_MIN_WIND_KMH**0.16))
+        .then(13.12 + 0.6215 * t - 11.37 * v + 0.3965 * t * v)
+        .otherwise(t)
+        .alias("wind_chill")
+    )
+
+
+def humidex_expr() -> pl.Expr:
+    """
+    Humidex (Canadian humidity index) in °C: T + 0.5555 (e - 10), with `e`
+    the vapour pressure at the dew point
+
+    E.g. 33.9 at 30 °C with a dew point of 15 °C.
+    """
+    return (pl.col(TEMP_C) + 0.5555 * (pl.col(VAPOUR_PRESSURE_HPA) - 10)).alias(
+        "humidex"
+    )
+
+
+def dew_point_depression_expr() -> pl.Expr:
+    """
+    Difference between the temperature and the dew point, in °C
+    """
+    return (pl.col(TEMP_C) - pl.col(DEW_POINT_C)).alias("dew_point_depression")
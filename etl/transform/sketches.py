@@ -0,0 +1,223 @@
+"""
+Mergeable sketches of the observed distributions, for drift detection
+
+Quantiles come from fixed-width histograms rather than t-digests: the bins
+merge exactly and deterministically by summing, and they are stored as
+plain rows (the binary COPY loader has no array types). There are no
+HyperLogLog distinct counts: the distinct values of continuous measurements
+are not a drift signal, and polars' hashes are not stable across versions,
+so stored registers would not stay mergeable.
+"""
+
+from typing import NamedTuple
+
+import polars as pl
+
+from etl.transform.utils import FrameT
+
+# Columns whose distribution is sketched, with the width of their histogram
+# bins (in the column's unit, e.g. the transform's temperature unit)
+SKETCH_BIN_WIDTHS = {"temp": 0.5, "pressure": 1.0, "humidity": 1.0}
+
+# Key of a sketch, and of one bin of its histogram. A bin covers the values
+# from `bin * width` (inclusive) to `(bin + 1) * width`.
+SKETCH_KEY_COLUMNS = ["city_name", "column_name"]
+HISTOGRAM_KEY_COLUMNS = [*SKETCH_KEY_COLUMNS, "bin"]
+
+# Kolmogorov-Smirnov distance between a batch and the history of a city's
+# column from which the batch is reported as drifted. Small batches must
+# also exceed the two-sample test's critical value at a 0.1% significance
+# level, `KS_CRITICAL_FACTOR * sqrt((n + m) / (n * m))`, so a few hours of
+# observations are not reported as drift.
+DRIFT_MAX_KS = 0.1
+KS_CRITICAL_FACTOR = 1.95
+
+
+class Sketches(NamedTuple):
+    """
+    Mergeable summaries of each city's `SKETCH_BIN_WIDTHS` columns
+
+    Both are combined with those of other observations by summing (see
+    `merge_sketches`), so the history never has to be rescanned.
+    """
+
+    # per city and column: observations, min, max, mean and `m2`, the sum of
+    # squared deviations from the mean (the variance times observations - 1)
+    moments: FrameT
+    # per city, column and non-empty bin: observations
+    histograms: FrameT
+
+
+def sketch_weather_data(lf: pl.LazyFrame) -> Sketches:
+    """
+    The sketches of the transformed observations, as lazy plans
+
+    Only the sketched columns are read from `lf`, unpivoted into one value
+    per row, so the moments and the histograms share that scan when
+    collected with the observations (see `collect_frames`).
+    """
+    values = (
+        lf.select(
+            pl.col("city_name").cast(pl.String),
+            *(pl.col(column).cast(pl.Float64) for column in SKETCH_BIN_WIDTHS),
+        )
+        .unpivot(index="city_name", variable_name="column_name")
+        .drop_nulls("value")
+    )
+    value = pl.col("value")
+    moments = values.group_by(SKETCH_KEY_COLUMNS).agg(
+        pl.len().alias("observations"),
+        value.min().alias("min"),
+        value.max().alias("max"),
+        value.mean().alias("mean"),
+        ((value - value.mean()) ** 2).sum().alias("m2"),
+    )
+    bin_width = pl.col("column_name").replace_strict(
+        SKETCH_BIN_WIDTHS, return_dtype=pl.Float64
+    )
+    histograms = (
+        values.with_columns((value / bin_width).floor().cast(pl.Int32).alias("bin"))
+        .group_by(HISTOGRAM_KEY_COLUMNS)
+        .agg(pl.len().alias("observations"))
+    )
+    return Sketches(moments, histograms)
+
+
+def merge_sketches(stored: Sketches, sketches: Sketches) -> Sketches:
+    """
+    Combine `sketches` with the `stored` sketches of the same cities and
+    columns, which summarize other observations (e.g. those of earlier runs)
+    """
+    n = pl.col("observations")
+    mean = (n * pl.col("mean")).sum() / n.sum()
+    moments = (
+        pl.concat([stored.moments, sketches.moments.select(stored.moments.columns)])
+        .group_by(SKETCH_KEY_COLUMNS, maintain_order=True)
+        .agg(
+            n.sum(),
+            pl.col("min").min(),
+            pl.col("max").max(),
+            mean.alias("mean"),
+            # the parts' squared deviations, plus those of their means
+            (pl.col("m2") + n * (pl.col("mean") - mean) ** 2).sum().alias("m2"),
+        )
+    )
+    histograms = (
+        pl.concat(
+            [stored.histograms, sketches.histograms.select(stored.histograms.columns)]
+        )
+        .group_by(HISTOGRAM_KEY_COLUMNS, maintain_order=True)
+        .agg(n.sum())
+    )
+    return Sketches(moments, histograms)
+
+
+def sketch_drift(history: Sketches, batch: Sketches) -> pl.DataFrame:
+    """
+    How far the distribution of each of the `batch`'s cities and columns is
+    from its `history`, computed from the sketches alone
+
+    - `ks_distance`: the largest difference between the two cumulative
+      distributions (0 for the same distribution, up to 1), at the
+      resolution of the histogram bins
+    - `mean_shift`: the difference of the means, in standard deviations of
+      the history (null with less than 2 observations of history)
+    - `history_median`/`batch_median`: see `histogram_quantiles`
+    - `drifted`: see `DRIFT_MAX_KS`
+
+    The range checks (see `transform_rules`) reject implausible values, this
+    catches plausible ones drawn from another distribution. Cities and
+    columns without history are left out.
+    """
+    histograms = batch.histograms.join(
+        history.moments.select(SKETCH_KEY_COLUMNS), on=SKETCH_KEY_COLUMNS, how="semi"
+    )
+    cdfs = (
+        cdf(history.histograms, "history_cdf")
+        .join(
+            cdf(histograms, "batch_cdf"),
+            on=HISTOGRAM_KEY_COLUMNS,
+            how="full",
+            coalesce=True,
+        )
+        .sort(HISTOGRAM_KEY_COLUMNS)
+        # a bin only one side has observations in keeps the other's level
+        .with_columns(
+            pl.col("history_cdf", "batch_cdf")
+            .forward_fill()
+            .over(SKETCH_KEY_COLUMNS)
+            .fill_null(0.0)
+        )
+        .group_by(SKETCH_KEY_COLUMNS)
+        .agg(
+            (pl.col("history_cdf") - pl.col("batch_cdf"))
+            .abs()
+            .max()
+            .alias("ks_distance")
+        )
+    )
+    n, m = pl.col("observations"), pl.col("observations_history")
+    # a single observation has no sample standard deviation (nor a shift)
+    history_std = pl.when(m > 1).then((pl.col("m2_history") / (m - 1)).sqrt())
+    ks_critical = KS_CRITICAL_FACTOR * ((n + m) / (n * m)).sqrt()
+    return (
+        batch.moments.join(history.moments, on=SKETCH_KEY_COLUMNS, suffix="_history")
+        .select(
+            *SKETCH_KEY_COLUMNS,
+            "observations",
+            ((pl.col("mean") - pl.col("mean_history")) / history_std).alias(
+                "mean_shift"
+            ),
+            pl.max_horizontal(ks_critical, DRIFT_MAX_KS).alias("max_ks"),
+        )
+        .join(cdfs, on=SKETCH_KEY_COLUMNS)
+        .with_columns((pl.col("ks_distance") > pl.col("max_ks")).alias("drifted"))
+        .drop("max_ks")
+        .join(
+            histogram_quantiles(history.histograms, [0.5]).rename(
+                {"q0.5": "history_median"}
+            ),
+            on=SKETCH_KEY_COLUMNS,
+        )
+        .join(
+            histogram_quantiles(histograms, [0.5]).rename({"q0.5": "batch_median"}),
+            on=SKETCH_KEY_COLUMNS,
+        )
+        .sort(SKETCH_KEY_COLUMNS)
+    )
+
+
+def cdf(histograms: pl.DataFrame, name: str) -> pl.DataFrame:
+    """
+    The share of each city's column observations up to and including each
+    bin, as column `name`
+    """
+    n = pl.col("observations")
+    return (
+        histograms.sort(HISTOGRAM_KEY_COLUMNS)
+        .with_columns((n.cum_sum() / n.sum()).over(SKETCH_KEY_COLUMNS).alias(name))
+        .select(*HISTOGRAM_KEY_COLUMNS, name)
+    )
+
+
+def histogram_quantiles(
+    histograms: pl.DataFrame, quantiles: list[float]
+) -> pl.DataFrame:
+    """
+    Estimated `quantiles` of each city's column (columns `q<quantile>`): the
+    middle of the first bin whose cumulative share reaches the quantile
+    """
+    bin_width = pl.col("column_name").replace_strict(
+        SKETCH_BIN_WIDTHS, return_dtype=pl.Float64
+    )
+    return (
+        cdf(histograms, "cdf")
+        .group_by(SKETCH_KEY_COLUMNS, maintain_order=True)
+        .agg(
+            (
+                (pl.col("bin").filter(pl.col("cdf") >= q).first() + 0.5)
+                * bin_width.first()
+            ).alias(f"q{q}")
+            for q in quantiles
+        )
+    )
@@ -1,28 +1,84 @@
-from prefect import task
+from functools import partial
+
 import polars as pl
 
+from etl.extract.task import EXTRACT_RULES, newer_than_watermark_expr
+from etl.metrics import frame_rows, metrics_enabled, stage_metrics
+from etl.tasks import task
+from etl.time_index import order_by_time
+from etl.transform.aggregation import WeatherFrames, aggregate_plans, collect_frames
 from etl.transform.cleaning import (
-    convert_to_datetime,
-    convert_to_float,
+    all_null_columns,
     drop_columns_with_missing_values,
+    has_values_plan,
+    to_datetime_expr,
+    to_float_exprs,
 )
+from etl.transform.compaction import compact_schema, compaction_report
+from etl.transform.meteorology import INTERMEDIATE_COLUMNS, intermediate_exprs
+from etl.transform.sketches import Sketches, sketch_weather_data
 from etl.transform.transformation import (
-    add_cloud_cover_and_visibility_features,
-    add_pressure_tendency_features,
-    add_temperature_difference,
-    add_temporal_features,
-    add_weather_condition_categories,
-    add_wind_features,
-    add_temperature_related_features,
-    transform_temperature_columns,
+    WINDOW_FEATURE_LOOKBACK_S,
+    derived_feature_exprs,
+    feature_exprs,
+    feature_families,
+    temperature_column_exprs,
+    weather_main_expr,
+)
+from etl.transform.utils import FrameT
+from etl.transform.validation import transform_rules
+from etl.validation import (
+    DeferredCheck,
+    Rule,
+    defer_rules,
+    enforce_rules,
+    valid_rows_expr,
 )
 
+# Columns read by the type conversions and feature engineering below, and the
+# key of each observation. They are kept even when entirely null (e.g. no
+# snowfall in a city's history).
+FEATURE_INPUT_COLUMNS = [
+    "city_name",
+    "dt",
+    "dt_iso",
+    "dew_point",
+    "feels_like",
+    "temp",
+    "temp_min",
+    "temp_max",
+    "pressure",
+    "humidity",
+    "visibility",
+    "wind_speed",
+    "wind_deg",
+    "wind_gust",
+    "rain_1h",
+    "rain_3h",
+    "snow_1h",
+    "snow_3h",
+    "clouds_all",
+    "weather_main",
+]
+
+# Time before each observation (of the same city) read by the feature
+# engineering, in seconds
+FEATURE_LOOKBACK_S = WINDOW_FEATURE_LOOKBACK_S
+
 
 @task(log_prints=True)
 def transform_weather_data(
-    raw_weather_df: pl.DataFrame,
+    raw_weather_df: FrameT,
     temperature_unit: str,
-) -> pl.DataFrame:
+    watermarks: dict[str, int] | None = None,
+    on_invalid: str = "raise",
+    quarantine_dir: str | None = None,
+    compact: bool = False,
+    keep_columns: list[str] | None = None,
+    aggregate: bool = False,
+    aggregate_watermarks: dict[str, int] | None = None,
+    sketch: bool = False,
+) -> FrameT | WeatherFrames:
     """
     Goal: Clean, transform and prepare the raw weather data for loading into PostgreSQL.
 
@@ -33,6 +89,8 @@ def transform_weather_data(
             - Decide on strategy
                 - Imputation: Fill missing values using methods like mean, median, or forward/backward fill
                 - Removal: If missing values are insignificant, might choose to drop rows or columns
+            - All-null columns are dropped, unless in `keep_columns` (e.g. a
+              chunk's columns that have values elsewhere in the input)
         - Data Type Conversion: Ensure all columns have correct data types
             - Convert timestamp columns to `datetime` objects if they are not already
         - Handling Inconsistencies (if any): Look for any data inconsistencies
@@ -43,45 +101,267 @@ def transform_weather_data(
             - Temperature Difference: Calculate the difference between max and min temperatures for each day
             - Datetime Components: Extract day of the week, month, year, season from the date
             - Weather Condition Categorization: Group weather condition descriptions into broader categories (e.g., 'Clear', 'Rainy', 'Cloudy', 'Snowy')
+        - Incremental Runs: With `watermarks`, drop the lookback context rows
+          (at or before the watermark) once the features are computed
+        - Metrics: When stage metrics are enabled, the features are evaluated
+          one `add_*` family at a time so each is measured
     - Data Validation
         - Range Checks: Ensure temperature values in Celsius/Farenheit are within expected ranges
         - Data Consistency: Verify logical consistency between features (e.g., if 'rain' is 0, 'weather condition' shouldn't be 'Heavy Rain')
+        - All rules (see `transform_rules`) are checked in one pass. With
+          `on_invalid="quarantine"`, offending rows are written to
+          `quarantine_dir` and dropped instead of failing the run
+    - Schema Compaction: With `compact`, drop redundant columns and downcast
+      the rest (see `compact_schema`), reporting the bytes saved per column.
+      The comfort indices are then already evaluated in Float32
+    - Aggregation: With `aggregate`, also summarize the valid rows per city
+      and day/month (see `aggregate_plans`), in the same query as the
+      transform. Rows at or before their city's `aggregate_watermarks` are
+      left out, they were aggregated by an earlier run
+    - Sketches: With `sketch`, also summarize the distributions of the valid
+      rows' temperature, pressure and humidity per city (see
+      `sketch_weather_data`), for drift checks against the history, in the
+      same query and leaving out the same rows as the aggregates
 
-    Output: Transformed and Validated Polars DataFrame
+    Output: Transformed and Validated Polars DataFrame, with its aggregates
+    and sketches as `WeatherFrames` when `aggregate` or `sketch` is set.
+    Given a LazyFrame, `WeatherFrames` of lazy plans, executed in a single
+    query with the extract rules and missing value checks, then validated
+    (see `collect_frames`)
     """
     try:
-        # === Data Cleaning ===
-        # --- Missing Value Handling ---
-        # drop columns with all null values
-        df = drop_columns_with_missing_values(raw_weather_df)
-        # --- Data Type Conversion ---
-        # convert `dt_iso` to datetime, represented as string in the CSV
-        df = convert_to_datetime(raw_weather_df, "dt_iso")
+        with stage_metrics("transform") as metrics:
+            metrics.record(rows_in=frame_rows(raw_weather_df))
+            # --- Missing Value Handling ---
+            # columns with all null values are dropped
+            keep = [*FEATURE_INPUT_COLUMNS, *(keep_columns or [])]
+            checks = []
+            lazy = isinstance(raw_weather_df, pl.LazyFrame)
+            if lazy:
+                # the extract rules and the missing values are checked by
+                # queries executed with the transform (see
+                # `finish_lazy_transform`), so the input is only read once
+                raw_weather_df, extract_check = defer_rules(
+                    raw_weather_df, EXTRACT_RULES, on_invalid, quarantine_dir, "extract"
+                )
+                # only the columns that may be dropped are checked
+                droppable = [
+                    column
+                    for column in raw_weather_df.collect_schema().names()
+                    if column not in keep
+                ]
+                checks = [
+                    extract_check.counts(),
+                    has_values_plan(raw_weather_df, droppable),
+                ]
+            else:
+                # the window features read each city's rows in time order
+                raw_weather_df = drop_columns_with_missing_values(
+                    order_by_time(raw_weather_df), keep
+                )
+            if metrics_enabled():
+                lf = transform_by_feature_family(
+                    raw_weather_df.lazy(), temperature_unit, compact
+                ).lazy()
+            else:
+                lf = build_transform_plan(
+                    raw_weather_df.lazy(), temperature_unit, compact
+                )
+            if watermarks:
+                lf = lf.filter(newer_than_watermark_expr(watermarks))
+
+            # === Data Validation ===
+            rules = transform_rules(temperature_unit)
+            plans = ({}, None)
+            if aggregate or sketch:
+                # the aggregates and sketches are computed from the same
+                # scan and transform as the observations
+                plans = build_summary_plans(
+                    lf.filter(valid_rows_expr(rules)),
+                    aggregate,
+                    sketch,
+                    aggregate_watermarks,
+                )
+            if lazy:
+                # executed by the load
+                return WeatherFrames(
+                    lf,
+                    *plans,
+                    checks=tuple(checks),
+                    finish=partial(
+                        finish_lazy_transform,
+                        extract_check=extract_check,
+                        keep_columns=keep,
+                        rules=rules,
+                        on_invalid=on_invalid,
+                        quarantine_dir=quarantine_dir,
+                        compact=compact,
+                    ),
+                )
+            summaries = collect_frames(WeatherFrames(lf, *plans))
+            transformed_weather_df = finish_transform(
+                summaries.observations, rules, on_invalid, quarantine_dir, compact
+            )
+            metrics.record(output=transformed_weather_df)
+            if aggregate or sketch:
+                return summaries._replace(observations=transformed_weather_df)
+            return transformed_weather_df
+    except Exception as e:
+        raise e
+
+
+def finish_transform(
+    transformed_weather_df: pl.DataFrame,
+    rules: list[Rule],
+    on_invalid: str,
+    quarantine_dir: str | None,
+    compact: bool,
+) -> pl.DataFrame:
+    """
+    Enforce the transform `rules` on the collected rows, then compact their
+    schema (with `compact`)
+    """
+    transformed_weather_df = enforce_rules(
+        transformed_weather_df, rules, on_invalid, quarantine_dir, "transform"
+    )
+
+    # === Schema Compaction ===
+    if compact:
+        compacted_weather_df = compact_schema(transformed_weather_df)
+        report = compaction_report(transformed_weather_df, compacted_weather_df)
+        print(
+            f"Schema compaction saved {report['bytes_saved'].sum()} "
+            f"of {report['bytes_before'].sum()} bytes"
+        )
+        print(report.filter(pl.col("bytes_saved") > 0))
+        transformed_weather_df = compacted_weather_df
+    return transformed_weather_df
+
+
+def finish_lazy_transform(
+    transformed_weather_df: pl.DataFrame,
+    checks: list[pl.DataFrame],
+    extract_check: DeferredCheck,
+    keep_columns: list[str],
+    rules: list[Rule],
+    on_invalid: str,
+    quarantine_dir: str | None,
+    compact: bool,
+) -> pl.DataFrame:
+    """
+    The steps of a lazy transform run once its plan is collected (see
+    `WeatherFrames`), given the results of its `checks`: the extract rules'
+    violation counts and which input columns have values
+
+    The input columns without values pass through the transform unchanged,
+    so they are dropped from its output.
+    """
+    extract_counts, has_values = checks
+    extract_check.enforce(extract_counts)
+    transformed_weather_df = transformed_weather_df.drop(
+        all_null_columns(has_values, keep_columns)
+    )
+    return finish_transform(
+        transformed_weather_df, rules, on_invalid, quarantine_dir, compact
+    )
+
+
+def build_summary_plans(
+    lf: pl.LazyFrame,
+    aggregate: bool,
+    sketch: bool,
+    watermarks: dict[str, int] | None = None,
+) -> tuple[dict[str, pl.LazyFrame], Sketches | None]:
+    """
+    The aggregate plans (see `aggregate_plans`) and sketches (see
+    `sketch_weather_data`) of the rows of `lf` newer than their city's
+    watermark, each only when requested
+    """
+    if watermarks:
+        lf = lf.filter(newer_than_watermark_expr(watermarks))
+    return (
+        aggregate_plans(lf) if aggregate else {},
+        sketch_weather_data(lf) if sketch else None,
+    )
+
+
+def build_transform_plan(
+    lf: pl.LazyFrame, temperature_unit: str, float32: bool = False
+) -> pl.LazyFrame:
+    """
+    Build the cleaning and transformation steps as one lazy query plan
+
+    Each stage is a single `with_columns` over expressions, so nothing is
+    materialized between steps and polars can apply common subexpression
+    elimination and projection/predicate pushdown across the whole plan.
+    With `float32`, the comfort indices are evaluated in Float32 (see
+    `intermediate_exprs`).
+    """
+    lf = build_cleaning_plan(lf, temperature_unit)
+    # --- Feature Engineering ---
+    lf = lf.with_columns(intermediate_exprs(temperature_unit, float32))
+    lf = lf.with_columns(feature_exprs())
+    return lf.with_columns(derived_feature_exprs()).drop(INTERMEDIATE_COLUMNS)
+
+
+def transform_by_feature_family(
+    lf: pl.LazyFrame, temperature_unit: str, float32: bool = False
+) -> pl.DataFrame:
+    """
+    The same transform as `build_transform_plan`, with the cleaned data
+    (and the feature intermediates) materialized and each feature family
+    evaluated and measured on its own
+    """
+    with stage_metrics("transform.clean") as metrics:
+        cleaned = (
+            build_cleaning_plan(lf, temperature_unit)
+            .with_columns(intermediate_exprs(temperature_unit, float32))
+            .collect()
+        )
+        metrics.record(output=cleaned)
+
+    features = []
+    for name, exprs in feature_families().items():
+        with stage_metrics(f"transform.{name}") as metrics:
+            family = cleaned.select(exprs)
+            metrics.record(rows_in=cleaned.height, output=family)
+        features.extend(family.get_columns())
+
+    with stage_metrics("transform.derived_features") as metrics:
+        df = (
+            cleaned.with_columns(features)
+            .with_columns(derived_feature_exprs())
+            .drop(INTERMEDIATE_COLUMNS)
+        )
+        metrics.record(rows_in=cleaned.height, output=df)
+    return df
+
+
+def build_cleaning_plan(lf: pl.LazyFrame, temperature_unit: str) -> pl.LazyFrame:
+    """
+    The cleaning and unit conversion steps of `build_transform_plan`
+    """
+    # === Data Cleaning ===
+    # --- Data Type Conversion ---
+    # `dt_iso` is converted to datetime once, by the extract (see
+    # `parse_timestamps`); a frame read some other way still has the strings
+    if lf.collect_schema()["dt_iso"] == pl.String:
+        lf = lf.with_columns(to_datetime_expr("dt_iso", epoch_column="dt"))
+    lf = lf.with_columns(
         # convert `rain_1h`, `rain_3h`, `snow_1h`, `snow_3h` to float, represented as strings in the CSV
-        df = convert_to_float(df, ["rain_1h", "rain_3h", "snow_1h", "snow_3h"])
+        *to_float_exprs(["rain_1h", "rain_3h", "snow_1h", "snow_3h"]),
+        # encode `weather_main` once as an enum, its derived features are
+        # lookups on the enum's physical codes
+        weather_main_expr(),
+    )
 
-        # === Data Transformation ===
-        # --- Unit Conversion ---
-        # convert `dew_point`, `feels_like`, `temp`, `temp_min`, `temp_max` to Celsius or Farenheit (based on `temperature_unit`)
-        df = transform_temperature_columns(
-            df,
+    # === Data Transformation ===
+    # --- Unit Conversion ---
+    # convert `dew_point`, `feels_like`, `temp`, `temp_min`, `temp_max` to Celsius or Farenheit (based on `temperature_unit`)
+    lf = lf.with_columns(
+        temperature_column_exprs(
             ["dew_point", "feels_like", "temp", "temp_min", "temp_max"],
             temperature_unit,
         )
-        # --- Feature Engineering ---
-        df = add_temperature_difference(df)
-        df = add_temporal_features(df)
-        df = add_weather_condition_categories(df)
-        df = add_wind_features(df)
-        df = add_temperature_related_features(df, temperature_unit)
-        df = add_pressure_tendency_features(df)
-        df = add_cloud_cover_and_visibility_features(df)
-
-        # === Data Validation ===
-        # --- Range Checks ---
-        # ...
-        # --- Data Consistency Checks ---
-        # ...
-        return df
-    except Exception as e:
-        raise e
+    )
+    return lf
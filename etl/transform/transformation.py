@@ -1,368 +1,514 @@
+from typing import NamedTuple
+
 import polars as pl
 
+from etl.transform.meteorology import (
+    INTERMEDIATE_COLUMNS,
+    comfort_index_expr,
+    dew_point_depression_expr,
+    heat_index_expr,
+    humidex_expr,
+    intermediate_exprs,
+    wind_chill_expr,
+)
+from etl.time_index import order_by_time
+from etl.transform.utils import FrameT
 
-def transform_temperature_columns(
-    df: pl.DataFrame, columns: list[str], temperature_unit: str
-) -> pl.DataFrame:
-    for column in columns:
-        if temperature_unit == "celsius":
-            df = kelvin_to_celsius(df, column)
-        elif temperature_unit == "farenheit":
-            df = kelvin_to_farenheit(df, column)
 
-    return df
+class Bins(NamedTuple):
+    """
+    Declarative spec for categorizing a numeric column into labelled bins
+
+    `edges` must be sorted and `labels` has one more entry than `edges`: the
+    first label covers values below `edges[0]`, the last values above
+    `edges[-1]`. Bins are closed on the left (`[a, b)`) unless `right_closed`
+    is set (`(a, b]`). A label may repeat, e.g. to wrap around a compass.
+    """
+
+    edges: list[float]
+    labels: list[str]
+    right_closed: bool = False
 
+    @property
+    def dtype(self) -> pl.Enum:
+        return pl.Enum(list(dict.fromkeys(self.labels)))
 
-def kelvin_to_celsius(df: pl.DataFrame, column_name: str) -> pl.DataFrame:
-    return df.with_columns((pl.col(column_name) - 273.15).alias(column_name))
 
+# convert wind direction to cardinal direction
+WIND_DIRECTION_BINS = Bins(
+    edges=[22.5, 67.5, 112.5, 157.5, 202.5, 247.5, 292.5, 337.5],
+    labels=["N", "NE", "E", "SE", "S", "SW", "W", "NW", "N"],
+)
+# wind speed categorization
+WIND_CATEGORY_BINS = Bins(
+    edges=[0.5, 3.3, 7.9, 13.8, 20.7],
+    labels=["calm", "light", "moderate", "fresh", "strong", "storm"],
+)
+# visibility categorization
+VISIBILITY_CATEGORY_BINS = Bins(
+    edges=[1000, 4000, 10000, 20000],
+    labels=["very_poor", "poor", "moderate", "good", "excellent"],
+)
+# cloud cover categorization
+CLOUD_COVER_CATEGORY_BINS = Bins(
+    edges=[10, 30, 70, 90],
+    labels=["clear", "mostly_clear", "partly_cloudy", "mostly_cloudy", "cloudy"],
+    right_closed=True,
+)
 
-def kelvin_to_farenheit(df: pl.DataFrame, column_name: str) -> pl.DataFrame:
-    return df.with_columns((pl.col(column_name) - 273.15) * 9 / 5 + 32).alias(
-        column_name
+
+def binned(column_name: str, bins: Bins) -> pl.Expr:
+    """
+    Categorize `column_name` into the bins described by `bins`
+
+    Each value is located with a binary search over the edges (O(log k) per
+    row, one pass) and its label gathered as an enum. Null values stay null.
+    """
+    value = pl.col(column_name).cast(pl.Float64)
+    index = pl.lit(pl.Series(bins.edges, dtype=pl.Float64)).search_sorted(
+        value, side="left" if bins.right_closed else "right"
     )
+    labels = pl.lit(pl.Series(bins.labels, dtype=bins.dtype))
+
+    return pl.when(value.is_not_null()).then(labels.gather(index)).alias(column_name)
+
+
+def transform_temperature_columns(
+    df: FrameT, columns: list[str], temperature_unit: str
+) -> FrameT:
+    return df.with_columns(temperature_column_exprs(columns, temperature_unit))
+
+
+def temperature_column_exprs(
+    columns: list[str], temperature_unit: str
+) -> list[pl.Expr]:
+    if temperature_unit == "celsius":
+        return [kelvin_to_celsius_expr(column) for column in columns]
+    elif temperature_unit == "farenheit":
+        return [kelvin_to_farenheit_expr(column) for column in columns]
+
+    return []
+
+
+def kelvin_to_celsius(df: FrameT, column_name: str) -> FrameT:
+    return df.with_columns(kelvin_to_celsius_expr(column_name))
+
+
+def kelvin_to_celsius_expr(column_name: str) -> pl.Expr:
+    return (pl.col(column_name) - 273.15).alias(column_name)
+
 
+def kelvin_to_farenheit(df: FrameT, column_name: str) -> FrameT:
+    return df.with_columns(kelvin_to_farenheit_expr(column_name))
 
-def add_temporal_features(df: pl.DataFrame) -> pl.DataFrame:
-    return df.with_columns(
-        [
-            pl.col("dt_iso").dt.year().alias("year"),
-            pl.col("dt_iso").dt.month().alias("month"),
-            pl.col("dt_iso").dt.day().alias("day"),
-            pl.col("dt_iso").dt.hour().alias("hour"),
-            pl.col("dt_iso").dt.weekday().alias("day_of_week"),
-            pl.col("dt_iso").dt.quarter().alias("quarter"),
-            # is weekend flag
-            (pl.col("dt_iso").dt.weekday() >= 5).alias("is_weekend"),
-            # Season (Northern Hemisphere)
-            pl.when(pl.col("dt_iso").dt.month().is_in([12, 1, 2]))
-            .then("winter")
-            .when(pl.col("dt_iso").dt.month().is_in([3, 4, 5]))
-            .then("spring")
-            .when(pl.col("dt_iso").dt.month().is_in([6, 7, 8]))
-            .then("summer")
-            .otherwise("fall")
-            .alias("season"),
-        ]
+
+def kelvin_to_farenheit_expr(column_name: str) -> pl.Expr:
+    return ((pl.col(column_name) - 273.15) * 9 / 5 + 32).alias(column_name)
+
+
+SEASON = pl.Enum(["winter", "spring", "summer", "fall"])
+
+
+def add_temporal_features(df: FrameT) -> FrameT:
+    return df.with_columns(temporal_feature_exprs())
+
+
+def temporal_feature_exprs() -> list[pl.Expr]:
+    return [
+        pl.col("dt_iso").dt.year().alias("year"),
+        pl.col("dt_iso").dt.month().alias("month"),
+        pl.col("dt_iso").dt.day().alias("day"),
+        pl.col("dt_iso").dt.hour().alias("hour"),
+        pl.col("dt_iso").dt.weekday().alias("day_of_week"),
+        pl.col("dt_iso").dt.quarter().alias("quarter"),
+        # is weekend flag
+        (pl.col("dt_iso").dt.weekday() >= 5).alias("is_weekend"),
+        # Season (Northern Hemisphere)
+        pl.when(pl.col("dt_iso").dt.month().is_in([12, 1, 2]))
+        .then(pl.lit("winter", dtype=SEASON))
+        .when(pl.col("dt_iso").dt.month().is_in([3, 4, 5]))
+        .then(pl.lit("spring", dtype=SEASON))
+        .when(pl.col("dt_iso").dt.month().is_in([6, 7, 8]))
+        .then(pl.lit("summer", dtype=SEASON))
+        .otherwise(pl.lit("fall", dtype=SEASON))
+        .alias("season"),
+    ]
+
+
+# Label vocabularies of the `weather_main`-derived category columns
+WEATHER_CONDITION_CATEGORY = pl.Enum(
+    ["clear", "cloudy", "rainy", "snowy", "stormy", "poor_visibility", "windy", "other"]
+)
+WEATHER_DETAILED = pl.Enum(
+    [
+        "clear",
+        "cloudy",
+        "rain",
+        "drizzle",
+        "snow",
+        "thunderstorm",
+        "mist",
+        "fog",
+        "haze",
+        "smoke",
+        "squall",
+        "other",
+    ]
+)
+VISIBILITY_IMPACT = pl.Enum(
+    ["excellent", "moderate", "slightly_reduced", "significantly_reduced"]
+)
+RAIN_INTENSITY = pl.Enum(["light_rain", "moderate_rain", "heavy_rain"])
+SNOW_INTENSITY = pl.Enum(["light_snow", "moderate_snow", "heavy_snow"])
+
+# One row per `weather_main` value OpenWeather reports, holding every label,
+# severity and flag derived from it. The last row ("Other") holds the values
+# used for any condition outside this list, and for a missing one.
+WEATHER_CONDITIONS = pl.DataFrame(
+    [
+        # weather_main, category, detailed, severity, visibility impact
+        ("Clear", "clear", "clear", 0, "excellent"),
+        ("Clouds", "cloudy", "cloudy", 0, "moderate"),
+        ("Rain", "rainy", "rain", 3, "moderate"),
+        ("Drizzle", "rainy", "drizzle", 2, "moderate"),
+        ("Snow", "snowy", "snow", 3, "moderate"),
+        ("Thunderstorm", "stormy", "thunderstorm", 4, "moderate"),
+        ("Mist", "poor_visibility", "mist", 1, "slightly_reduced"),
+        ("Fog", "poor_visibility", "fog", 2, "significantly_reduced"),
+        ("Haze", "poor_visibility", "haze", 1, "slightly_reduced"),
+        ("Smoke", "poor_visibility", "smoke", 1, "significantly_reduced"),
+        ("Squall", "windy", "squall", 3, "moderate"),
+        ("Dust", "other", "other", 0, "moderate"),
+        ("Sand", "other", "other", 0, "moderate"),
+        ("Ash", "other", "other", 0, "moderate"),
+        ("Tornado", "other", "other", 0, "moderate"),
+        ("Other", "other", "other", 0, "moderate"),
+    ],
+    schema={
+        "weather_main": pl.String,
+        "weather_condition_category": WEATHER_CONDITION_CATEGORY,
+        "weather_detailed": WEATHER_DETAILED,
+        "severity_level": pl.Int32,
+        "visibility_impact": VISIBILITY_IMPACT,
+    },
+    orient="row",
+).with_columns(
+    # binary condition flags
+    (pl.col("weather_condition_category") == "clear").alias("is_clear"),
+    (pl.col("weather_condition_category") == "cloudy").alias("is_cloudy"),
+    (pl.col("weather_condition_category") == "rainy").alias("is_rainy"),
+    (pl.col("weather_condition_category") == "snowy").alias("is_snowy"),
+    (pl.col("weather_condition_category") == "stormy").alias("is_stormy"),
+    (pl.col("weather_condition_category") == "poor_visibility").alias(
+        "poor_visibility"
+    ),
+    # conditions that imply percipitation
+    pl.col("weather_main")
+    .is_in(["Rain", "Drizzle", "Snow", "Thunderstorm"])
+    .fill_null(False)
+    .alias("percipitation_condition"),
+    # conditions typical of the winter months
+    pl.col("weather_main")
+    .is_in(["Snow", "Fog"])
+    .fill_null(False)
+    .alias("winter_condition"),
+)
+
+# `weather_main` as an enum; its physical code is the row in `WEATHER_CONDITIONS`
+WEATHER_MAIN = pl.Enum(WEATHER_CONDITIONS["weather_main"])
+CLOUD_DETAIL = pl.Enum(
+    [*WEATHER_MAIN.categories, "partly_cloud", "most_cloudy", "overcast"]
+)
+
+
+def weather_main_expr() -> pl.Expr:
+    """
+    `weather_main` as a `WEATHER_MAIN` enum, unknown conditions become
+    "Other" (missing ones stay null)
+
+    A no-op once the column has been cast by the cleaning stage.
+    """
+    weather_main = pl.col("weather_main").cast(WEATHER_MAIN, strict=False)
+    return (
+        pl.when(weather_main.is_null() & pl.col("weather_main").is_not_null())
+        .then(pl.lit("Other", dtype=WEATHER_MAIN))
+        .otherwise(weather_main)
+        .alias("weather_main")
     )
 
 
-def add_weather_condition_categories(df: pl.DataFrame) -> pl.DataFrame:
-    df = df.with_columns(
+def weather_condition_lookup(column_name: str) -> pl.Expr:
+    """
+    Look up `column_name` in `WEATHER_CONDITIONS` for each row's `weather_main`
+
+    The enum's physical code indexes the table directly, so each row costs a
+    single gather rather than a chain of string comparisons.
+    """
+    row = weather_main_expr().to_physical().fill_null(WEATHER_CONDITIONS.height - 1)
+    return pl.lit(WEATHER_CONDITIONS[column_name]).gather(row).alias(column_name)
+
+
+def add_weather_condition_categories(df: FrameT) -> FrameT:
+    return df.with_columns(weather_condition_category_exprs())
+
+
+def weather_condition_category_exprs() -> list[pl.Expr]:
+    is_clouds = weather_main_expr() == "Clouds"
+    is_rainy = weather_condition_lookup("is_rainy")
+    is_snowy = weather_condition_lookup("is_snowy")
+    month = pl.col("dt_iso").dt.month()
+
+    return [
         # weather type categorization based on values from `weather_main` column
-        [
-            pl.when(pl.col("weather_main") == "Clear")
-            .then("clear")
-            .when(pl.col("weather_main") == "Clouds")
-            .then("cloudy")
-            .when(pl.col("weather_main").is_in(["Rain", "Drizzle"]))
-            .then("rainy")
-            .when(pl.col("weather_main") == "Snow")
-            .then("snowy")
-            .when(pl.col("weather_main") == "Thunderstorm")
-            .then("stormy")
-            .when(pl.col("weather_main").is_in(["Mist", "Fog", "Haze", "Smoke"]))
-            .then("poor_visibility")
-            .when(pl.col("weather_main") == "Squall")
-            .then("windy")
-            .otherwise("other")
-            .alias("weather_condition_category"),
-            # more detailed categorization for specific analysis needs
-            pl.when(pl.col("weather_main") == "Clear")
-            .then("clear")
-            .when(pl.col("weather_main") == "Clouds")
-            .then("cloudy")
-            .when(pl.col("weather_main") == "Rain")
-            .then("rain")
-            .when(pl.col("weather_main") == "Drizzle")
-            .then("drizzle")
-            .when(pl.col("weather_main") == "Snow")
-            .then("snow")
-            .when(pl.col("weather_main") == "Thunderstorm")
-            .then("thunderstorm")
-            .when(pl.col("weather_main") == "Mist")
-            .then("mist")
-            .when(pl.col("weather_main") == "Fog")
-            .then("fog")
-            .when(pl.col("weather_main") == "Haze")
-            .then("haze")
-            .when(pl.col("weather_main") == "Smoke")
-            .then("smoke")
-            .when(pl.col("weather_main") == "Squall")
-            .then("squall")
-            .otherwise("other")
-            .alias("weather_detailed"),
-            # binary condition flags
-            (pl.col("weather_main") == "Clear").alias("is_clear"),
-            (pl.col("weather_main") == "Clouds").alias("is_cloudy"),
-            (pl.col("weather_main").is_in(["Rain", "Drizzle"])).alias("is_rainy"),
-            (pl.col("weather_main") == "Snow").alias("is_snowy"),
-            (pl.col("weather_main") == "Thunderstorm").alias("is_stormy"),
-            (pl.col("weather_main").is_in(["Mist", "Fog", "Haze", "Smoke"])).alias(
-                "poor_visibility"
-            ),
-            # percipitation flags (based on weather condition and percipitation data)
-            (
-                pl.col("weather_main").is_in(
-                    ["Rain", "Drizzle", "Snow", "Thunderstorm"]
-                )
-                | pl.col("rain_1h").is_not_null()
-                | pl.col("snow_1h").is_not_null()
-            ).alias("has_percipitation"),
-            # severity level (general weather condition severity)
-            pl.when(pl.col("weather_main").is_in(["Clear", "Clouds"]))
-            .then(0)  # normal conditions
-            .when(pl.col("weather_main").is_in(["Mist", "Haze", "Smoke"]))
-            .then(1)  # minor impact
-            .when(pl.col("weather_main").is_in(["Fog", "Drizzle"]))
-            .then(2)  # moderate impact
-            .when(pl.col("weather_main").is_in(["Rain", "Snow", "Squall"]))
-            .then(3)  # significant impact
-            .when(pl.col("weather_main") == "Thunderstorm")
-            .then(4)  # severe impact
-            .otherwise(0)
-            .alias("severity_level"),
-        ]
-    )
+        weather_condition_lookup("weather_condition_category"),
+        # more detailed categorization for specific analysis needs
+        weather_condition_lookup("weather_detailed"),
+        # binary condition flags
+        weather_condition_lookup("is_clear"),
+        weather_condition_lookup("is_cloudy"),
+        is_rainy,
+        is_snowy,
+        weather_condition_lookup("is_stormy"),
+        weather_condition_lookup("poor_visibility"),
+        # percipitation flags (based on weather condition and percipitation data)
+        (
+            weather_condition_lookup("percipitation_condition")
+            | pl.col("rain_1h").is_not_null()
+            | pl.col("snow_1h").is_not_null()
+        ).alias("has_percipitation"),
+        # severity level (general weather condition severity)
+        weather_condition_lookup("severity_level"),
+        # enhance weather features combining multiple data points
+        # combine cloud cover with weather conditions
+        pl.lit(pl.Series(CLOUD_DETAIL.categories, dtype=CLOUD_DETAIL))
+        .gather(
+            pl.when(is_clouds & (pl.col("clouds_all") <= 30))
+            .then(len(WEATHER_MAIN.categories))
+            .when(is_clouds & (pl.col("clouds_all") > 30) & (pl.col("clouds_all") <= 70))
+            .then(len(WEATHER_MAIN.categories) + 1)
+            .when(is_clouds & (pl.col("clouds_all") > 70))
+            .then(len(WEATHER_MAIN.categories) + 2)
+            .otherwise(weather_main_expr().to_physical())
+        )
+        .alias("cloud_detail"),
+        # combine rain condition with intensity
+        pl.when(is_rainy & (pl.col("rain_1h").is_null() | (pl.col("rain_1h") < 0.5)))
+        .then(pl.lit("light_rain", dtype=RAIN_INTENSITY))
+        .when(is_rainy & (pl.col("rain_1h") >= 0.5) & (pl.col("rain_1h") < 4.0))
+        .then(pl.lit("moderate_rain", dtype=RAIN_INTENSITY))
+        .when(is_rainy & (pl.col("rain_1h") >= 4.0))
+        .then(pl.lit("heavy_rain", dtype=RAIN_INTENSITY))
+        .otherwise(None)
+        .alias("rain_intensity"),
+        # combine snow condition with intensity
+        pl.when(is_snowy & (pl.col("snow_1h").is_null() | (pl.col("snow_1h") < 0.5)))
+        .then(pl.lit("light_snow", dtype=SNOW_INTENSITY))
+        .when(is_snowy & (pl.col("snow_1h") >= 0.5) & (pl.col("snow_1h") < 4.0))
+        .then(pl.lit("moderate_snow", dtype=SNOW_INTENSITY))
+        .when(is_snowy & (pl.col("snow_1h") >= 4.0))
+        .then(pl.lit("heavy_snow", dtype=SNOW_INTENSITY))
+        .otherwise(None)
+        .alias("snow_intensity"),
+        # visibility impact from weather
+        weather_condition_lookup("visibility_impact"),
+        # weather condition seasonality (useful for time series analysis)
+        (
+            weather_condition_lookup("winter_condition") & month.is_in([12, 1, 2, 3])
+        ).alias("typical_winter_condition"),
+        (
+            weather_condition_lookup("is_stormy") & month.is_in([6, 7, 8])
+        ).alias("typical_summer_condition"),
+    ]
 
-    # enhance weather features combining multiple data points
-    return df.with_columns(
-        [
-            # combine cloud cover with weather conditions
-            pl.when((pl.col("weather_main") == "Clouds") & (pl.col("clouds_all") <= 30))
-            .then("partly_cloud")
-            .when(
-                (pl.col("weather_main") == "Clouds")
-                & (pl.col("clouds_all") > 30)
-                & (pl.col("clouds_all") <= 70)
-            )
-            .then("most_cloudy")
-            .when((pl.col("weather_main") == "Clouds") & (pl.col("clouds_all") > 70))
-            .then("overcast")
-            .otherwise(pl.col("weather_main"))
-            .alias("cloud_detail"),
-            # combine rain condition with intensity
-            pl.when(
-                (pl.col("weather_main").is_in(["Rain", "Drizzle"]))
-                & (pl.col("rain_1h").is_null() | (pl.col("rain_1h") < 0.5))
-            )
-            .then("light_rain")
-            .when(
-                (pl.col("weather_main").is_in(["Rain", "Drizzle"]))
-                & (pl.col("rain_1h") >= 0.5)
-                & (pl.col("rain_1h") < 4.0)
-            )
-            .then("moderate_rain")
-            .when(
-                (pl.col("weather_main").is_in(["Rain", "Drizzle"]))
-                & (pl.col("rain_1h") >= 4.0)
-            )
-            .then("heavy_rain")
-            .otherwise(None)
-            .alias("rain_intensity"),
-            # combine snow condition with intensity
-            pl.when(
-                (pl.col("weather_main") == "Snow")
-                & (pl.col("snow_1h").is_null() | (pl.col("snow_1h") < 0.5))
-            )
-            .then("light_snow")
-            .when(
-                (pl.col("weather_main") == "Snow")
-                & (pl.col("snow_1h") >= 0.5)
-                & (pl.col("snow_1h") < 4.0)
-            )
-            .then("moderate_snow")
-            .when((pl.col("weather_main") == "Snow") & (pl.col("snow_1h") >= 4.0))
-            .then("heavy_snow")
-            .otherwise(None)
-            .alias("snow_intensity"),
-            # visibility impact from weather
-            pl.when(pl.col("weather_main").is_in(["Mist", "Haze"]))
-            .then("slightly_reduced")
-            .when(pl.col("weather_main").is_in(["Fog", "Smoke"]))
-            .then("significantly_reduced")
-            .when(pl.col("weather_main") == "Clear")
-            .then("excellent")
-            .otherwise("moderate")
-            .alias("visibility_impact"),
-            # weather condition seasonality (useful for time series analysis)
-            (
-                pl.col("weather_main").is_in(["Snow", "Fog"])
-                & pl.col("dt_iso").dt.month().is_in([12, 1, 2, 3])
-            ).alias("typical_winter_condition"),
-            (
-                pl.col("weather_main")
-                == "Thunderstorm" & pl.col("dt_iso").dt.month().is_in([6, 7, 8])
-            ).alias("typical_summer_condition"),
-        ]
-    )
 
+def add_wind_features(df: FrameT) -> FrameT:
+    return df.with_columns(wind_feature_exprs())
 
-def add_wind_features(df: pl.DataFrame) -> pl.DataFrame:
-    return df.with_columns(
-        [
-            # convert wind direction to cardinal direction
-            pl.when(pl.col("wind_deg") >= 337.5 | pl.col("wind_deg") < 22.5)
-            .then("N")
-            .when(pl.col("wind_deg") >= 22.5 & pl.col("wind_deg") < 67.5)
-            .then("NE")
-            .when(pl.col("wind_deg") >= 67.5 & pl.col("wind_deg") < 112.5)
-            .then("E")
-            .when(pl.col("wind_deg") >= 112.5 & pl.col("wind_deg") < 157.5)
-            .then("SE")
-            .when(pl.col("wind_deg") >= 157.5 & pl.col("wind_deg") < 202.5)
-            .then("S")
-            .when(pl.col("wind_deg") >= 202.5 & pl.col("wind_deg") < 247.5)
-            .then("SW")
-            .when(pl.col("wind_deg") >= 247.5 & pl.col("wind_deg") < 292.5)
-            .then("W")
-            .otherwise("NW")
-            .alias("wind_direction"),
-            # wind speed categorization
-            pl.when(pl.col("wind_speed") < 0.5)
-            .then("calm")
-            .when(pl.col("wind_speed") < 3.3)
-            .then("light")
-            .when(pl.col("wind_speed") < 7.9)
-            .then("moderate")
-            .when(pl.col("wind_speed") < 13.8)
-            .then("fresh")
-            .when(pl.col("wind_speed") < 20.7)
-            .then("strong")
-            .otherwise("storm")
-            .alias("wind_category"),
-            # wind gust ratio (when available)
-            (pl.col("wind_gust") / pl.col("wind_speed")).alias("gust_ratio"),
-        ]
-    )
+
+def wind_feature_exprs() -> list[pl.Expr]:
+    return [
+        binned("wind_deg", WIND_DIRECTION_BINS).alias("wind_direction"),
+        binned("wind_speed", WIND_CATEGORY_BINS).alias("wind_category"),
+        # wind gust ratio (when available)
+        (pl.col("wind_gust") / pl.col("wind_speed")).alias("gust_ratio"),
+    ]
 
 
 def add_temperature_related_features(
-    df: pl.DataFrame, temperature_unit: str = "kelvin"
-) -> pl.DataFrame:
-    def kelvin_to_celsius(col):
-        return col - 273.15
-
-    def farenheit_to_celsius(col):
-        return (col - 32) * 5 / 9
-
-    def identity(col):
-        return col
-
-    if temperature_unit.lower() == "kelvin":
-        # convert kelvin to celsius
-        to_celsius = kelvin_to_celsius
-        # original temperature is already in kelvin
-        temp_k = pl.col("temp")
-    elif temperature_unit.lower() == "celsius":
-        # already in celsius
-        to_celsius = identity
-        # original temperature is already in celsius
-        temp_k = pl.col("temp")
-    elif temperature_unit.lower() == "farenheit":
-        # convert farenheit to celsius
-        to_celsius = farenheit_to_celsius
-        # convert farenheit to kelvin
-        temp_k = (pl.col("temp") - 32) * (5 / 9) + 273.15
-    else:
-        raise ValueError(f"Invalid temperature unit: {temperature_unit}")
-
-    return df.with_columns(
-        [
-            # temperature comfort index (simplified)
-            (to_celsius(pl.col("temp")) - 0.55 * (1 - pl.col("humidity") / 100))
-            * (to_celsius(pl.col("temp")) - 14.5).alias("comfort_index"),
-            # heat index (when temp > 27C)
-            pl.when(to_celsius(pl.col("temp")) > 27)
-            .then(
-                pl.lit(-8.7846947556)
-                + pl.lit(1.61139411) * to_celsius(pl.col("temp"))
-                + pl.lit(2.33854883889) * pl.col("humidity") / 100
-                - pl.lit(0.14611605)
-                * to_celsius(pl.col("temp"))
-                * pl.col("humidity")
-                / 100
-            )
-            .otherwise(to_celsius(pl.col("temp")))
-            .alias("heat_index"),
-            # dew point depression (difference between temp and dew point)
-            # ensure bother are in the same unit before subtraction
-            (temp_k - pl.col("dew_point")).alias("dew_point_depression"),
-            # apparent temperature difference
-            (pl.col("feels_like") - pl.col("temp")).alias("apparent_temp_diff"),
-            # wind chill (for cold temperatures)
-            pl.when(to_celsius(pl.col("temp")) < 10)
-            .then(
-                13.12
-                + 0.6215 * to_celsius(pl.col("temp"))
-                - 11.37 * pl.col("wind_speed").pow(0.16)
-                + 0.3965 * to_celsius(pl.col("temp")) * pl.col("wind_speed").pow(0.16)
-            )
-            .otherwise(to_celsius(pl.col("temp")))
-            .alias("wind_chill"),
-            # temperature range for measurement
-            (pl.col("temp_max") - pl.col("temp_min")).alias("temp_range"),
-            # humidex (canadian humidity index)
-            (
-                to_celsius(pl.col("temp"))
-                + 0.5555
-                * (
-                    6.11 * pl.exp(5417.7530 * (1 / 273.16 - 1 / (pl.col("dew_point"))))
-                    - 10
-                )
-            ).alias("humidex"),
-        ]
+    df: FrameT, temperature_unit: str = "kelvin", float32: bool = False
+) -> FrameT:
+    return (
+        df.with_columns(intermediate_exprs(temperature_unit, float32))
+        .with_columns(temperature_related_feature_exprs())
+        .drop(INTERMEDIATE_COLUMNS)
     )
 
 
-def add_pressure_tendency_features(df: pl.DataFrame) -> pl.DataFrame:
-    return df.with_columns(
-        [
-            # 3-hour pressure change
-            (pl.col("pressure") - pl.col("pressure").shift(3)).alias(
-                "pressure_change_3h"
-            ),
-            # pressure tendency categorization
-            pl.when((pl.col("pressure") - pl.col("pressure").shift(3)) > 1)
-            .then("rising")
-            .when((pl.col("pressure") - pl.col("pressure").shift(3)) < -1)
-            .then("falling")
-            .otherwise("steady")
-            .alias("pressure_tendency"),
-        ]
+def temperature_related_feature_exprs() -> list[pl.Expr]:
+    """
+    Comfort indices derived from the meteorology intermediates (see
+    `intermediate_exprs`), and the temperature differences
+    """
+    return [
+        comfort_index_expr(),
+        heat_index_expr(),
+        dew_point_depression_expr(),
+        # apparent temperature difference
+        (pl.col("feels_like") - pl.col("temp")).alias("apparent_temp_diff"),
+        wind_chill_expr(),
+        # temperature range for measurement
+        (pl.col("temp_max") - pl.col("temp_min")).alias("temp_range"),
+        humidex_expr(),
+    ]
+
+
+# Time windows of the pressure change features, in hours
+PRESSURE_CHANGE_HOURS = [3, 6, 24]
+# Time windows of the rolling mean temperature features
+TEMPERATURE_ROLLING_MEAN_WINDOWS = ["6h", "24h"]
+# Longest time before an observation read by the window features, in seconds
+WINDOW_FEATURE_LOOKBACK_S = 24 * 3600
+PRESSURE_TENDENCY = pl.Enum(["falling", "steady", "rising"])
+
+
+def add_pressure_tendency_features(df: FrameT) -> FrameT:
+    return (
+        time_ordered(df)
+        .with_columns(pressure_change_exprs())
+        .with_columns(pressure_tendency_expr())
     )
 
 
-def add_cloud_cover_and_visibility_features(df: pl.DataFrame) -> pl.DataFrame:
-    return df.with_columns(
-        [
-            # visibility categorization
-            pl.when(pl.col("visibility") < 1000)
-            .then("very_poor")
-            .when(pl.col("visibility") < 4000)
-            .then("poor")
-            .when(pl.col("visibility") < 10000)
-            .then("moderate")
-            .when(pl.col("visibility") < 20000)
-            .then("good")
-            .otherwise("excellent")
-            .alias("visibility_category"),
-            # cloud cover categorization
-            pl.when(pl.col("clouds_all") <= 10)
-            .then("clear")
-            .when(pl.col("clouds_all") <= 30)
-            .then("mostly_clear")
-            .when(pl.col("clouds_all") <= 70)
-            .then("partly_cloudy")
-            .when(pl.col("clouds_all") <= 90)
-            .then("mostly_cloudy")
-            .otherwise("cloudy")
-            .alias("cloud_cover_category"),
-        ]
+def pressure_change_exprs() -> list[pl.Expr]:
+    return [
+        (pl.col("pressure") - lagged("pressure", hours)).alias(
+            f"pressure_change_{hours}h"
+        )
+        for hours in PRESSURE_CHANGE_HOURS
+    ]
+
+
+def pressure_tendency_expr() -> pl.Expr:
+    """
+    Pressure tendency categorization, from the `pressure_change_3h` feature
+    """
+    return (
+        pl.when(pl.col("pressure_change_3h") > 1)
+        .then(pl.lit("rising", dtype=PRESSURE_TENDENCY))
+        .when(pl.col("pressure_change_3h") < -1)
+        .then(pl.lit("falling", dtype=PRESSURE_TENDENCY))
+        .otherwise(pl.lit("steady", dtype=PRESSURE_TENDENCY))
+        .alias("pressure_tendency")
     )
 
 
-def add_temperature_difference(df: pl.DataFrame) -> pl.DataFrame:
-    return df.with_columns(
-        (pl.col("temp_max") - pl.col("temp_min")).alias("temp_difference")
+def add_rolling_window_features(df: FrameT) -> FrameT:
+    return time_ordered(df).with_columns(rolling_window_feature_exprs())
+
+
+def time_ordered(df: FrameT) -> FrameT:
+    """
+    A DataFrame ordered by city and `dt_iso` (see `order_by_time`), as the
+    window features read each city's rows in time order
+
+    A LazyFrame is returned as is, its rows must already be in that order.
+    """
+    if isinstance(df, pl.DataFrame):
+        return order_by_time(df, "dt_iso")
+    return df
+
+
+def rolling_window_feature_exprs() -> list[pl.Expr]:
+    """
+    Rolling means and daily (UTC) extremes of the temperature, per city
+
+    Windows are defined in time on `dt_iso` rather than in rows, so they stay
+    correct when observations are missing.
+    """
+    day = pl.col("dt_iso").dt.date()
+    return [
+        *(
+            pl.col("temp")
+            .rolling_mean_by("dt_iso", window_size=window)
+            .over("city_name")
+            .alias(f"temp_rolling_mean_{window}")
+            for window in TEMPERATURE_ROLLING_MEAN_WINDOWS
+        ),
+        pl.col("temp").min().over("city_name", day).alias("temp_daily_min"),
+        pl.col("temp").max().over("city_name", day).alias("temp_daily_max"),
+    ]
+
+
+def lagged(column_name: str, hours: int) -> pl.Expr:
+    """
+    Value of a column exactly `hours` before each observation of the same
+    city, null when there is no observation at that time
+
+    Each city's rows must be in time order (see `order_by_time`, done by the
+    extract). The earlier observation is found by binary search on `dt_iso`,
+    so gaps in the data are never bridged.
+    """
+    target = pl.col("dt_iso") - pl.duration(hours=hours)
+    index = pl.col("dt_iso").search_sorted(target).clip(upper_bound=pl.len() - 1)
+
+    return (
+        pl.when(pl.col("dt_iso").gather(index) == target)
+        .then(pl.col(column_name).gather(index))
+        .over("city_name")
     )
+
+
+def add_cloud_cover_and_visibility_features(df: FrameT) -> FrameT:
+    return df.with_columns(cloud_cover_and_visibility_feature_exprs())
+
+
+def cloud_cover_and_visibility_feature_exprs() -> list[pl.Expr]:
+    return [
+        binned("visibility", VISIBILITY_CATEGORY_BINS).alias("visibility_category"),
+        binned("clouds_all", CLOUD_COVER_CATEGORY_BINS).alias("cloud_cover_category"),
+    ]
+
+
+def add_temperature_difference(df: FrameT) -> FrameT:
+    return df.with_columns(temperature_difference_exprs())
+
+
+def temperature_difference_exprs() -> list[pl.Expr]:
+    return [(pl.col("temp_max") - pl.col("temp_min")).alias("temp_difference")]
+
+
+def feature_exprs() -> list[pl.Expr]:
+    """
+    Every engineered feature, as expressions over the cleaned columns and
+    the `intermediate_exprs` intermediates
+
+    None of the expressions read another feature, so they can all be
+    evaluated together in a single `with_columns`.
+    """
+    return [expr for exprs in feature_families().values() for expr in exprs]
+
+
+def feature_families() -> dict[str, list[pl.Expr]]:
+    """
+    The expressions of `feature_exprs`, by the `add_*` function they belong to
+    """
+    return {
+        "add_temperature_difference": temperature_difference_exprs(),
+        "add_temporal_features": temporal_feature_exprs(),
+        "add_weather_condition_categories": weather_condition_category_exprs(),
+        "add_wind_features": wind_feature_exprs(),
+        "add_temperature_related_features": temperature_related_feature_exprs(),
+        "add_pressure_tendency_features": pressure_change_exprs(),
+        "add_rolling_window_features": rolling_window_feature_exprs(),
+        "add_cloud_cover_and_visibility_features": cloud_cover_and_visibility_feature_exprs(),
+    }
+
+
+def derived_feature_exprs() -> list[pl.Expr]:
+    """
+    Features read from other features, evaluated after `feature_exprs`
+
+    Window expressions are not shared by common subexpression elimination,
+    so these reuse the computed column instead of repeating the window.
+    """
+    return [pressure_tendency_expr()]
@@ -0,0 +1,7 @@
+from typing import TypeVar
+
+import polars as pl
+
+# Transformations are written once against the shared DataFrame/LazyFrame API
+# and return the same kind of frame they were given.
+FrameT = TypeVar("FrameT", pl.DataFrame, pl.LazyFrame)
@@ -0,0 +1,59 @@
+import polars as pl
+
+from etl.extract.task import MAX_KELVIN_TEMP, MIN_KELVIN_TEMP
+from etl.transform.transformation import temperature_column_exprs
+from etl.validation import Rule
+
+
+def transform_rules(temperature_unit: str) -> list[Rule]:
+    """
+    Row-level rules every transformed row must pass
+
+    Missing values pass every rule, they are handled by the cleaning steps.
+    """
+    min_temp, max_temp = temperature_range(temperature_unit)
+
+    def valid(expr: pl.Expr) -> pl.Expr:
+        return expr.fill_null(True)
+
+    return [
+        # --- Range Checks ---
+        Rule("valid_temperatures", valid(pl.col("temp").is_between(min_temp, max_temp))),
+        Rule("valid_humidity", valid(pl.col("humidity").is_between(0, 100))),
+        Rule("valid_cloud_cover", valid(pl.col("clouds_all").is_between(0, 100))),
+        Rule("valid_wind_direction", valid(pl.col("wind_deg").is_between(0, 360))),
+        Rule("valid_wind_speed", valid(pl.col("wind_speed") >= 0)),
+        Rule(
+            "valid_precipitation",
+            valid((pl.col("rain_1h") >= 0) & (pl.col("snow_1h") >= 0)),
+        ),
+        # --- Data Consistency Checks ---
+        Rule(
+            "consistent_min_max_temperatures",
+            valid(pl.col("temp_min") <= pl.col("temp_max")),
+        ),
+        # a rainy condition needs some rainfall; rain without one is fine, as
+        # `rain_1h` covers the past hour and `weather_main` is the current
+        # condition (or e.g. snow mixed with rain)
+        Rule(
+            "consistent_rain_condition",
+            valid(
+                ~(
+                    (pl.col("rain_1h") == 0)
+                    & pl.col("weather_main").is_in(["Rain", "Drizzle", "Thunderstorm"])
+                )
+            ),
+        ),
+    ]
+
+
+def temperature_range(temperature_unit: str) -> tuple[float, float]:
+    """
+    The plausible temperature range (see `MIN_KELVIN_TEMP`/`MAX_KELVIN_TEMP`)
+    in `temperature_unit`
+    """
+    return (
+        pl.DataFrame({"min": [float(MIN_KELVIN_TEMP)], "max": [float(MAX_KELVIN_TEMP)]})
+        .with_columns(temperature_column_exprs(["min", "max"], temperature_unit))
+        .row(0)
+    )
@@ -0,0 +1,223 @@
+import os
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+import polars as pl
+
+from etl.transform.utils import FrameT
+
+# What to do with rows that break a rule
+ON_INVALID = ["raise", "quarantine"]
+
+# Column listing the rules a quarantined row breaks
+VIOLATIONS_COLUMN = "violations"
+
+# Column of `violation_counts` with the number of rows checked
+ROWS_COLUMN = "__rows"
+
+
+class Rule(NamedTuple):
+    """
+    A validation rule: `valid` is a row-level boolean expression that is
+    `True` for rows that pass
+    """
+
+    name: str
+    valid: pl.Expr
+
+
+class ValidationReport(NamedTuple):
+    rows: int
+    # rule name -> number of rows breaking it
+    violations: dict[str, int]
+    # rule name -> a few of the rows breaking it (only for broken rules)
+    samples: dict[str, pl.DataFrame]
+
+    @property
+    def passed(self) -> bool:
+        return not any(self.violations.values())
+
+    def summary(self) -> str:
+        broken = [
+            f"{name}: {count} of {self.rows} rows"
+            for name, count in self.violations.items()
+            if count
+        ]
+        return "; ".join(broken) if broken else f"all {self.rows} rows passed"
+
+
+def validation_report(
+    df: pl.DataFrame | pl.LazyFrame,
+    rules: list[Rule],
+    sample_size: int = 5,
+    counts: dict[str, int] | None = None,
+) -> ValidationReport:
+    """
+    Count the rows breaking each rule
+
+    Every rule is reduced to a violation count in a single `select` (see
+    `violation_counts`), so the data is scanned once and no filtered copies
+    are made. `counts` already collected (e.g. with the plans reading the
+    same scan) are used as is. Sample rows are only fetched for rules that
+    are broken.
+    """
+    if counts is None:
+        counts = violation_counts(df, rules).collect(streaming=True).row(0, named=True)
+    counts = dict(counts)
+    rows = counts.pop(ROWS_COLUMN)
+
+    samples = {
+        rule.name: df.lazy().filter(~rule.valid).head(sample_size).collect()
+        for rule in rules
+        if counts[rule.name]
+    }
+    return ValidationReport(rows, counts, samples)
+
+
+def violation_counts(
+    df: pl.DataFrame | pl.LazyFrame, rules: list[Rule]
+) -> pl.LazyFrame:
+    """
+    One row with the number of rows of `df` (`ROWS_COLUMN`) and of those
+    breaking each rule, by rule name
+    """
+    return df.lazy().select(
+        pl.len().alias(ROWS_COLUMN),
+        *((~rule.valid).sum().alias(rule.name) for rule in rules),
+    )
+
+
+def valid_rows_expr(rules: list[Rule]) -> pl.Expr:
+    return pl.all_horizontal(rule.valid for rule in rules)
+
+
+def violations_expr(rules: list[Rule]) -> pl.Expr:
+    """
+    The names of the rules each row breaks, as a list
+    """
+    return (
+        pl.concat_list(
+            pl.when(~rule.valid).then(pl.lit(rule.name)) for rule in rules
+        )
+        .list.drop_nulls()
+        .alias(VIOLATIONS_COLUMN)
+    )
+
+
+def enforce_rules(
+    df: FrameT,
+    rules: list[Rule],
+    on_invalid: str = "raise",
+    quarantine_dir: str | None = None,
+    stage: str = "validation",
+    counts: dict[str, int] | None = None,
+) -> FrameT:
+    """
+    Validate `df` against `rules`, returning the rows to carry on with
+
+    If every row passes, `df` itself is returned. Otherwise either a
+    `ValueError` describing the violations is raised, or (`"quarantine"`)
+    the offending rows are written to `quarantine_dir`, with the rules they
+    break, and only the valid rows are returned (lazily for a LazyFrame).
+    With `counts` (see `violation_counts`), `df` is only read again when a
+    rule is broken.
+    """
+    check_on_invalid(on_invalid)
+
+    report = validation_report(df, rules, counts=counts)
+    if report.passed:
+        return df
+
+    if on_invalid == "raise":
+        raise ValueError(f"{stage} validation failed: {report.summary()}")
+
+    path = quarantine(df, rules, quarantine_dir, stage)
+    print(f"Quarantined rows of {stage} in {path}: {report.summary()}")
+    return df.filter(valid_rows_expr(rules))
+
+
+class DeferredCheck(NamedTuple):
+    """
+    Rules enforced on a lazy plan once the queries reading it are executed
+    (see `defer_rules`)
+    """
+
+    lf: pl.LazyFrame
+    rules: list[Rule]
+    on_invalid: str
+    quarantine_dir: str | None
+    stage: str
+
+    def counts(self) -> pl.LazyFrame:
+        """
+        The violation counts, to collect together with the queries reading
+        `lf` (`pl.collect_all`) so they share its scan
+        """
+        return violation_counts(self.lf, self.rules)
+
+    def enforce(self, counts: pl.DataFrame) -> None:
+        """
+        Raise or quarantine (see `enforce_rules`) given the collected counts
+        """
+        enforce_rules(
+            self.lf,
+            self.rules,
+            self.on_invalid,
+            self.quarantine_dir,
+            self.stage,
+            counts.row(0, named=True),
+        )
+
+
+def defer_rules(
+    lf: pl.LazyFrame,
+    rules: list[Rule],
+    on_invalid: str = "raise",
+    quarantine_dir: str | None = None,
+    stage: str = "validation",
+) -> tuple[pl.LazyFrame, DeferredCheck]:
+    """
+    The rows of `lf` passing `rules`, lazily, and the check enforcing them
+
+    Unlike `enforce_rules`, nothing is read until the check's counts are
+    collected with the plans built on the valid rows, so the data is only
+    scanned once. When a rule is broken, the run then fails or the
+    offending rows are quarantined, like with `enforce_rules`.
+    """
+    check_on_invalid(on_invalid)
+    check = DeferredCheck(lf, rules, on_invalid, quarantine_dir, stage)
+    return lf.filter(valid_rows_expr(rules)), check
+
+
+def check_on_invalid(on_invalid: str) -> None:
+    if on_invalid not in ON_INVALID:
+        raise ValueError(f"on_invalid must be one of {ON_INVALID}: {on_invalid}")
+
+
+def quarantine(
+    df: pl.DataFrame | pl.LazyFrame,
+    rules: list[Rule],
+    quarantine_dir: str | None,
+    stage: str,
+) -> str:
+    """
+    Write the rows of `df` breaking any of `rules` to a Parquet file in
+    `quarantine_dir`, returning its path
+    """
+    if not quarantine_dir:
+        raise ValueError("A quarantine directory is required to quarantine rows")
+
+    os.makedirs(quarantine_dir, exist_ok=True)
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    path = os.path.join(quarantine_dir, f"{stage}-{timestamp}.parquet")
+
+    # the list column cannot be streamed into a sink, but only the offending
+    # rows are ever materialized
+    (
+        df.lazy()
+        .filter(~valid_rows_expr(rules))
+        .with_columns(violations_expr(rules))
+        .collect(streaming=True)
+        .write_parquet(path)
+    )
+    return path
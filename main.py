@@ -6,9 +6,6 @@ if __name__ == "__main__":
     weather_etl_flow.serve(
         name="weather-etl",
         tags=["weather-etl"],
-        parameters={
-            "csv_file_path": settings.csv_file_path,
-            "db_connection_uri": settings.db_connection_uri,
-            "temperature_unit": settings.temperature_unit,
-        },
+        # the flow's parameters are the settings' fields
+        parameters=settings.model_dump(),
     )
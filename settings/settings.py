@@ -2,7 +2,41 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
+    # a CSV file, a directory of CSV files or a glob
     csv_file_path: str
     db_connection_uri: str
     temperature_unit: str
+    lazy: bool = False
+    load_batch_size: int = 100_000
+    incremental_load: bool = False
+    incremental_extract: bool = False
+    cache_dir: str | None = None
+    cache_max_bytes: int = 10 * 1024**3
+    metrics: bool = False
+    metrics_path: str | None = None
+    # "raise" or "quarantine"
+    on_invalid: str = "raise"
+    quarantine_dir: str | None = None
+    compact_schema: bool = False
+    # memory ceiling of the chunked (out-of-core) mode, off when unset
+    chunk_max_bytes: int | None = None
+    # chunks transformed ahead of the load in chunked mode, 0 to not overlap
+    pipeline_depth: int = 0
+    db_pool_min_size: int = 1
+    db_pool_max_size: int = 4
+    # seconds before a pooled connection is replaced
+    db_pool_max_lifetime: float = 3600.0
+    # seconds to wait for a pooled connection
+    db_pool_timeout: float = 30.0
+    # also maintain daily/monthly aggregate tables (needs `incremental_load`)
+    aggregates: bool = False
+    # also write the features to a Hive-partitioned Parquet store here
+    parquet_dir: str | None = None
+    # persist and reuse the extract/transform results (not in lazy or
+    # chunked mode) here, for `result_cache_expiration` seconds
+    result_cache_dir: str | None = None
+    result_cache_expiration: float = 7 * 24 * 3600
+    # also keep per-city distribution sketches and report drift against them
+    # (needs `incremental_load`)
+    sketches: bool = False
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import polars as pl
+
+from etl.transform.aggregation import aggregate_weather_data, merge_aggregates
+
+
+def monthly_aggregates(temps: list[float | None], day: int) -> pl.DataFrame:
+    n = len(temps)
+    observations = pl.DataFrame(
+        {
+            "city_name": ["Bern"] * n,
+            "dt_iso": [datetime(2024, 1, day, hour) for hour in range(n)],
+            "temp": temps,
+            "rain_1h": [None] * n,
+            "snow_1h": [None] * n,
+            "weather_condition_category": [None] * n,
+            "wind_direction": [None] * n,
+        },
+        schema_overrides={
+            "temp": pl.Float64,
+            "rain_1h": pl.Float64,
+            "snow_1h": pl.Float64,
+            "weather_condition_category": pl.String,
+            "wind_direction": pl.String,
+        },
+    )
+    return aggregate_weather_data(observations.lazy(), "1mo").collect()
+
+
+def test_merge_aggregates_weights_the_mean_by_temperatures() -> None:
+    stored = monthly_aggregates([10.0, None, None, None], 1)
+    merged = merge_aggregates(stored, monthly_aggregates([20.0, 30.0], 2))
+
+    assert merged.select("observations", "temp_count", "temp_mean").row(0) == (
+        6,
+        3,
+        20.0,
+    )
+
+
+def test_merge_aggregates_without_temperatures() -> None:
+    stored = monthly_aggregates([None], 1)
+    merged = merge_aggregates(stored, monthly_aggregates([None, None], 2))
+
+    assert merged.select("observations", "temp_count", "temp_mean").row(0) == (
+        3,
+        0,
+        None,
+    )
@@ -0,0 +1,59 @@
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from benchmarks.data import write_weather_csv
+from etl.extract import chunks
+from etl.extract.chunks import columns_with_values, weather_data_chunks
+from etl.extract.task import extract_weather_data
+from etl.transform.task import FEATURE_LOOKBACK_S, transform_weather_data
+
+
+def in_chunks(csv_file_path: str, quarantine_dir: str) -> list[pl.DataFrame]:
+    # as `weather_etl_in_chunks` transforms them
+    keep_columns = columns_with_values(csv_file_path)
+    return [
+        transform_weather_data.fn(
+            chunk.raw,
+            "celsius",
+            watermarks=chunk.watermarks,
+            on_invalid="quarantine",
+            quarantine_dir=quarantine_dir,
+            keep_columns=keep_columns,
+        )
+        for chunk in weather_data_chunks(
+            csv_file_path,
+            max_bytes=1,
+            lookback_s=FEATURE_LOOKBACK_S,
+            on_invalid="quarantine",
+            quarantine_dir=quarantine_dir,
+        )
+    ]
+
+
+@pytest.mark.parametrize("batch_bytes", [16 * 1024, 100 * 1024])
+def test_chunks_match_a_full_frame_run(tmp_path, monkeypatch, batch_bytes) -> None:
+    csv_file_path = str(tmp_path / "weather.csv")
+    quarantine_dir = str(tmp_path / "quarantine")
+    # 10 days of 3 cities, one city after the other
+    write_weather_csv(csv_file_path, 3 * 240, seed=1, n_cities=3)
+    # every batch becomes a chunk, ending mid-day
+    monkeypatch.setattr(chunks, "CSV_BATCH_BYTES", batch_bytes)
+
+    chunked = in_chunks(csv_file_path, quarantine_dir)
+    full = transform_weather_data.fn(
+        extract_weather_data.fn(
+            csv_file_path, on_invalid="quarantine", quarantine_dir=quarantine_dir
+        ),
+        "celsius",
+        on_invalid="quarantine",
+        quarantine_dir=quarantine_dir,
+    )
+
+    assert len(chunked) > 2
+    assert_frame_equal(
+        pl.concat(chunked).sort("city_name", "dt"),
+        full.sort("city_name", "dt"),
+        check_exact=False,
+        rtol=1e-9,
+    )
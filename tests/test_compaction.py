@@ -0,0 +1,81 @@
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from etl.transform.compaction import (
+    COMPACT_DTYPES,
+    FLOAT32_COLUMNS,
+    FLOAT32_RTOL,
+    compact_schema,
+)
+
+# the extremes each compacted integer column holds
+INTEGER_VALUES = {
+    "timezone": [-43_200, 50_400],
+    "visibility": [0, 10_000],
+    "pressure": [870, 1_085],
+    "humidity": [0, 100],
+    "wind_deg": [0, 360],
+    "clouds_all": [0, 100],
+    "weather_id": [200, 804],
+    "year": [1979, 2100],
+    "severity_level": [0, 4],
+    "pressure_change_3h": [-60, 60],
+    "pressure_change_6h": [-80, 80],
+    "pressure_change_24h": [-120, 120],
+}
+
+UNCOMPACTED = pl.DataFrame(
+    {
+        **{column: [-89.2, 1e5 + 0.01] for column in FLOAT32_COLUMNS},
+        **INTEGER_VALUES,
+        "city_name": ["Bern", None],
+        "weather_description": ["light rain", "overcast clouds"],
+        "weather_icon": ["10d", "04n"],
+        "temp_difference": [1.5, 2.5],
+        "dt": [0, 2**40],
+    },
+    schema_overrides={column: pl.Int64 for column in INTEGER_VALUES},
+)
+
+
+def test_compact_schema_dtypes() -> None:
+    compacted = compact_schema(UNCOMPACTED)
+
+    assert "temp_difference" not in compacted.columns
+    assert compacted.schema["dt"] == pl.Int64
+    assert {
+        column: dtype
+        for column, dtype in compacted.schema.items()
+        if column in COMPACT_DTYPES
+    } == COMPACT_DTYPES
+
+
+def test_compact_schema_round_trip() -> None:
+    compacted = compact_schema(UNCOMPACTED)
+    restored = compacted.cast(
+        {column: UNCOMPACTED.schema[column] for column in compacted.columns}
+    )
+
+    assert_frame_equal(
+        restored.drop(FLOAT32_COLUMNS),
+        UNCOMPACTED.drop("temp_difference", *FLOAT32_COLUMNS),
+    )
+    assert_frame_equal(
+        restored.select(FLOAT32_COLUMNS),
+        UNCOMPACTED.select(FLOAT32_COLUMNS),
+        check_exact=False,
+        rtol=FLOAT32_RTOL,
+        atol=0,
+    )
+
+
+def test_compact_schema_keeps_temp_difference_without_temp_range() -> None:
+    compacted = compact_schema(UNCOMPACTED.drop("temp_range"))
+
+    assert "temp_difference" in compacted.columns
+
+
+def test_compact_schema_fails_on_overflow() -> None:
+    with pytest.raises(pl.exceptions.InvalidOperationError):
+        compact_schema(pl.DataFrame({"humidity": [100, 300]}))
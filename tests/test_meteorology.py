@@ -0,0 +1,132 @@
+import polars as pl
+import pytest
+
+from etl.transform.meteorology import (
+    comfort_index_expr,
+    dew_point_depression_expr,
+    heat_index_expr,
+    humidex_expr,
+    intermediate_exprs,
+    wind_chill_expr,
+)
+
+
+def features(
+    temp: float,
+    dew_point: float = 10.0,
+    humidity: float = 50.0,
+    wind_kmh: float = 0.0,
+    temperature_unit: str = "celsius",
+    float32: bool = False,
+) -> dict[str, float]:
+    return (
+        pl.DataFrame(
+            {
+                "temp": [temp],
+                "dew_point": [dew_point],
+                "humidity": [humidity],
+                "wind_speed": [wind_kmh / 3.6],
+            }
+        )
+        .with_columns(intermediate_exprs(temperature_unit, float32))
+        .select(
+            comfort_index_expr(),
+            heat_index_expr(),
+            wind_chill_expr(),
+            humidex_expr(),
+            dew_point_depression_expr(),
+        )
+        .row(0, named=True)
+    )
+
+
+@pytest.mark.parametrize(
+    "temp, humidity, expected",
+    [
+        # Thom: 30 - 0.55 * 0.5 * 15.5
+        (30.0, 50.0, 25.7375),
+        (14.5, 20.0, 14.5),
+        (20.0, 100.0, 20.0),
+    ],
+)
+def test_comfort_index(temp: float, humidity: float, expected: float) -> None:
+    assert features(temp, humidity=humidity)["comfort_index"] == pytest.approx(
+        expected
+    )
+
+
+@pytest.mark.parametrize(
+    "temp, humidity, expected",
+    [
+        # 86 °F at 70% is 95 °F in the NWS heat index table
+        (30.0, 70.0, 35.04),
+        # 90 °F at 60% is 99.7 °F by the regression (100 °F in the table)
+        (32.22, 60.0, 37.59),
+        # not defined up to 27 °C, where it is the temperature
+        (27.0, 90.0, 27.0),
+        (-5.0, 50.0, -5.0),
+    ],
+)
+def test_heat_index(temp: float, humidity: float, expected: float) -> None:
+    assert features(temp, humidity=humidity)["heat_index"] == pytest.approx(
+        expected, abs=0.01
+    )
+
+
+@pytest.mark.parametrize(
+    "temp, wind_kmh, expected",
+    [
+        # -18, -33 and -3 in the Environment Canada wind chill table
+        (-10.0, 20.0, -17.86),
+        (-20.0, 30.0, -32.57),
+        (0.0, 10.0, -3.31),
+        # the temperature above 10 °C or with less than 4.8 km/h of wind
+        (15.0, 40.0, 15.0),
+        (-10.0, 4.0, -10.0),
+    ],
+)
+def test_wind_chill(temp: float, wind_kmh: float, expected: float) -> None:
+    assert features(temp, wind_kmh=wind_kmh)["wind_chill"] == pytest.approx(
+        expected, abs=0.01
+    )
+
+
+@pytest.mark.parametrize(
+    "temp, dew_point, expected",
+    [
+        (30.0, 15.0, 33.97),
+        (25.0, 20.0, 32.57),
+        # below the temperature when the air is dry
+        (20.0, 0.0, 17.84),
+    ],
+)
+def test_humidex(temp: float, dew_point: float, expected: float) -> None:
+    assert features(temp, dew_point=dew_point)["humidex"] == pytest.approx(
+        expected, abs=0.01
+    )
+
+
+@pytest.mark.parametrize(
+    "temperature_unit, temp, dew_point",
+    [("kelvin", 303.15, 288.15), ("farenheit", 86.0, 59.0)],
+)
+def test_features_are_computed_in_celsius(
+    temperature_unit: str, temp: float, dew_point: float
+) -> None:
+    expected = features(30.0, dew_point=15.0, humidity=70.0, wind_kmh=20.0)
+
+    assert features(
+        temp,
+        dew_point=dew_point,
+        humidity=70.0,
+        wind_kmh=20.0,
+        temperature_unit=temperature_unit,
+    ) == pytest.approx(expected)
+
+
+def test_float32_features_are_close() -> None:
+    expected = features(-10.0, dew_point=-15.0, humidity=70.0, wind_kmh=20.0)
+
+    assert features(
+        -10.0, dew_point=-15.0, humidity=70.0, wind_kmh=20.0, float32=True
+    ) == pytest.approx(expected, rel=1e-5)
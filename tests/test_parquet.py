@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from etl.load.parquet import PARTITION_FILE, partition_dir, write_partitions
+from etl.transform.compaction import compact_schema
+
+START = datetime(2024, 1, 31)
+
+
+def observations(city_name: str, hours: range, temp: float = 0.0) -> pl.DataFrame:
+    dt_iso = [START + timedelta(hours=hour) for hour in hours]
+    return pl.DataFrame(
+        {
+            "city_name": [city_name] * len(dt_iso),
+            "dt": [int(time.timestamp()) for time in dt_iso],
+            "dt_iso": dt_iso,
+            "year": [time.year for time in dt_iso],
+            "month": [time.month for time in dt_iso],
+            "temp": [temp + hour for hour in hours],
+            "humidity": [50] * len(dt_iso),
+        }
+    )
+
+
+# Bern over the end of January, Rome in January only
+BERN_AND_ROME = pl.concat(
+    [observations("Bern", range(20, 30)), observations("Rome", range(5))]
+)
+
+
+def stored(root: str, key: tuple) -> pl.DataFrame:
+    return pl.read_parquet(partition_dir(root, key) / PARTITION_FILE)
+
+
+def files(root) -> list[str]:
+    return sorted(str(path.relative_to(root)) for path in root.rglob("*.*"))
+
+
+def test_write_partitions(tmp_path) -> None:
+    assert write_partitions(BERN_AND_ROME, str(tmp_path)) == 3
+    assert files(tmp_path) == [
+        f"city_name=Bern/year=2024/month=1/{PARTITION_FILE}",
+        f"city_name=Bern/year=2024/month=2/{PARTITION_FILE}",
+        f"city_name=Rome/year=2024/month=1/{PARTITION_FILE}",
+    ]
+    assert_frame_equal(
+        stored(str(tmp_path), ("Rome", 2024, 1)),
+        observations("Rome", range(5)).drop("city_name", "year", "month"),
+    )
+
+
+def test_only_touched_partitions_are_replaced(tmp_path) -> None:
+    write_partitions(BERN_AND_ROME, str(tmp_path))
+    inodes = {path: path.stat().st_ino for path in tmp_path.rglob(PARTITION_FILE)}
+
+    # February of Bern
+    assert write_partitions(observations("Bern", range(26, 28)), str(tmp_path)) == 1
+
+    replaced = [
+        str(path.relative_to(tmp_path))
+        for path, inode in inodes.items()
+        if path.stat().st_ino != inode
+    ]
+    assert replaced == [f"city_name=Bern/year=2024/month=2/{PARTITION_FILE}"]
+
+
+def test_rows_are_merged_on_dt(tmp_path) -> None:
+    write_partitions(observations("Bern", range(4)), str(tmp_path))
+
+    # an overlapping run, out of order, with an hour repeated
+    write_partitions(
+        pl.concat(
+            [
+                observations("Bern", range(5, 6), temp=100.0),
+                observations("Bern", range(2, 5), temp=100.0),
+                observations("Bern", range(2, 3), temp=200.0),
+            ]
+        ),
+        str(tmp_path),
+    )
+
+    partition = stored(str(tmp_path), ("Bern", 2024, 1))
+    assert partition["dt"].is_sorted()
+    assert partition["temp"].to_list() == [0.0, 1.0, 202.0, 103.0, 104.0, 105.0]
+    assert files(tmp_path) == [f"city_name=Bern/year=2024/month=1/{PARTITION_FILE}"]
+
+
+@pytest.mark.parametrize("compact_first", [False, True])
+def test_compacted_rows_merge_into_the_stored_schema(
+    tmp_path, compact_first: bool
+) -> None:
+    first, second = observations("Bern", range(2)), observations("Bern", range(2, 4))
+    # a column the stored rows do not have
+    second = second.with_columns(pl.col("temp").alias("temp_range"))
+    if compact_first:
+        first = compact_schema(first)
+    else:
+        second = compact_schema(second)
+    write_partitions(first, str(tmp_path))
+    schema = stored(str(tmp_path), ("Bern", 2024, 1)).schema
+
+    write_partitions(second, str(tmp_path))
+
+    partition = stored(str(tmp_path), ("Bern", 2024, 1))
+    assert partition.select(schema.names()).schema == schema
+    assert partition["temp"].to_list() == [0.0, 1.0, 2.0, 3.0]
+    assert partition["humidity"].to_list() == [50] * 4
+    assert partition["temp_range"].to_list() == [None, None, 2.0, 3.0]
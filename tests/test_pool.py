@@ -0,0 +1,49 @@
+import pytest
+
+from etl.load import pool
+from etl.runner import load_tasks
+
+
+@pytest.fixture(autouse=True)
+def default_pool_config():
+    yield
+    pool.close_pools()
+    pool.configure_pool(pool.PoolConfig())
+
+
+def backend_pid(db_connection_uri: str) -> int:
+    with pool.connection(db_connection_uri) as conn:
+        return conn.info.backend_pid
+
+
+def test_pool_is_shared_by_the_runs_of_a_process(db_connection_uri: str) -> None:
+    load_tasks((1, 1, 3600.0, 30.0))
+    first = pool.get_pool(db_connection_uri)
+    pid = backend_pid(db_connection_uri)
+
+    # the next run, as the runner configures it
+    load_tasks((1, 1, 3600.0, 30.0))
+
+    assert pool.get_pool(db_connection_uri) is first
+    assert backend_pid(db_connection_uri) == pid
+
+
+def test_configure_pool_resizes_the_open_pool(db_connection_uri: str) -> None:
+    pool.configure_pool(pool.PoolConfig(min_size=1, max_size=1))
+    first = pool.get_pool(db_connection_uri)
+    pid = backend_pid(db_connection_uri)
+
+    pool.configure_pool(pool.PoolConfig(min_size=1, max_size=2, timeout=5.0))
+
+    assert pool.get_pool(db_connection_uri) is first
+    assert (first.max_size, first.timeout) == (2, 5.0)
+    assert backend_pid(db_connection_uri) == pid
+    assert pool.pool_stats(db_connection_uri)["pool_max"] == 2
+
+
+def test_close_pools(db_connection_uri: str) -> None:
+    first = pool.get_pool(db_connection_uri)
+    pool.close_pools()
+
+    assert first.closed
+    assert pool.get_pool(db_connection_uri) is not first
@@ -0,0 +1,191 @@
+from datetime import date, datetime, timezone
+
+import polars as pl
+import pytest
+from psycopg import sql
+
+from etl.load.postgres import (
+    conform_to_table,
+    copy_to_postgres,
+    create_table,
+    upsert_to_postgres,
+)
+from etl.transform.compaction import compact_schema
+
+CONDITION = pl.Enum(["Clear", "Clouds", "Rain"])
+
+# every dtype `copy_to_postgres` supports, each with a null
+FRAME = pl.DataFrame(
+    {
+        "id": [1, 2, 3],
+        "flag": [True, False, None],
+        "int8": [-128, 127, None],
+        "uint8": [0, 255, None],
+        "int16": [-32_768, 32_767, None],
+        "uint16": [0, 65_535, None],
+        "int32": [-(2**31), 2**31 - 1, None],
+        "uint32": [0, 2**32 - 1, None],
+        "int64": [-(2**63), 2**63 - 1, None],
+        "float32": [-1.5, 3.25, None],
+        "float64": [-273.15, 1e300, None],
+        "name": ["Zürich", "", None],
+        "category": ["a", "b", None],
+        "condition": ["Rain", "Clear", None],
+        "naive": [
+            datetime(1999, 12, 31, 23, 59, 59, 999_999),
+            datetime(2024, 2, 29),
+            None,
+        ],
+        "utc": [
+            datetime(1970, 1, 1, tzinfo=timezone.utc),
+            datetime(2030, 6, 1, 12, 30, tzinfo=timezone.utc),
+            None,
+        ],
+        "day": [date(1900, 1, 1), date(2000, 1, 1), None],
+    },
+    schema={
+        "id": pl.Int64,
+        "flag": pl.Boolean,
+        "int8": pl.Int8,
+        "uint8": pl.UInt8,
+        "int16": pl.Int16,
+        "uint16": pl.UInt16,
+        "int32": pl.Int32,
+        "uint32": pl.UInt32,
+        "int64": pl.Int64,
+        "float32": pl.Float32,
+        "float64": pl.Float64,
+        "name": pl.String,
+        "category": pl.Categorical,
+        "condition": CONDITION,
+        "naive": pl.Datetime("us"),
+        "utc": pl.Datetime("us", "UTC"),
+        "day": pl.Date,
+    },
+)
+
+
+def select_all(conn, table_name: str) -> list[tuple]:
+    return conn.execute(
+        sql.SQL("SELECT * FROM {} ORDER BY id").format(sql.Identifier(table_name))
+    ).fetchall()
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 100])
+def test_binary_copy_matches_copy_from_stdin(conn, batch_size: int) -> None:
+    create_table(conn, "Binary Copy", FRAME.schema)
+    create_table(conn, "Text Copy", FRAME.schema)
+
+    rows = copy_to_postgres(conn, FRAME, "Binary Copy", batch_size)
+    with conn.cursor() as cur, cur.copy(
+        sql.SQL("COPY {} FROM STDIN").format(sql.Identifier("Text Copy"))
+    ) as copy:
+        for row in FRAME.rows():
+            copy.write_row(row)
+
+    assert rows == FRAME.height
+    assert select_all(conn, "Binary Copy") == select_all(conn, "Text Copy")
+
+
+def test_binary_copy_of_an_empty_frame(conn) -> None:
+    create_table(conn, "empty", FRAME.schema)
+
+    assert copy_to_postgres(conn, FRAME.clear(), "empty", 100) == 0
+    assert select_all(conn, "empty") == []
+
+
+def test_create_table_adds_missing_enum_labels(conn) -> None:
+    create_table(conn, "Enum Labels", FRAME.select("condition").schema)
+    create_table(
+        conn,
+        "Enum Labels",
+        {"condition": pl.Enum(["Clouds", "Snow", "Clear", "Mist"])},
+    )
+
+    labels = conn.execute(
+        """
+        SELECT e.enumlabel
+        FROM pg_enum e JOIN pg_type t ON t.oid = e.enumtypid
+        WHERE t.typname = %s
+        ORDER BY e.enumsortorder
+        """,
+        ("Enum Labels_condition",),
+    ).fetchall()
+    assert [label for (label,) in labels] == [
+        "Clear",
+        "Clouds",
+        "Rain",
+        "Snow",
+        "Mist",
+    ]
+
+
+def test_upsert_merges_the_last_duplicate(conn) -> None:
+    schema = {"city_name": pl.String, "dt": pl.Int64, "temp": pl.Float64}
+    create_table(conn, "upserted", schema, ["city_name", "dt"])
+    upsert_to_postgres(
+        conn,
+        pl.DataFrame({"city_name": ["Bern"], "dt": [1], "temp": [0.0]}, schema),
+        "upserted",
+        ["city_name", "dt"],
+        100,
+    )
+
+    result = upsert_to_postgres(
+        conn,
+        pl.DataFrame(
+            {
+                "city_name": ["Bern", "Bern", "Rome", "Bern", "Rome"],
+                "dt": [1, 2, 1, 1, 1],
+                "temp": [1.0, 2.0, 3.0, 4.0, 5.0],
+            },
+            schema,
+        ),
+        "upserted",
+        ["city_name", "dt"],
+        2,
+    )
+
+    assert result == {"inserted": 2, "updated": 1, "skipped": 2}
+    assert conn.execute(
+        "SELECT city_name, dt, temp FROM upserted ORDER BY city_name, dt"
+    ).fetchall() == [("Bern", 1, 4.0), ("Bern", 2, 2.0), ("Rome", 1, 5.0)]
+
+
+def test_compacted_rows_upsert_into_an_uncompacted_table(conn) -> None:
+    uncompacted = pl.DataFrame(
+        {
+            "city_name": ["Bern", "Rome"],
+            "dt": [1, 2],
+            "timezone": [3_600, 7_200],
+            "humidity": [40, 100],
+            "temp": [12.5, -3.25],
+        }
+    )
+    create_table(conn, "uncompacted", uncompacted.schema, ["city_name", "dt"])
+
+    result = upsert_to_postgres(
+        conn, compact_schema(uncompacted), "uncompacted", ["city_name", "dt"], 100
+    )
+
+    assert result["inserted"] == 2
+    assert conn.execute(
+        "SELECT city_name, dt, timezone, humidity, temp FROM uncompacted ORDER BY dt"
+    ).fetchall() == [("Bern", 1, 3_600, 40, 12.5), ("Rome", 2, 7_200, 100, -3.25)]
+
+
+def test_conform_to_table(conn) -> None:
+    create_table(conn, "conformed", {"count": pl.Int16, "name": pl.String})
+
+    conformed = conform_to_table(
+        conn, pl.DataFrame({"count": [1, 2], "name": ["a", "b"]}), "conformed"
+    )
+    assert conformed.schema == pl.Schema({"count": pl.Int16, "name": pl.String})
+
+    nulls = pl.DataFrame({"count": [None]})
+    assert conform_to_table(conn, nulls, "conformed").schema == nulls.schema
+
+    with pytest.raises(TypeError, match="do not fit"):
+        conform_to_table(conn, pl.DataFrame({"count": [2**16]}), "conformed")
+    with pytest.raises(TypeError, match="name of conformed is text"):
+        conform_to_table(conn, pl.DataFrame({"name": [1]}), "conformed")
@@ -0,0 +1,120 @@
+from datetime import date
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from etl.result_cache import (
+    ParquetSerializer,
+    extract_cache_key,
+    transform_cache_key,
+)
+from etl.transform.aggregation import WeatherFrames
+from etl.transform.sketches import Sketches
+
+OBSERVATIONS = pl.DataFrame(
+    {
+        "city_name": ["Bern", "Rome", None],
+        "dt": [1, 2, 3],
+        "weather_main": ["Rain", "Clear", None],
+        "temp": [1.5, None, -3.25],
+    },
+    schema_overrides={
+        "city_name": pl.Categorical,
+        "weather_main": pl.Enum(["Clear", "Clouds", "Rain"]),
+    },
+)
+AGGREGATES = {
+    period: pl.DataFrame(
+        {
+            "city_name": ["Bern"],
+            "period_start": [date(2024, 1, 1)],
+            "temp_mean": [1.5],
+            "dominant_weather_category": ["Rain"],
+        },
+        schema_overrides={"dominant_weather_category": pl.Categorical},
+    )
+    for period in ["daily", "monthly"]
+}
+SKETCHES = Sketches(
+    pl.DataFrame(
+        {
+            "city_name": ["Bern"],
+            "column_name": ["temp"],
+            "observations": [2],
+            "m2": [0.5],
+        }
+    ),
+    pl.DataFrame(
+        {
+            "city_name": ["Bern", "Bern"],
+            "column_name": ["temp", "temp"],
+            "bin": [2, 3],
+            "observations": [1, 1],
+        },
+        schema_overrides={"bin": pl.Int32, "observations": pl.UInt32},
+    ),
+)
+
+
+def round_trip(obj: pl.DataFrame | WeatherFrames) -> pl.DataFrame | WeatherFrames:
+    serializer = ParquetSerializer()
+    return serializer.loads(serializer.dumps(obj))
+
+
+def test_dataframe_round_trip() -> None:
+    assert_frame_equal(round_trip(OBSERVATIONS), OBSERVATIONS)
+
+
+@pytest.mark.parametrize("sketches", [None, SKETCHES])
+def test_weather_frames_round_trip(sketches: Sketches | None) -> None:
+    frames = round_trip(WeatherFrames(OBSERVATIONS, AGGREGATES, sketches))
+
+    assert isinstance(frames, WeatherFrames)
+    assert_frame_equal(frames.observations, OBSERVATIONS)
+    assert frames.aggregates.keys() == AGGREGATES.keys()
+    for period, df in AGGREGATES.items():
+        assert_frame_equal(frames.aggregates[period], df)
+    if sketches is None:
+        assert frames.sketches is None
+    else:
+        assert_frame_equal(frames.sketches.moments, sketches.moments)
+        assert_frame_equal(frames.sketches.histograms, sketches.histograms)
+
+
+def test_extract_cache_key(tmp_path) -> None:
+    csv_file_path = tmp_path / "weather.csv"
+    parameters = {"csv_file_path": str(csv_file_path), "lazy": False}
+
+    def key(**changes) -> str | None:
+        return extract_cache_key(None, {**parameters, **changes})
+
+    csv_file_path.write_text("dt,temp\n1,280.0\n")
+    first = key()
+    csv_file_path.write_text("dt,temp\n1,280.0\n")
+    rewritten = key()
+    csv_file_path.write_text("dt,temp\n1,281.0\n")
+
+    assert first.startswith("extract-")
+    assert rewritten == first
+    # the content of the file
+    assert key() != first
+    # where the cache lives does not change the result
+    assert key(cache_dir=str(tmp_path)) == key()
+    assert key(on_invalid="quarantine") != key()
+    assert key(lazy=True) is None
+
+
+def test_transform_cache_key() -> None:
+    parameters = {"raw_weather_df": OBSERVATIONS, "temperature_unit": "celsius"}
+
+    def key(**changes) -> str | None:
+        return transform_cache_key(None, {**parameters, **changes})
+
+    assert key().startswith("transform-")
+    assert key() == key()
+    assert key(temperature_unit="kelvin") != key()
+    # the content of the raw frame
+    changed = OBSERVATIONS.with_columns(pl.col("temp").fill_null(0.0))
+    assert key(raw_weather_df=changed) != key()
+    assert key(raw_weather_df=OBSERVATIONS.lazy()) is None
@@ -0,0 +1,15 @@
+import pytest
+
+from etl.runner import run_weather_etl
+
+
+@pytest.mark.parametrize("summaries", [{"aggregates": True}, {"sketches": True}])
+def test_summaries_require_an_incremental_load(summaries: dict[str, bool]) -> None:
+    # rejected before the input or the database is read
+    with pytest.raises(ValueError, match="require incremental_load"):
+        run_weather_etl(
+            "/nonexistent.csv",
+            "postgresql://nowhere/weather",
+            "celsius",
+            **summaries,
+        )
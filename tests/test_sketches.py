@@ -0,0 +1,123 @@
+import random
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from etl.transform.sketches import (
+    HISTOGRAM_KEY_COLUMNS,
+    SKETCH_KEY_COLUMNS,
+    Sketches,
+    histogram_quantiles,
+    merge_sketches,
+    sketch_drift,
+    sketch_weather_data,
+)
+
+
+def sketches(
+    city_name: str, temps: list[float], humidity: list[float] = ()
+) -> Sketches:
+    n = max(len(temps), len(humidity))
+    observations = pl.DataFrame(
+        {
+            "city_name": [city_name] * n,
+            "temp": [*temps, *[None] * (n - len(temps))],
+            "pressure": [None] * n,
+            "humidity": [*humidity, *[None] * (n - len(humidity))],
+        },
+        schema_overrides={
+            "temp": pl.Float64,
+            "pressure": pl.Float64,
+            "humidity": pl.Float64,
+        },
+    )
+    moments, histograms = sketch_weather_data(observations.lazy())
+    return Sketches(moments.collect(), histograms.collect())
+
+
+def test_merged_sketches_match_a_single_pass() -> None:
+    rng = random.Random(0)
+    temps = [rng.gauss(15.0, 8.0) for _ in range(1_000)]
+    humidity = [rng.uniform(0.0, 100.0) for _ in range(500)]
+
+    merged = merge_sketches(
+        merge_sketches(
+            sketches("Bern", temps[:10], humidity[:300]),
+            sketches("Bern", temps[10:700]),
+        ),
+        sketches("Bern", temps[700:], humidity[300:]),
+    )
+    single = sketches("Bern", temps, humidity)
+
+    assert_frame_equal(
+        merged.moments.sort(SKETCH_KEY_COLUMNS),
+        single.moments.sort(SKETCH_KEY_COLUMNS),
+        check_exact=False,
+        rtol=1e-9,
+    )
+    assert_frame_equal(
+        merged.histograms.sort(HISTOGRAM_KEY_COLUMNS),
+        single.histograms.sort(HISTOGRAM_KEY_COLUMNS),
+    )
+
+
+@pytest.mark.parametrize("repeat, drifted", [(1, False), (100, True)])
+def test_sketch_drift(repeat: int, drifted: bool) -> None:
+    # bins 0 to 3 of the history, only bins 2 and 3 in the batch
+    history = sketches("Bern", [0.0, 0.5, 1.0, 1.5] * repeat)
+    batch = sketches("Bern", [1.0, 1.5] * repeat)
+
+    drift = sketch_drift(history, batch)
+
+    assert drift.columns == [
+        "city_name",
+        "column_name",
+        "observations",
+        "mean_shift",
+        "ks_distance",
+        "drifted",
+        "history_median",
+        "batch_median",
+    ]
+    row = drift.row(0, named=True)
+    assert drift.height == 1
+    assert row["ks_distance"] == pytest.approx(0.5)
+    # the history's standard deviation is sqrt(1.25 / 3) for 4 values
+    assert row["mean_shift"] == pytest.approx(
+        0.5 / (1.25 * repeat / (4 * repeat - 1)) ** 0.5
+    )
+    # 2 values against 4 are within the critical value of the two-sample test
+    assert row["drifted"] is drifted
+    assert (row["history_median"], row["batch_median"]) == (0.75, 1.25)
+
+
+def test_sketch_drift_of_the_same_distribution() -> None:
+    history = sketches("Bern", [10.0, 11.0, 12.0] * 100)
+
+    row = sketch_drift(history, sketches("Bern", [12.0, 11.0, 10.0] * 10)).row(
+        0, named=True
+    )
+
+    assert row["ks_distance"] == pytest.approx(0.0)
+    assert row["mean_shift"] == pytest.approx(0.0)
+    assert not row["drifted"]
+
+
+def test_sketch_drift_without_enough_history() -> None:
+    history = merge_sketches(sketches("Bern", [10.0]), sketches("Rome", [20.0]))
+    batch = merge_sketches(sketches("Bern", [12.0]), sketches("Oslo", [0.0]))
+
+    drift = sketch_drift(history, batch)
+
+    # no shift from a single observation, and Oslo has no history
+    assert drift.select("city_name", "mean_shift").rows() == [("Bern", None)]
+
+
+def test_histogram_quantiles() -> None:
+    histograms = sketches("Bern", [], humidity=[float(h) for h in range(100)])[1]
+
+    quantiles = histogram_quantiles(histograms, [0.0, 0.5, 0.9, 1.0])
+
+    # the middle of the 1% wide bin reaching each quantile
+    assert quantiles.rows() == [("Bern", "humidity", 0.5, 49.5, 89.5, 99.5)]
@@ -0,0 +1,124 @@
+from datetime import datetime
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from etl.time_index import (
+    city_ranges,
+    is_time_ordered,
+    join_nearest,
+    order_by_time,
+    time_slice,
+)
+
+
+def at(hour: int, minute: int = 0) -> datetime:
+    return datetime(2024, 1, 1, hour, minute)
+
+
+def observations(rows: list[tuple[str, int]]) -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "city_name": [city_name for city_name, _ in rows],
+            "dt_iso": [at(hour) for _, hour in rows],
+            "temp": [float(row) for row in range(len(rows))],
+        }
+    )
+
+
+# Bern and Rome, hours 0 to 5
+ORDERED = observations(
+    [(city_name, hour) for city_name in ["Bern", "Rome"] for hour in range(6)]
+)
+# the same rows, interleaved and out of time order
+UNSORTED = ORDERED.sample(fraction=1.0, shuffle=True, seed=1)
+
+
+def test_order_by_time_keeps_the_last_duplicate() -> None:
+    df = observations([("Rome", 2), ("Bern", 1), ("Rome", 0), ("Bern", 1)])
+
+    ordered = order_by_time(df, "dt_iso")
+
+    assert ordered.rows() == [
+        ("Bern", at(1), 3.0),
+        ("Rome", at(0), 2.0),
+        ("Rome", at(2), 0.0),
+    ]
+    assert is_time_ordered(ordered, "dt_iso")
+    assert ordered["city_name"].flags["SORTED_ASC"]
+
+
+def test_order_by_time_only_checks_an_ordered_frame() -> None:
+    assert_frame_equal(order_by_time(ORDERED, "dt_iso"), ORDERED)
+
+
+@pytest.mark.parametrize("df", [ORDERED, UNSORTED], ids=["ordered", "unsorted"])
+@pytest.mark.parametrize(
+    "start, end, city_names, expected",
+    [
+        # the start is inclusive, the end exclusive
+        (at(1), at(3), None, [("Bern", 1), ("Bern", 2), ("Rome", 1), ("Rome", 2)]),
+        (at(4), None, ["Rome"], [("Rome", 4), ("Rome", 5)]),
+        # in the order of `city_names`
+        (None, at(1), ["Rome", "Bern"], [("Rome", 0), ("Bern", 0)]),
+        (at(1, 30), at(2), None, []),
+        (None, None, ["Oslo"], []),
+    ],
+)
+def test_time_slice(
+    df: pl.DataFrame,
+    start: datetime | None,
+    end: datetime | None,
+    city_names: list[str] | None,
+    expected: list[tuple[str, int]],
+) -> None:
+    sliced = time_slice(df, start, end, city_names)
+
+    assert sliced.columns == ORDERED.columns
+    assert sliced.select("city_name", "dt_iso").rows() == [
+        (city_name, at(hour)) for city_name, hour in expected
+    ]
+
+
+def test_city_ranges() -> None:
+    cities = pl.Series(["Bern", "Bern", "Oslo", "Rome", "Rome", "Rome"]).set_sorted()
+
+    assert city_ranges(cities) == [(0, 2), (2, 3), (3, 6)]
+    # a city without rows is an empty range where it would be
+    assert city_ranges(cities, ["Rome", "Paris", "Bern"]) == [(3, 6), (3, 3), (0, 2)]
+    assert city_ranges(cities.clear()) == []
+
+
+@pytest.mark.parametrize(
+    "tolerance, expected",
+    [
+        (None, [at(0, 10), at(0, 10), at(1, 55), at(1, 55)]),
+        ("15m", [at(0, 10), None, at(1, 55), None]),
+    ],
+)
+def test_join_nearest(tolerance: str | None, expected: list[datetime | None]) -> None:
+    df = observations([("Rome", 0), *(("Bern", hour) for hour in [3, 2, 1, 0])])
+    series = pl.DataFrame(
+        {
+            "city_name": ["Bern", "Bern", "Oslo"],
+            "time": [at(1, 55), at(0, 10), at(0)],
+            "temp": [-1.0, -2.0, -3.0],
+        }
+    )
+
+    joined = join_nearest(df, series, tolerance=tolerance)
+
+    assert joined.columns == ["city_name", "dt_iso", "temp", "time", "temp_series"]
+    assert joined.select("city_name", "dt_iso").rows() == [
+        ("Bern", at(0)),
+        ("Bern", at(1)),
+        ("Bern", at(2)),
+        ("Bern", at(3)),
+        ("Rome", at(0)),
+    ]
+    assert joined["time"].to_list() == [*expected, None]
+    assert joined["temp_series"].to_list() == [
+        {at(0, 10): -2.0, at(1, 55): -1.0, None: None}[time]
+        for time in [*expected, None]
+    ]
@@ -0,0 +1,197 @@
+from datetime import datetime, timedelta, timezone
+
+import polars as pl
+import pytest
+
+from etl.time_index import order_by_time
+from etl.transform.transformation import (
+    CLOUD_COVER_CATEGORY_BINS,
+    PRESSURE_CHANGE_HOURS,
+    WEATHER_CONDITIONS,
+    WIND_CATEGORY_BINS,
+    WIND_DIRECTION_BINS,
+    Bins,
+    add_pressure_tendency_features,
+    add_rolling_window_features,
+    binned,
+    weather_condition_category_exprs,
+    weather_condition_lookup,
+    weather_main_expr,
+)
+
+
+def bin_labels(values: list[float | None], bins: Bins) -> list[str | None]:
+    return (
+        pl.DataFrame({"value": values}, schema={"value": pl.Float64})
+        .select(binned("value", bins))
+        .to_series()
+        .to_list()
+    )
+
+
+@pytest.mark.parametrize(
+    "bins, values, labels",
+    [
+        # left-closed: an edge belongs to the bin above it
+        (
+            WIND_DIRECTION_BINS,
+            [0, 22.4, 22.5, 67.5, 180, 337.4, 337.5, 360],
+            ["N", "N", "NE", "E", "S", "NW", "N", "N"],
+        ),
+        (
+            WIND_CATEGORY_BINS,
+            [0, 0.49, 0.5, 3.3, 13.79, 20.7, 40],
+            ["calm", "calm", "light", "moderate", "fresh", "storm", "storm"],
+        ),
+        # right-closed: an edge belongs to the bin below it
+        (
+            CLOUD_COVER_CATEGORY_BINS,
+            [0, 10, 10.5, 30, 70, 90, 91, 100],
+            [
+                "clear",
+                "clear",
+                "mostly_clear",
+                "mostly_clear",
+                "partly_cloudy",
+                "mostly_cloudy",
+                "cloudy",
+                "cloudy",
+            ],
+        ),
+    ],
+)
+def test_binned_edges(bins: Bins, values: list[float], labels: list[str]):
+    assert bin_labels(values, bins) == labels
+
+
+def test_binned_keeps_nulls_and_labels_as_enum():
+    df = pl.DataFrame({"wind_deg": [None, 90]}, schema={"wind_deg": pl.Int64})
+    wind_direction = df.select(binned("wind_deg", WIND_DIRECTION_BINS)).to_series()
+
+    assert wind_direction.to_list() == [None, "E"]
+    # the repeated "N" label is a single category
+    assert wind_direction.dtype == pl.Enum(["N", "NE", "E", "SE", "S", "SW", "W", "NW"])
+
+
+def test_weather_condition_lookup_gathers_each_condition_row():
+    looked_up = WEATHER_CONDITIONS.select(
+        "weather_main",
+        *(
+            weather_condition_lookup(column)
+            for column in WEATHER_CONDITIONS.columns
+            if column != "weather_main"
+        ),
+    )
+
+    assert looked_up.equals(WEATHER_CONDITIONS.select(looked_up.columns))
+
+
+def test_weather_condition_lookup_of_unknown_conditions():
+    df = pl.DataFrame({"weather_main": ["Volcano", None, "Thunderstorm", "Fog"]})
+    looked_up = df.select(
+        weather_main_expr(),
+        weather_condition_lookup("weather_condition_category"),
+        weather_condition_lookup("severity_level"),
+        weather_condition_lookup("visibility_impact"),
+        weather_condition_lookup("percipitation_condition"),
+    )
+
+    assert looked_up.rows() == [
+        ("Other", "other", 0, "moderate", False),
+        (None, "other", 0, "moderate", False),
+        ("Thunderstorm", "stormy", 4, "moderate", True),
+        ("Fog", "poor_visibility", 2, "significantly_reduced", False),
+    ]
+
+
+def test_cloud_detail_keeps_unknown_conditions():
+    df = pl.DataFrame(
+        {
+            "weather_main": ["Volcano", None, "Clouds", "Fog"],
+            "clouds_all": [100, 100, 50, 100],
+            "rain_1h": [None] * 4,
+            "snow_1h": [None] * 4,
+            "dt_iso": [datetime(2024, 1, 1)] * 4,
+        },
+        schema_overrides={"rain_1h": pl.Float64, "snow_1h": pl.Float64},
+    )
+    exprs = weather_condition_category_exprs()
+    cloud_detail = df.select(
+        next(expr for expr in exprs if expr.meta.output_name() == "cloud_detail")
+    ).to_series()
+
+    assert cloud_detail.to_list() == ["Other", None, "most_cloudy", "Fog"]
+
+
+def gapped_observations() -> pl.DataFrame:
+    """
+    30 hours of two interleaved cities, Bern missing its 10:00 observation
+    """
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = [
+        {
+            "city_name": city,
+            "dt_iso": start + timedelta(hours=hour),
+            "hour": hour,
+            "pressure": base_pressure + (1 if city == "Bern" else 2) * hour,
+            "temp": float(base_temp + hour),
+        }
+        for hour in range(30)
+        for city, base_pressure, base_temp in [("Bern", 1000, 0), ("Rome", 900, 100)]
+        if not (city == "Bern" and hour == 10)
+    ]
+    return pl.DataFrame(rows)
+
+
+def expected_pressure_change(city: str, hour: int, hours: int) -> int | None:
+    if hour < hours or (city == "Bern" and hour - hours == 10):
+        return None
+    return (1 if city == "Bern" else 2) * hours
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_pressure_changes_do_not_bridge_gaps(lazy: bool) -> None:
+    df = gapped_observations()
+    if lazy:
+        # a LazyFrame must already be in time order
+        df = order_by_time(df, "dt_iso").lazy()
+    result = add_pressure_tendency_features(df).lazy().collect()
+
+    for row in result.iter_rows(named=True):
+        for hours in PRESSURE_CHANGE_HOURS:
+            assert row[f"pressure_change_{hours}h"] == expected_pressure_change(
+                row["city_name"], row["hour"], hours
+            ), (row["city_name"], row["hour"], hours)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_rolling_window_features_per_city(lazy: bool) -> None:
+    df = gapped_observations()
+    if lazy:
+        df = order_by_time(df, "dt_iso").lazy()
+    result = add_rolling_window_features(df).lazy().collect()
+
+    temps = {
+        (row["city_name"], row["hour"]): row["temp"]
+        for row in gapped_observations().iter_rows(named=True)
+    }
+    for row in result.iter_rows(named=True):
+        city, hour = row["city_name"], row["hour"]
+        for window in [6, 24]:
+            # the window ends at the observation, and starts after `window`
+            # hours before it
+            in_window = [
+                temps[city, h]
+                for h in range(hour - window + 1, hour + 1)
+                if (city, h) in temps
+            ]
+            assert row[f"temp_rolling_mean_{window}h"] == pytest.approx(
+                sum(in_window) / len(in_window)
+            ), (city, hour, window)
+
+        day = [
+            temp
+            for (c, h), temp in temps.items()
+            if c == city and h // 24 == hour // 24
+        ]
+        assert (row["temp_daily_min"], row["temp_daily_max"]) == (min(day), max(day))
@@ -0,0 +1,125 @@
+import os
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from etl.validation import (
+    VIOLATIONS_COLUMN,
+    Rule,
+    defer_rules,
+    enforce_rules,
+    validation_report,
+)
+
+RULES = [
+    Rule("valid_humidity", pl.col("humidity").is_between(0, 100).fill_null(True)),
+    Rule("valid_wind_speed", (pl.col("wind_speed") >= 0).fill_null(True)),
+]
+
+DF = pl.DataFrame(
+    {
+        "id": [1, 2, 3, 4, 5],
+        "humidity": [50, 101, None, -1, 80],
+        "wind_speed": [1.0, -2.0, 3.0, 4.0, None],
+    }
+)
+VALID = DF.filter(pl.col("id").is_in([1, 3, 5]))
+
+
+def collect(df: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame:
+    return df.collect() if isinstance(df, pl.LazyFrame) else df
+
+
+def quarantined(quarantine_dir: str) -> pl.DataFrame:
+    (file_name,) = os.listdir(quarantine_dir)
+    assert file_name.startswith("transform-") and file_name.endswith(".parquet")
+    return pl.read_parquet(os.path.join(quarantine_dir, file_name))
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_validation_report(lazy: bool) -> None:
+    report = validation_report(DF.lazy() if lazy else DF, RULES, sample_size=1)
+
+    assert report.rows == 5
+    assert report.violations == {"valid_humidity": 2, "valid_wind_speed": 1}
+    assert not report.passed
+    assert report.summary() == (
+        "valid_humidity: 2 of 5 rows; valid_wind_speed: 1 of 5 rows"
+    )
+    assert_frame_equal(report.samples["valid_humidity"], DF[1])
+    assert_frame_equal(report.samples["valid_wind_speed"], DF[1])
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_validation_report_passed(lazy: bool) -> None:
+    report = validation_report(VALID.lazy() if lazy else VALID, RULES)
+
+    assert report.passed
+    assert report.samples == {}
+    assert report.summary() == "all 3 rows passed"
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_enforce_rules_raises(lazy: bool) -> None:
+    with pytest.raises(
+        ValueError,
+        match="^transform validation failed: valid_humidity: 2 of 5 rows; "
+        "valid_wind_speed: 1 of 5 rows$",
+    ):
+        collect(enforce_rules(DF.lazy() if lazy else DF, RULES, stage="transform"))
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_enforce_rules_returns_valid_input_as_is(lazy: bool) -> None:
+    df = VALID.lazy() if lazy else VALID
+
+    assert enforce_rules(df, RULES) is df
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_enforce_rules_quarantines(lazy: bool, tmp_path) -> None:
+    valid = enforce_rules(
+        DF.lazy() if lazy else DF, RULES, "quarantine", str(tmp_path), "transform"
+    )
+
+    assert isinstance(valid, pl.LazyFrame) == lazy
+    assert_frame_equal(collect(valid), VALID)
+    assert_frame_equal(
+        quarantined(str(tmp_path)),
+        DF.filter(pl.col("id").is_in([2, 4])).with_columns(
+            pl.Series(
+                VIOLATIONS_COLUMN,
+                [["valid_humidity", "valid_wind_speed"], ["valid_humidity"]],
+            )
+        ),
+    )
+
+
+def test_quarantine_needs_a_directory() -> None:
+    with pytest.raises(ValueError, match="quarantine directory is required"):
+        enforce_rules(DF, RULES, "quarantine")
+
+
+def test_on_invalid_is_checked() -> None:
+    with pytest.raises(ValueError, match="on_invalid must be one of"):
+        enforce_rules(VALID, RULES, "ignore")
+
+
+def deferred(on_invalid: str, quarantine_dir: str | None = None) -> pl.DataFrame:
+    valid, check = defer_rules(
+        DF.lazy(), RULES, on_invalid, quarantine_dir, "transform"
+    )
+    valid_df, counts = pl.collect_all([valid, check.counts()])
+    check.enforce(counts)
+    return valid_df
+
+
+def test_defer_rules_raises() -> None:
+    with pytest.raises(ValueError, match="^transform validation failed"):
+        deferred("raise")
+
+
+def test_defer_rules_quarantines(tmp_path) -> None:
+    assert_frame_equal(deferred("quarantine", str(tmp_path)), VALID)
+    assert quarantined(str(tmp_path))["id"].to_list() == [2, 4]